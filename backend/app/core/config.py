@@ -4,7 +4,7 @@ Configuration settings for the application
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -40,6 +40,154 @@ class Settings(BaseSettings):
     # Model Configuration
     GEMINI_MODEL: str = "gemini-1.5-flash"
     OPENAI_MODEL: str = "gpt-3.5-turbo"
+    # Provider endpoints (point these at benchmarks/fake_llm_server.py for load tests)
+    GEMINI_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta/models"
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1/chat/completions"
+    
+    # LLM HTTP connection pool (one pool per provider)
+    LLM_POOL_MAX_CONNECTIONS: int = 100
+    LLM_POOL_MAX_KEEPALIVE: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 30.0
+    
+    # Provider latency tracking and hedged requests
+    LLM_LATENCY_WINDOW: int = 500
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0
+    LLM_HEDGE_MIN_DELAY: float = 0.2
+    
+    # End-to-end deadlines (seconds) per endpoint; clients may send a shorter
+    # or longer one in the X-Request-Deadline-Ms header, up to MAX_REQUEST_DEADLINE
+    ENDPOINT_DEADLINES: Dict[str, float] = {
+        "analyze": 10.0,
+        "analyze_stream": 30.0,
+        "analyze_full": 10.0,
+        "analyze_batch_item": 30.0,
+        "test": 10.0
+    }
+    MAX_REQUEST_DEADLINE: float = 60.0
+    LLM_MIN_PROVIDER_BUDGET: float = 0.5
+    LOCAL_FALLBACK_RESERVE: float = 0.05
+    
+    # Circuit breakers and health-aware provider ordering
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 10.0
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0
+    LLM_BREAKER_PROBE_INTERVAL: float = 5.0
+    LLM_BREAKER_TRIP_STATUSES: List[int] = [401, 403, 429]
+    LLM_DYNAMIC_ORDERING: bool = True
+    
+    # In-process cache of remote analysis results
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    RESULT_CACHE_TTL: float = 3600.0
+    
+    # Persistent L2 result cache shared by all workers on the host (SQLite, WAL mode),
+    # opened on app startup; reads run in worker threads and writes on a writer thread
+    RESULT_CACHE_L2_ENABLED: bool = True
+    RESULT_CACHE_L2_PATH: str = "data/llm_result_cache.sqlite3"
+    RESULT_CACHE_L2_MAX_BYTES: int = 256 * 1024 * 1024
+    RESULT_CACHE_L2_TTL: float = 7 * 24 * 3600.0
+    RESULT_CACHE_L2_BUSY_TIMEOUT: float = 0.05
+    
+    # Cache warming from observed traffic: patterns per run, provider calls per
+    # minute and the local hours it may run in (e.g. "1-6"; empty = any time)
+    CACHE_WARM_TOP_PATTERNS: int = 1000
+    CACHE_WARM_RATE_PER_MINUTE: float = 30.0
+    CACHE_WARM_OFF_PEAK_HOURS: str = ""
+    
+    # Storage backend: "memory" (lost on restart), "sqlite" (WAL database file)
+    # or "shared" (the same file, written through so every worker process sees
+    # every write: use with uvicorn --workers N; memory and sqlite are per process)
+    STORAGE_BACKEND: str = "memory"
+    # SQLite storage: writes are queued and committed by a writer thread in
+    # transactions of up to BATCH_SIZE, waiting at most FLUSH_INTERVAL seconds
+    # for a batch to fill; past MAX_PENDING queued writes, writes get a 503
+    STORAGE_SQLITE_PATH: str = "data/storage.sqlite3"
+    STORAGE_SQLITE_BATCH_SIZE: int = 512
+    STORAGE_SQLITE_FLUSH_INTERVAL: float = 0.05
+    STORAGE_SQLITE_MAX_PENDING: int = 100_000
+    # Mapping ids each process claims from the database at a time, and seconds a
+    # shared-mode write waits for another worker's transaction
+    STORAGE_SQLITE_ID_BLOCK: int = 1024
+    STORAGE_SQLITE_BUSY_TIMEOUT: float = 5.0
+    
+    # List endpoints (/body-mappings/, /body-mappings/sessions/list): page size
+    # when none is given, and the largest one a client may ask for
+    PAGE_DEFAULT_LIMIT: int = 100
+    PAGE_MAX_LIMIT: int = 1000
+    
+    # In-memory storage: number of lock-striped shards (keyed by session id)
+    STORAGE_SHARDS: int = 16
+    # In-memory storage bounds (0 = unlimited): sessions, approximate bytes, idle
+    # seconds before a session expires, and sessions evicted per write at most
+    STORAGE_MAX_SESSIONS: int = 100_000
+    STORAGE_MAX_BYTES: int = 512 * 1024 * 1024
+    STORAGE_SESSION_TTL: float = 86400.0
+    STORAGE_EVICTION_BATCH: int = 8
+    # Journal in-memory storage to disk (append-only log plus snapshots) so it
+    # survives restarts. FSYNC: "always" (each write waits for an fsync, shared
+    # by concurrent writes, in its worker thread), "interval" (every
+    # FSYNC_INTERVAL seconds) or "never" (left to the OS). The log is compacted
+    # into a snapshot once its live segment passes COMPACT_BYTES.
+    STORAGE_JOURNAL_ENABLED: bool = False
+    STORAGE_JOURNAL_DIR: str = "data/journal"
+    STORAGE_JOURNAL_FSYNC: str = "interval"
+    STORAGE_JOURNAL_FSYNC_INTERVAL: float = 1.0
+    STORAGE_JOURNAL_COMPACT_BYTES: int = 64 * 1024 * 1024
+    
+    # Share one in-flight analysis between concurrent identical requests
+    REQUEST_COALESCING_ENABLED: bool = True
+    
+    # Micro-batching: collect up to LLM_BATCH_MAX_SIZE analyses for at most
+    # LLM_BATCH_WINDOW_MS and send them to a provider as one prompt
+    LLM_BATCH_ENABLED: bool = False
+    LLM_BATCH_WINDOW_MS: float = 20.0
+    LLM_BATCH_MAX_SIZE: int = 8
+    
+    # Provider quotas (requests / tokens per minute, 0 = unlimited) and the
+    # outbound scheduler. Interactive calls never wait for quota: they are routed
+    # to the next provider at once; batch/background calls may queue.
+    GEMINI_RPM: int = 0
+    GEMINI_TPM: int = 0
+    OPENAI_RPM: int = 0
+    OPENAI_TPM: int = 0
+    QUOTA_BURST_SECONDS: float = 10.0
+    QUOTA_MAX_QUEUE: int = 100
+    QUOTA_MAX_WAIT: Dict[str, float] = {
+        "interactive": 0.0,
+        "batch": 10.0,
+        "background": 60.0
+    }
+    
+    # Skip remote providers when the local classifier is confident: confidence
+    # is the average support of the top emotion across the marked regions
+    LOCAL_CLASSIFIER_BYPASS_ENABLED: bool = True
+    LOCAL_CLASSIFIER_BYPASS_THRESHOLD: float = 0.85
+    LOCAL_CLASSIFIER_MIN_REGIONS: int = 3
+    
+    # Serve the result of a previously analyzed map within this many bits
+    # (one changed region is 2 bits, one added or removed region is 1 bit).
+    # Opt-in: a neighbour's result is an approximation of the map's own analysis
+    NEIGHBOR_INDEX_ENABLED: bool = False
+    NEIGHBOR_MAX_DISTANCE: int = 1
+    NEIGHBOR_INDEX_MAX_ENTRIES: int = 1_000_000
+    
+    # Batch analysis endpoint: items, bytes and bytes per NDJSON line per request,
+    # concurrent remote analyses, items per vectorized local pass and items read
+    # ahead of the response
+    BATCH_MAX_ITEMS: int = 10000
+    BATCH_MAX_BYTES: int = 16 * 1024 * 1024
+    BATCH_MAX_LINE_BYTES: int = 64 * 1024
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_CHUNK_SIZE: int = 256
+    BATCH_MAX_PENDING: int = 1024
     
     class Config:
         env_file = ".env"
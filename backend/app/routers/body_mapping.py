@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 """
-Body Mapping Router - Simplified for in-memory storage
+Body Mapping Router - sessions and body mappings in the configured storage backend
+
+Routes are plain functions, so FastAPI runs them in its threadpool: storage calls
+may block (a lock, the disk, another worker's SQLite transaction) without
+stalling the event loop.
 """
 
+from datetime import datetime
 from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
-from ..services.memory_storage import memory_storage
+from ..core.config import settings
+from ..services.pagination import MAPPINGS, SESSIONS, decode_cursor, encode_cursor, to_epoch_us
+from ..services.storage import storage
+from ..services.storage_backend import StorageBusy
 
 # Request/Response models
 class BodyMappingRequest(BaseModel):
@@ -21,8 +29,24 @@ class BodyMappingResponse(BaseModel):
 
 router = APIRouter(prefix="/body-mappings", tags=["body-mapping"])
 
+def _page_params(kind: str, limit: int, cursor: Optional[str], created_from: Optional[datetime],
+                 created_to: Optional[datetime]) -> Dict[str, Any]:
+    """Validated storage paging arguments from list query parameters"""
+    if not 1 <= limit <= settings.PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {settings.PAGE_MAX_LIMIT}")
+    try:
+        after = decode_cursor(kind, cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    return {
+        'limit': limit,
+        'after': after,
+        'created_from': to_epoch_us(created_from),
+        'created_to': to_epoch_us(created_to)
+    }
+
 @router.post("/", response_model=BodyMappingResponse)
-async def create_body_mapping(request: BodyMappingRequest) -> BodyMappingResponse:
+def create_body_mapping(request: BodyMappingRequest) -> BodyMappingResponse:
     """Create a new body mapping session"""
     try:
         # Validate view
@@ -30,11 +54,10 @@ async def create_body_mapping(request: BodyMappingRequest) -> BodyMappingRespons
             raise HTTPException(status_code=400, detail="View must be 'front' or 'back'")
         
         # Create session if it doesn't exist
-        if request.session_id not in memory_storage.sessions:
-            memory_storage.create_session(request.session_id)
+        storage.ensure_session(request.session_id)
         
         # Save body mapping
-        mapping_id = memory_storage.save_body_mapping(
+        mapping_id = storage.save_body_mapping(
             request.session_id, 
             request.body_markings, 
             request.view
@@ -51,13 +74,15 @@ async def create_body_mapping(request: BodyMappingRequest) -> BodyMappingRespons
             message="Body mapping created successfully"
         )
         
+    except (HTTPException, StorageBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create body mapping: {str(e)}")
 
 @router.get("/{mapping_id}")
-async def get_body_mapping(mapping_id: str) -> Dict[str, Any]:
+def get_body_mapping(mapping_id: str) -> Dict[str, Any]:
     """Get a specific body mapping by ID"""
-    mapping = memory_storage.get_body_mapping(mapping_id)
+    mapping = storage.get_body_mapping(mapping_id)
     if not mapping:
         raise HTTPException(status_code=404, detail="Body mapping not found")
     
@@ -68,9 +93,9 @@ async def get_body_mapping(mapping_id: str) -> Dict[str, Any]:
     }
 
 @router.get("/session/{session_id}")
-async def get_body_mappings_by_session(session_id: str) -> Dict[str, Any]:
+def get_body_mappings_by_session(session_id: str) -> Dict[str, Any]:
     """Get all body mappings for a session"""
-    mappings = memory_storage.get_session_mappings(session_id)
+    mappings = storage.get_session_mappings(session_id)
     
     return {
         "success": True,
@@ -82,85 +107,107 @@ async def get_body_mappings_by_session(session_id: str) -> Dict[str, Any]:
     }
 
 @router.put("/{mapping_id}")
-async def update_body_mapping(
+def update_body_mapping(
     mapping_id: str,
     request: BodyMappingRequest
 ) -> Dict[str, Any]:
     """Update an existing body mapping"""
-    existing_mapping = memory_storage.get_body_mapping(mapping_id)
+    existing_mapping = storage.get_body_mapping(mapping_id)
     if not existing_mapping:
         raise HTTPException(status_code=404, detail="Body mapping not found")
     
     try:
         # Update the mapping
-        existing_mapping['body_markings'] = request.body_markings
-        existing_mapping['view'] = request.view
+        updated_mapping = storage.update_body_mapping(mapping_id, request.body_markings, request.view)
         
         return {
             "success": True,
-            "data": existing_mapping,
+            "data": updated_mapping,
             "message": "Body mapping updated successfully"
         }
         
+    except (HTTPException, StorageBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update body mapping: {str(e)}")
 
 @router.delete("/{mapping_id}")
-async def delete_body_mapping(mapping_id: str) -> Dict[str, Any]:
+def delete_body_mapping(mapping_id: str) -> Dict[str, Any]:
     """Delete a body mapping"""
-    mapping = memory_storage.get_body_mapping(mapping_id)
+    mapping = storage.get_body_mapping(mapping_id)
     if not mapping:
         raise HTTPException(status_code=404, detail="Body mapping not found")
     
     try:
-        # Remove from body mappings
-        if mapping_id in memory_storage.body_mappings:
-            del memory_storage.body_mappings[mapping_id]
-        
-        # Remove from emotion results
-        if mapping_id in memory_storage.emotion_results:
-            del memory_storage.emotion_results[mapping_id]
+        # Remove the mapping together with its emotion result
+        storage.delete_body_mapping(mapping_id)
         
         return {
             "success": True,
             "message": "Body mapping deleted successfully"
         }
         
+    except (HTTPException, StorageBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete body mapping: {str(e)}")
 
 @router.get("/")
-async def list_body_mappings() -> Dict[str, Any]:
-    """List all body mappings"""
-    mappings = list(memory_storage.body_mappings.values())
+def list_body_mappings(
+    limit: int = settings.PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    session_id: Optional[str] = None,
+    sensation: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """List body mappings, oldest first, a page at a time.
+
+    Pass the returned ``next_cursor`` as ``cursor`` (with the same filters) for the
+    next page; it is null on the last one. ``created_to`` is exclusive.
+    """
+    if view is not None and view not in ["front", "back"]:
+        raise HTTPException(status_code=400, detail="View must be 'front' or 'back'")
+    params = _page_params(MAPPINGS, limit, cursor, created_from, created_to)
+    mappings, position = storage.page_body_mappings(
+        view=view, session_id=session_id, sensation=sensation, **params
+    )
     
     return {
         "success": True,
         "data": {
-            "total": len(mappings),
-            "mappings": mappings
+            "count": len(mappings),
+            "mappings": mappings,
+            "next_cursor": encode_cursor(MAPPINGS, position) if position is not None else None
         },
         "message": "Body mappings retrieved successfully"
     }
 
 @router.get("/sessions/list")
-async def list_sessions() -> Dict[str, Any]:
-    """List all sessions"""
-    sessions = memory_storage.list_sessions()
+def list_sessions(
+    limit: int = settings.PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """List sessions, oldest first, a page at a time (see list_body_mappings)"""
+    sessions, position = storage.page_sessions(**_page_params(SESSIONS, limit, cursor, created_from, created_to))
     
     return {
         "success": True,
         "data": {
-            "total": len(sessions),
-            "sessions": sessions
+            "count": len(sessions),
+            "sessions": sessions,
+            "next_cursor": encode_cursor(SESSIONS, position) if position is not None else None
         },
         "message": "Sessions retrieved successfully"
     }
 
 @router.delete("/sessions/{session_id}")
-async def delete_session(session_id: str) -> Dict[str, Any]:
+def delete_session(session_id: str) -> Dict[str, Any]:
     """Delete a session and all its mappings"""
-    success = memory_storage.delete_session(session_id)
+    success = storage.delete_session(session_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -170,9 +217,9 @@ async def delete_session(session_id: str) -> Dict[str, Any]:
     }
 
 @router.get("/stats/overview")
-async def get_storage_stats() -> Dict[str, Any]:
+def get_storage_stats() -> Dict[str, Any]:
     """Get storage statistics"""
-    stats = memory_storage.get_stats()
+    stats = storage.get_stats()
     
     return {
         "success": True,
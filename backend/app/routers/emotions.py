@@ -3,16 +3,27 @@
 Emotions router for emotion analysis endpoints
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
-from pydantic import BaseModel
+import json
+import time
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional, Tuple, Union
+from pydantic import BaseModel, ValidationError
+from ..core.config import settings
+from ..services.cache_warmer import mine_patterns
 from ..services.emotion_analysis import EmotionAnalysisService
+from ..services.storage import storage
 
 # Request/Response models
 class EmotionAnalysisRequest(BaseModel):
     body_markings: Dict[str, str]
     view: str = "front"
 
+class CombinedAnalysisRequest(BaseModel):
+    front: Dict[str, Optional[str]] = {}
+    back: Dict[str, Optional[str]] = {}
+
 class EmotionAnalysisResponse(BaseModel):
     success: bool
     data: Dict[str, Any]
@@ -23,9 +34,90 @@ router = APIRouter(prefix="/emotions", tags=["emotions"])
 # Initialize the emotion analysis service
 emotion_service = EmotionAnalysisService()
 
+def resolve_timeout(endpoint: str, deadline_ms: Optional[int]) -> float:
+    """Seconds allowed from the request header or the endpoint default"""
+    if deadline_ms is not None and deadline_ms > 0:
+        return min(deadline_ms / 1000.0, settings.MAX_REQUEST_DEADLINE)
+    return settings.ENDPOINT_DEADLINES.get(endpoint, settings.MAX_REQUEST_DEADLINE)
+
+def resolve_deadline(endpoint: str, deadline_ms: Optional[int]) -> float:
+    """Absolute monotonic deadline from the request header or the endpoint default"""
+    return time.monotonic() + resolve_timeout(endpoint, deadline_ms)
+
+def validate_batch_item(raw: Any) -> Union[Tuple[Dict[str, str], str], str]:
+    """(body_markings, view) for a valid batch item, otherwise the error message"""
+    try:
+        item = EmotionAnalysisRequest.model_validate(raw)
+    except ValidationError as e:
+        return f"Invalid item: {e.errors()[0]['msg']}"
+    if not item.body_markings:
+        return "Body markings are required"
+    if item.view not in ["front", "back"]:
+        return "View must be 'front' or 'back'"
+    return item.body_markings, item.view
+
+def parse_batch_line(line: bytes) -> Union[Tuple[Dict[str, str], str], str]:
+    """One NDJSON line as a validated batch item or its error message"""
+    try:
+        return validate_batch_item(json.loads(line))
+    except ValueError:
+        return "Invalid JSON line"
+
+async def read_ndjson_items(request: Request) -> List[Union[Tuple[Dict[str, str], str], str]]:
+    """Validated items from an NDJSON request body, parsed line by line as it arrives.
+    
+    The body is read before the response starts: a streaming response keeps
+    reading ``receive`` to watch for disconnects, which would take body chunks.
+    Only each new chunk is split; a line still arriving is kept in pieces. A body
+    over BATCH_MAX_BYTES, a line over BATCH_MAX_LINE_BYTES or more than
+    BATCH_MAX_ITEMS items is a 413.
+    """
+    items = []
+    partial: List[bytes] = []
+    partial_bytes = 0
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > settings.BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_BYTES} bytes per batch")
+        *lines, rest = chunk.split(b"\n")
+        if lines:
+            lines[0] = b"".join(partial) + lines[0]
+            partial, partial_bytes = [], 0
+        partial.append(rest)
+        partial_bytes += len(rest)
+        if partial_bytes > settings.BATCH_MAX_LINE_BYTES or any(len(line) > settings.BATCH_MAX_LINE_BYTES for line in lines):
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_LINE_BYTES} bytes per line")
+        for line in lines:
+            if line.strip():
+                items.append(parse_batch_line(line))
+            if len(items) > settings.BATCH_MAX_ITEMS:
+                raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch")
+    tail = b"".join(partial)
+    if tail.strip():
+        items.append(parse_batch_line(tail))
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch")
+    return items
+
+async def read_json_body(request: Request) -> Any:
+    """The parsed JSON request body, read up to BATCH_MAX_BYTES (413 past it)"""
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > settings.BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_BYTES} bytes per batch")
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
 @router.post("/analyze", response_model=EmotionAnalysisResponse)
-async def analyze_emotions(request: EmotionAnalysisRequest) -> EmotionAnalysisResponse:
+async def analyze_emotions(
+    request: EmotionAnalysisRequest,
+    x_request_deadline_ms: Optional[int] = Header(None)
+) -> EmotionAnalysisResponse:
     """Analyze emotions from body sensations"""
+    deadline = resolve_deadline("analyze", x_request_deadline_ms)
     try:
         # Validate input
         if not request.body_markings:
@@ -35,7 +127,7 @@ async def analyze_emotions(request: EmotionAnalysisRequest) -> EmotionAnalysisRe
             raise HTTPException(status_code=400, detail="View must be 'front' or 'back'")
         
         # Analyze emotions using the service
-        result = emotion_service.analyze_emotions(request.body_markings, request.view)
+        result = await emotion_service.analyze_emotions(request.body_markings, request.view, deadline)
         
         return EmotionAnalysisResponse(
             success=True,
@@ -46,6 +138,112 @@ async def analyze_emotions(request: EmotionAnalysisRequest) -> EmotionAnalysisRe
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Emotion analysis failed: {str(e)}")
 
+@router.post("/analyze/full", response_model=EmotionAnalysisResponse)
+async def analyze_full_body(
+    request: CombinedAnalysisRequest,
+    x_request_deadline_ms: Optional[int] = Header(None)
+) -> EmotionAnalysisResponse:
+    """Analyze front and back markings together in a single LLM round trip"""
+    deadline = resolve_deadline("analyze_full", x_request_deadline_ms)
+    
+    # Drop unmarked regions and views without any marking
+    views = {}
+    for view, markings in (("front", request.front), ("back", request.back)):
+        marked = {region: sensation for region, sensation in markings.items() if sensation}
+        if marked:
+            views[view] = marked
+    
+    if not views:
+        raise HTTPException(status_code=400, detail="Body markings are required")
+    
+    try:
+        result = await emotion_service.analyze_views(views, deadline)
+        
+        return EmotionAnalysisResponse(
+            success=True,
+            data=result,
+            message="Emotion analysis completed successfully"
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Emotion analysis failed: {str(e)}")
+
+@router.post("/analyze/stream")
+async def analyze_emotions_stream(
+    request: EmotionAnalysisRequest,
+    accept: Optional[str] = Header(None),
+    x_request_deadline_ms: Optional[int] = Header(None)
+) -> StreamingResponse:
+    """Stream the local pattern result at once, then the LLM refinement.
+    
+    Responds with NDJSON by default, or Server-Sent Events when the client
+    sends ``Accept: text/event-stream``. Every event carries its ``source``.
+    """
+    if not request.body_markings:
+        raise HTTPException(status_code=400, detail="Body markings are required")
+    
+    if request.view not in ["front", "back"]:
+        raise HTTPException(status_code=400, detail="View must be 'front' or 'back'")
+    
+    deadline = resolve_deadline("analyze_stream", x_request_deadline_ms)
+    use_sse = accept is not None and "text/event-stream" in accept
+    
+    async def events():
+        async for event in emotion_service.stream_analysis(request.body_markings, request.view, deadline):
+            payload = json.dumps(event)
+            if use_sse:
+                name = "final" if event["final"] else "partial"
+                yield f"event: {name}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/analyze/batch")
+async def analyze_emotions_batch(
+    request: Request,
+    x_request_deadline_ms: Optional[int] = Header(None)
+) -> StreamingResponse:
+    """Analyze many ``{body_markings, view}`` items in one request.
+    
+    The body is a JSON list, or NDJSON (``Content-Type: application/x-ndjson``)
+    parsed line by line. The response is NDJSON streamed as results complete:
+    one line per item in input order with its ``status``, then a ``summary``
+    line with counts and items/sec. ``X-Request-Deadline-Ms`` applies per item.
+    """
+    item_timeout = resolve_timeout("analyze_batch_item", x_request_deadline_ms)
+    
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = await read_ndjson_items(request)
+    else:
+        try:
+            raw_items = await read_json_body(request)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON list or NDJSON")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON list or NDJSON")
+        if len(raw_items) > settings.BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch")
+        items = [validate_batch_item(raw) for raw in raw_items]
+    
+    async def item_stream():
+        for item in items:
+            yield item
+    
+    async def events():
+        async for event in emotion_service.analyze_batch(item_stream(), item_timeout):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/status")
 async def get_service_status() -> Dict[str, Any]:
     """Get the status of the emotion analysis service"""
@@ -59,9 +257,48 @@ async def get_service_status() -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get service status: {str(e)}")
 
+@router.post("/cache/invalidate")
+async def invalidate_result_cache(current_only: bool = False) -> Dict[str, Any]:
+    """Invalidate cached analysis results (e.g. after changing prompts or models)"""
+    removed = await emotion_service.llm_service.invalidate_cache(current_only)
+    return {
+        "success": True,
+        "data": {"removed": removed},
+        "message": "Result cache invalidated"
+    }
+
+@router.post("/cache/warm")
+async def warm_result_cache(top: Optional[int] = None) -> Dict[str, Any]:
+    """Start warming the result cache with the most frequent stored body-map patterns"""
+    if not emotion_service.llm_service.breakers:
+        raise HTTPException(status_code=400, detail="No remote LLM providers configured")
+    # Reading every stored mapping and counting patterns is CPU-bound: page through
+    # storage and mine in a worker thread so the event loop keeps serving requests
+    patterns, total = await run_in_threadpool(
+        mine_patterns, storage.iter_body_mappings(settings.PAGE_MAX_LIMIT)
+    )
+    started = emotion_service.start_cache_warming(patterns, total, top or settings.CACHE_WARM_TOP_PATTERNS)
+    if not started:
+        raise HTTPException(status_code=409, detail="Cache warming is already running")
+    return {
+        "success": True,
+        "data": {"mappings": total, "patterns": len(patterns)},
+        "message": "Cache warming started"
+    }
+
+@router.get("/cache/warm")
+async def get_cache_warming_status() -> Dict[str, Any]:
+    """Progress of cache warming and the last coverage report"""
+    return {
+        "success": True,
+        "data": emotion_service.get_cache_warming_status(),
+        "message": "Cache warming status retrieved successfully"
+    }
+
 @router.post("/test")
-async def test_emotion_analysis() -> Dict[str, Any]:
+async def test_emotion_analysis(x_request_deadline_ms: Optional[int] = Header(None)) -> Dict[str, Any]:
     """Test the emotion analysis service with sample data"""
+    deadline = resolve_deadline("test", x_request_deadline_ms)
     try:
         # Test with sample data
         test_markings = {
@@ -70,7 +307,7 @@ async def test_emotion_analysis() -> Dict[str, Any]:
             'left-arm': 'hot'
         }
         
-        result = emotion_service.analyze_emotions(test_markings, 'front')
+        result = await emotion_service.analyze_emotions(test_markings, 'front', deadline)
         
         return {
             "success": True,
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Cache Warmer
+Mines the most frequent body-map patterns from stored mappings (or an exported log) and
+precomputes their analyses at a controlled rate so the result cache is warm before peak.
+
+Run from the backend directory against an export (JSON list, {"mappings": [...]} or NDJSON):
+    python -m app.services.cache_warmer mappings.ndjson --top 1000 --rate 30 --off-peak 1-6
+Warmed results land in the shared L2 cache, so running workers pick them up.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core.config import settings
+from .quota_scheduler import BACKGROUND
+from .result_cache import canonical_markings
+
+# Rank cut-offs reported in the coverage table
+COVERAGE_RANKS = (10, 100, 1000, 10000)
+
+def mine_patterns(mappings: Iterable[Dict]) -> Tuple[List[Tuple[Dict[str, str], str, int]], int]:
+    """Distinct (body_markings, view, count) patterns, most frequent first, and the mapping count"""
+    counts = Counter()
+    examples: Dict[Tuple[str, str], Dict[str, str]] = {}
+    total = 0
+    for mapping in mappings:
+        markings = {region: sensation for region, sensation in (mapping.get('body_markings') or {}).items() if sensation}
+        view = mapping.get('view', 'front')
+        if not markings or view not in ('front', 'back'):
+            continue
+        key = (view, canonical_markings(markings))
+        counts[key] += 1
+        examples.setdefault(key, markings)
+        total += 1
+    return [(examples[key], key[0], count) for key, count in counts.most_common()], total
+
+def load_export(path: str) -> List[Dict]:
+    """Mappings from a JSON list, a {"mappings": [...]} API response, or NDJSON"""
+    with open(path) as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = data.get('data', data).get('mappings', [])
+    return data
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """"1-6" -> (1, 6): the local hours [start, end) during which warming may run"""
+    if not value:
+        return None
+    start, end = (int(part) for part in value.split('-'))
+    return start % 24, end % 24
+
+def in_window(hours: Optional[Tuple[int, int]], hour: int) -> bool:
+    if hours is None:
+        return True
+    start, end = hours
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+class CacheWarmer:
+    """Precomputes analyses for mined patterns through ``LLMService`` at ``rate_per_minute``.
+
+    Calls run one at a time at background priority, so they only use quota
+    that interactive traffic leaves over, and pause outside ``off_peak_hours``.
+    Patterns already cached, or answered by the local classifier bypass, count
+    as covered without a call.
+    """
+
+    def __init__(self, llm_service, rate_per_minute: float = 30.0,
+                 off_peak_hours: Optional[Tuple[int, int]] = None):
+        self.llm_service = llm_service
+        self.rate_per_minute = rate_per_minute
+        self.off_peak_hours = off_peak_hours
+        self.progress: Dict = {}
+
+    async def _wait_for_window(self) -> None:
+        while not in_window(self.off_peak_hours, datetime.now().hour):
+            self.progress['state'] = 'waiting_for_off_peak'
+            await asyncio.sleep(60)
+        self.progress['state'] = 'running'
+
+    async def run(self, mappings: Iterable[Dict], top: int, source: str = 'storage') -> Dict:
+        """Warm the ``top`` most frequent patterns; returns the coverage report"""
+        patterns, total = mine_patterns(mappings)
+        return await self.warm(patterns, total, top, source)
+
+    async def warm(self, patterns: List[Tuple[Dict[str, str], str, int]], total: int, top: int,
+                   source: str = 'storage') -> Dict:
+        """Warm the ``top`` of already mined ``patterns`` (from ``total`` mappings)"""
+        started = time.time()
+        considered = patterns[:top]
+        outcomes = Counter()
+        covered_traffic = 0
+        self.progress = {'state': 'running', 'done': 0, 'patterns': len(considered)}
+
+        interval = 60.0 / self.rate_per_minute if self.rate_per_minute > 0 else 0.0
+        next_call = time.monotonic()
+        for body_markings, view, count in considered:
+            if await self.llm_service.cached_result(body_markings, view) is not None:
+                outcome = 'already_cached'
+            else:
+                await self._wait_for_window()
+                await asyncio.sleep(max(0.0, next_call - time.monotonic()))
+                next_call = time.monotonic() + interval
+                outcome = await self._warm(body_markings, view)
+            outcomes[outcome] += 1
+            if outcome != 'failed':
+                covered_traffic += count
+            self.progress['done'] += 1
+            self.progress.update(outcomes)
+
+        report = {
+            'source': source,
+            'mappings': total,
+            'distinct_patterns': len(patterns),
+            'considered': len(considered),
+            'considered_traffic_share': self._share(sum(count for _, _, count in considered), total),
+            'already_cached': outcomes['already_cached'],
+            'warmed': outcomes['warmed'],
+            'local': outcomes['local'],
+            'failed': outcomes['failed'],
+            'coverage_traffic_share': self._share(covered_traffic, total),
+            'traffic_share_by_rank': {
+                f'top_{rank}': self._share(sum(count for _, _, count in patterns[:rank]), total)
+                for rank in COVERAGE_RANKS
+            },
+            'started_at': datetime.fromtimestamp(started).isoformat(),
+            'seconds': round(time.time() - started, 1)
+        }
+        self.progress['state'] = 'finished'
+        return report
+
+    async def _warm(self, body_markings: Dict[str, str], view: str) -> str:
+        deadline = time.monotonic() + settings.MAX_REQUEST_DEADLINE
+        try:
+            result = await self.llm_service.analyze_emotions(
+                body_markings, view, deadline, remote_only=True, priority=BACKGROUND
+            )
+        except Exception as e:
+            print(f"❌ Cache warming failed for {canonical_markings(body_markings)}: {e}")
+            return 'failed'
+        if not result:
+            return 'failed'
+        return 'local' if result.get('source') == 'local_classifier' else 'warmed'
+
+    @staticmethod
+    def _share(count: int, total: int) -> float:
+        return round(count / total, 4) if total else 0.0
+
+def main() -> None:
+    from .llm_service import LLMService
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('export', help='exported mappings (JSON list, API response or NDJSON)')
+    parser.add_argument('--top', type=int, default=settings.CACHE_WARM_TOP_PATTERNS)
+    parser.add_argument('--rate', type=float, default=settings.CACHE_WARM_RATE_PER_MINUTE,
+                        help='provider calls per minute')
+    parser.add_argument('--off-peak', default=settings.CACHE_WARM_OFF_PEAK_HOURS,
+                        help='local hours to run in, e.g. 1-6 (default: any time)')
+    parser.add_argument('--report', help='also write the coverage report to this JSON file')
+    args = parser.parse_args()
+
+    async def run() -> Dict:
+        llm_service = LLMService()
+        if not llm_service.breakers:
+            raise SystemExit("No remote LLM providers configured; nothing to warm")
+        await llm_service.startup()
+        try:
+            warmer = CacheWarmer(llm_service, args.rate, parse_hours(args.off_peak))
+            return await warmer.run(load_export(args.export), args.top, source=args.export)
+        finally:
+            await llm_service.shutdown()
+
+    report = asyncio.run(run())
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker
+Per-provider closed/open/half-open breaker driven by error rate, latency and HTTP status
+"""
+
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+class CircuitBreaker:
+    """Tracks recent call outcomes and decides whether a provider may be called"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_seconds: float = 10.0, open_seconds: float = 30.0,
+                 trip_statuses: Optional[List[int]] = None):
+        self.window = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.trip_statuses = set(trip_statuses or [])
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.last_status: Optional[int] = None
+        self.last_reason: Optional[str] = None
+
+    def allow_request(self) -> bool:
+        """Only a closed circuit serves live traffic; recovery is probed separately"""
+        return self.state == self.CLOSED
+
+    def ready_for_probe(self) -> bool:
+        """True once an open circuit has cooled down and may be probed (moves to half-open)"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+        return self.state == self.HALF_OPEN
+
+    def record_success(self, latency: float) -> None:
+        """Record a successful call; slow successes count against the error rate"""
+        if self.state == self.HALF_OPEN:
+            self._close()
+            return
+        slow = latency >= self.slow_call_seconds
+        self.window.append(slow)
+        if slow:
+            self._check_error_rate('slow calls')
+
+    def record_failure(self, status_code: Optional[int] = None) -> None:
+        """Record a failed call; quota/auth statuses trip the breaker immediately"""
+        self.last_status = status_code
+        if self.state == self.HALF_OPEN:
+            self._open('probe failed')
+            return
+        if status_code in self.trip_statuses:
+            self._open(f'HTTP {status_code}')
+            return
+        self.window.append(True)
+        self._check_error_rate('error rate')
+
+    def _check_error_rate(self, reason: str) -> None:
+        if self.state != self.CLOSED or len(self.window) < self.min_calls:
+            return
+        if sum(self.window) / len(self.window) >= self.error_rate:
+            self._open(reason)
+
+    def _open(self, reason: str) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self.last_reason = reason
+        self.window.clear()
+
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self.window.clear()
+
+    def to_dict(self) -> Dict:
+        """Breaker state for status reporting"""
+        failures = sum(self.window)
+        return {
+            'state': self.state,
+            'error_rate': round(failures / len(self.window), 3) if self.window else 0.0,
+            'trips': self.trips,
+            'last_status': self.last_status,
+            'last_reason': self.last_reason,
+            'open_for_seconds': round(time.monotonic() - self.opened_at, 1) if self.state != self.CLOSED else 0.0
+        }
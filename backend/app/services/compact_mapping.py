@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Compact Mapping
+Bit-packed body mapping records for MemoryStorage. Each known region's sensation is a
+3-bit code (0 = unmarked) in one integer, the view takes two more bits and timestamps
+are epoch microseconds; records decode to the API's JSON shape only when handed out.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from .local_classifier import REGIONS, SENSATIONS, VIEWS
+
+SENSATION_BITS = 3
+_REGION_SHIFT = {region: index * SENSATION_BITS for index, region in enumerate(REGIONS)}
+_SENSATION_CODE = {sensation: code for code, sensation in enumerate(SENSATIONS, start=1)}
+_SENSATION_MASK = (1 << SENSATION_BITS) - 1
+# Two view bits after the regions: 0 front, 1 back, 3 = spelled out in ``extra``
+VIEW_SHIFT = len(REGIONS) * SENSATION_BITS
+_VIEW_CODE = {view: code for code, view in enumerate(VIEWS)}
+_VIEW_OTHER = 3
+
+# Decoding tables: the (region, sensation) pair for every possible 3-bit field value
+# in place, and the shift of the field holding each bit
+_FIELD_PAIR = {
+    code << shift: (region, sensation)
+    for region, shift in _REGION_SHIFT.items()
+    for sensation, code in _SENSATION_CODE.items()
+}
+_BIT_SHIFT = tuple(bit - bit % SENSATION_BITS for bit in range(VIEW_SHIFT))
+_MARKINGS_MASK = (1 << VIEW_SHIFT) - 1
+# The lowest and the highest bit of every region's field
+_FIELD_LOW_BITS = sum(1 << shift for shift in _REGION_SHIFT.values())
+_FIELD_HIGH_BITS = _FIELD_LOW_BITS << SENSATION_BITS - 1
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def pack(body_markings: Dict[str, str], view: str) -> Tuple[int, Optional[Dict]]:
+    """(packed markings and view, extra) where extra holds whatever the codes cannot
+    express (regions or sensations outside the vocabulary, other views), usually None"""
+    packed = 0
+    unknown = None
+    for region, sensation in body_markings.items():
+        shift = _REGION_SHIFT.get(region)
+        code = _SENSATION_CODE.get(sensation)
+        if shift is None or code is None:
+            if unknown is None:
+                unknown = {}
+            unknown[region] = sensation
+        else:
+            packed |= code << shift
+    view_bits = _VIEW_CODE.get(view, _VIEW_OTHER)
+    packed |= view_bits << VIEW_SHIFT
+    if unknown is None and view_bits != _VIEW_OTHER:
+        return packed, None
+    return packed, {'markings': unknown or {}, 'view': view if view_bits == _VIEW_OTHER else None}
+
+def unpack_markings(packed: int, extra: Optional[Dict] = None) -> Dict[str, str]:
+    """Region -> sensation dict (known regions in REGIONS order, then any extras)"""
+    markings = {}
+    bits = packed & _MARKINGS_MASK
+    # Visit only marked regions: find the lowest set bit, take its whole field
+    while bits:
+        shift = _BIT_SHIFT[(bits & -bits).bit_length() - 1]
+        field = bits & _SENSATION_MASK << shift
+        region, sensation = _FIELD_PAIR[field]
+        markings[region] = sensation
+        bits ^= field
+    if extra is not None:
+        markings.update(extra['markings'])
+    return markings
+
+def unpack_view(packed: int, extra: Optional[Dict] = None) -> str:
+    code = packed >> VIEW_SHIFT & 3
+    return extra['view'] if code == _VIEW_OTHER else VIEWS[code]
+
+def view_code(view: str) -> int:
+    """The view's 2-bit code (3 for any view outside VIEWS)"""
+    return _VIEW_CODE.get(view, _VIEW_OTHER)
+
+def sensation_code(sensation: str) -> Optional[int]:
+    """The sensation's 3-bit code, or None if it is outside SENSATIONS"""
+    return _SENSATION_CODE.get(sensation)
+
+def sensation_codes(packed: int, extra: Optional[Dict] = None) -> Set[int]:
+    """Codes of the known sensations marked anywhere in a mapping (including on
+    regions outside the vocabulary, kept in ``extra``)"""
+    codes = set()
+    bits = packed & _MARKINGS_MASK
+    while bits:
+        shift = _BIT_SHIFT[(bits & -bits).bit_length() - 1]
+        field = bits & _SENSATION_MASK << shift
+        codes.add(field >> shift)
+        bits ^= field
+    if extra is not None:
+        codes.update(_SENSATION_CODE[sensation] for sensation in extra['markings'].values() if sensation in _SENSATION_CODE)
+    return codes
+
+def has_sensation(packed: int, extra: Optional[Dict], sensation: str) -> bool:
+    """Whether any region of the mapping is marked with ``sensation``"""
+    code = _SENSATION_CODE.get(sensation)
+    if code is not None:
+        # Fields holding the code become zero, which the classic has-zero-field trick
+        # detects for all regions at once
+        fields = (packed & _MARKINGS_MASK) ^ _FIELD_LOW_BITS * code
+        if (fields - _FIELD_LOW_BITS) & ~fields & _FIELD_HIGH_BITS:
+            return True
+    return extra is not None and sensation in extra['markings'].values()
+
+def epoch_us(moment: Optional[datetime] = None) -> int:
+    """Local wall-clock time as integer microseconds since 1970-01-01 (no time zone
+    conversion either way, so decoding is cheap and exact)"""
+    return ((moment or datetime.now()) - _EPOCH) // _MICROSECOND
+
+def isoformat(us: int) -> str:
+    """Epoch microseconds back to the ISO string the API has always returned"""
+    return (_EPOCH + timedelta(microseconds=us)).isoformat()
+
+class CompactMapping:
+    """One stored body mapping, in about a third of the memory of the nested dicts it replaces.
+
+    ``session_id`` should be the session's own key string so the record shares
+    it rather than holding a copy.
+    """
+
+    __slots__ = ('id', 'session_id', 'packed', 'created', 'extra')
+
+    def __init__(self, mapping_id: int, session_id: str, body_markings: Dict[str, str],
+                 view: str, created: Optional[int] = None):
+        self.id = mapping_id
+        self.session_id = session_id
+        self.packed, self.extra = pack(body_markings, view)
+        self.created = epoch_us() if created is None else created
+
+    @property
+    def body_markings(self) -> Dict[str, str]:
+        return unpack_markings(self.packed, self.extra)
+
+    @property
+    def view(self) -> str:
+        return unpack_view(self.packed, self.extra)
+
+    @classmethod
+    def from_packed(cls, mapping_id: int, session_id: str, packed: int, extra: Optional[Dict],
+                    created: int) -> 'CompactMapping':
+        """A record from already packed fields (e.g. a database row)"""
+        record = cls.__new__(cls)
+        record.id = mapping_id
+        record.session_id = session_id
+        record.packed = packed
+        record.extra = extra
+        record.created = created
+        return record
+
+    def nbytes(self) -> int:
+        """Bytes this record holds on its own (``id`` and ``session_id`` are shared with the storage keys)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.packed) + sys.getsizeof(self.created)
+        if self.extra is not None:
+            size += sys.getsizeof(self.extra) + sum(
+                sys.getsizeof(key) + sys.getsizeof(value) for key, value in self.extra['markings'].items()
+            )
+        return size
+
+    def to_dict(self) -> Dict:
+        """The JSON shape served by the API"""
+        return {
+            'id': str(self.id),
+            'session_id': self.session_id,
+            'body_markings': unpack_markings(self.packed, self.extra),
+            'view': unpack_view(self.packed, self.extra),
+            'created_at': isoformat(self.created)
+        }
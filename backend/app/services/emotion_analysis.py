@@ -4,8 +4,16 @@ Emotion Analysis Service
 Uses LLM service with priority: Gemini API -> OpenAI API -> Local patterns
 """
 
-from typing import Dict, List
+import asyncio
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from ..core.config import settings
+from . import local_patterns
+from .cache_warmer import CacheWarmer, parse_hours
 from .llm_service import LLMService
+from .quota_scheduler import BATCH, INTERACTIVE
+from .result_cache import canonical_key
 
 class EmotionAnalysisService:
     """Service for analyzing emotions from body sensations"""
@@ -14,150 +22,374 @@ class EmotionAnalysisService:
         # Initialize the LLM service with priority order
         self.llm_service = LLMService()
         
-        # Keep the original patterns as a backup
-        self.EMOTION_PATTERNS = {
-            'hot': {
-                'head': ['Anger', 'Stress', 'Frustration'],
-                'chest': ['Anxiety', 'Excitement', 'Anger'],
-                'stomach': ['Nervousness', 'Excitement', 'Anger'],
-                'arms': ['Tension', 'Stress', 'Anger'],
-                'legs': ['Tension', 'Stress', 'Anger']
-            },
-            'warm': {
-                'head': ['Contentment', 'Happiness', 'Calm'],
-                'chest': ['Love', 'Happiness', 'Contentment'],
-                'stomach': ['Contentment', 'Happiness', 'Calm'],
-                'arms': ['Relaxation', 'Contentment', 'Happiness'],
-                'legs': ['Relaxation', 'Contentment', 'Happiness']
-            },
-            'cold': {
-                'head': ['Fear', 'Shock', 'Sadness'],
-                'chest': ['Fear', 'Sadness', 'Withdrawal'],
-                'stomach': ['Fear', 'Anxiety', 'Sadness'],
-                'arms': ['Fear', 'Withdrawal', 'Sadness'],
-                'legs': ['Fear', 'Withdrawal', 'Sadness']
-            },
-            'cool': {
-                'head': ['Calm', 'Peace', 'Relaxation'],
-                'chest': ['Calm', 'Peace', 'Relaxation'],
-                'stomach': ['Calm', 'Peace', 'Relaxation'],
-                'arms': ['Calm', 'Peace', 'Relaxation'],
-                'legs': ['Calm', 'Peace', 'Relaxation']
-            },
-            'numb': {
-                'head': ['Shock', 'Disconnection', 'Trauma'],
-                'chest': ['Shock', 'Disconnection', 'Trauma'],
-                'stomach': ['Shock', 'Disconnection', 'Trauma'],
-                'arms': ['Shock', 'Disconnection', 'Trauma'],
-                'legs': ['Shock', 'Disconnection', 'Trauma']
-            }
+        # In-flight analyses shared by concurrent identical requests
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.coalescing_stats = {'leaders': 0, 'followers': 0, 'follower_timeouts': 0}
+        
+        # Background cache warming from stored mappings
+        self.cache_warmer = CacheWarmer(
+            self.llm_service,
+            rate_per_minute=settings.CACHE_WARM_RATE_PER_MINUTE,
+            off_peak_hours=parse_hours(settings.CACHE_WARM_OFF_PEAK_HOURS)
+        )
+        self._warm_task: Optional[asyncio.Task] = None
+        self.last_warm_report: Optional[Dict] = None
+        
+        # Totals across /analyze/batch requests, plus the last request's summary
+        self.batch_totals = Counter()
+        self.last_batch: Dict = {}
+    
+    async def startup(self) -> None:
+        """Open long-lived provider resources"""
+        await self.llm_service.startup()
+    
+    async def shutdown(self) -> None:
+        """Release long-lived provider resources"""
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+        await self.llm_service.shutdown()
+    
+    def start_cache_warming(self, patterns: List[Tuple[Dict[str, str], str, int]], total: int, top: int) -> bool:
+        """Warm the cache from mined ``patterns`` in the background; False if a run is in progress"""
+        if self._warm_task is not None and not self._warm_task.done():
+            return False
+        
+        async def warm() -> None:
+            try:
+                self.last_warm_report = await self.cache_warmer.warm(patterns, total, top)
+            except Exception as e:
+                print(f"❌ Cache warming failed: {e}")
+                self.cache_warmer.progress['state'] = 'failed'
+        
+        self._warm_task = asyncio.create_task(warm())
+        return True
+    
+    def get_cache_warming_status(self) -> Dict:
+        """Progress of the current run and the last coverage report"""
+        return {
+            'progress': self.cache_warmer.progress,
+            'last_report': self.last_warm_report
         }
     
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Dict:
-        """Analyze emotions using the prioritized LLM service"""
+    async def _coalesced_analysis(self, body_markings: Dict[str, str], view: str,
+                                  deadline: Optional[float], remote_only: bool = False,
+                                  priority: int = INTERACTIVE, local_checked: bool = False) -> Optional[Dict]:
+        """Await the in-flight analysis for an identical request, starting one if needed.
+        
+        The shared call runs as its own task and each caller awaits it through
+        ``asyncio.shield``, so a disconnecting client only cancels its own wait.
+        Only requests of the same priority share a call, and a follower waits no
+        longer than its own deadline: past it, it gets None (the caller's local
+        fallback) while the shared call carries on for the others.
+        """
+        if not settings.REQUEST_COALESCING_ENABLED:
+            return await self.llm_service.analyze_emotions(body_markings, view, deadline, remote_only,
+                                                           priority, local_checked)
+        
+        key = f"{priority}|{canonical_key(body_markings, view, self.llm_service.cache_namespace())}"
+        if remote_only:
+            key = f"remote|{key}"
+        task = self._in_flight.get(key)
+        if task is None:
+            self.coalescing_stats['leaders'] += 1
+            task = asyncio.create_task(
+                self.llm_service.analyze_emotions(body_markings, view, deadline, remote_only,
+                                                  priority, local_checked)
+            )
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_in_flight(key, done))
+            return await asyncio.shield(task)
+        
+        self.coalescing_stats['followers'] += 1
+        print("🔗 Joining in-flight analysis for identical markings")
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.coalescing_stats['follower_timeouts'] += 1
+            print("⏱️  Deadline reached while waiting on the shared analysis")
+            return None
+    
+    def _finish_in_flight(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished shared call (and mark its error retrieved if nobody was left waiting)"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+    
+    def _neighbor_result(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Result of a previously analyzed map within NEIGHBOR_MAX_DISTANCE bits, labelled with its distance"""
+        if not settings.NEIGHBOR_INDEX_ENABLED or not body_markings:
+            return None
+        match = self.llm_service.neighbors.nearest(body_markings, view, settings.NEIGHBOR_MAX_DISTANCE)
+        if match is None:
+            return None
+        distance, result = match
+        print(f"🧭 Serving analyzed neighbour at distance {distance}")
+        return {**result, 'neighbor_distance': distance}
+    
+    async def analyze_emotions(self, body_markings: Dict[str, str], view: str,
+                               deadline: Optional[float] = None, priority: int = INTERACTIVE) -> Dict:
+        """Analyze emotions using the prioritized LLM service within an optional deadline"""
         try:
             print(f"🧠 Analyzing emotions with LLM service...")
             print(f"   Body markings: {body_markings}")
             print(f"   View: {view}")
             
+            neighbor = self._neighbor_result(body_markings, view)
+            if neighbor is not None:
+                return neighbor
+            
             # Use the LLM service (Gemini -> OpenAI -> Local patterns)
-            result = self.llm_service.analyze_emotions(body_markings, view)
+            result = await self._coalesced_analysis(body_markings, view, deadline, priority=priority)
             
             if result:
+                result = self._primary_result(result)
                 print(f"✅ Emotion analysis successful: {result.get('emotion', 'Unknown')}")
                 return result
             else:
                 print("⚠️  LLM service failed, using local patterns")
-                return self._local_pattern_analysis(body_markings)
+                return self._primary_result(self._local_pattern_analysis(body_markings))
                 
         except Exception as e:
             print(f"❌ Emotion analysis failed: {e}")
             print("🔄 Falling back to local pattern analysis")
-            return self._local_pattern_analysis(body_markings)
+            return self._primary_result(self._local_pattern_analysis(body_markings))
     
-    def _local_pattern_analysis(self, body_markings: Dict[str, str]) -> Dict:
-        """Fallback to local pattern matching"""
-        # Count different sensation types
-        hot_count = sum(1 for sensation in body_markings.values() if sensation == 'hot')
-        warm_count = sum(1 for sensation in body_markings.values() if sensation == 'warm')
-        cold_count = sum(1 for sensation in body_markings.values() if sensation == 'cold')
-        cool_count = sum(1 for sensation in body_markings.values() if sensation == 'cool')
-        numb_count = sum(1 for sensation in body_markings.values() if sensation == 'numb')
-        
-        # Analyze patterns
-        results = []
-        
-        # Pattern 1: High energy (hot sensations)
-        if hot_count >= 2:
-            results.append({
-                'emotion': 'Anger/Excitement',
-                'confidence': 0.8,
-                'description': 'Multiple hot sensations suggest high energy emotions like anger or excitement',
-                'patterns': [f'{hot_count} hot sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 2: Positive warmth
-        if warm_count >= 2 and hot_count == 0:
-            results.append({
-                'emotion': 'Happiness/Contentment',
-                'confidence': 0.7,
-                'description': 'Warm sensations without hot suggest positive emotional state',
-                'patterns': [f'{warm_count} warm sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 3: Withdrawal (cold sensations)
-        if cold_count >= 2:
-            results.append({
-                'emotion': 'Sadness/Withdrawal',
-                'confidence': 0.7,
-                'description': 'Cold sensations suggest emotional withdrawal or sadness',
-                'patterns': [f'{cold_count} cold sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 4: Anxiety (mixed hot and cold)
-        if hot_count >= 1 and cold_count >= 1:
-            results.append({
-                'emotion': 'Anxiety/Stress',
-                'confidence': 0.6,
-                'description': 'Mixed hot and cold sensations suggest anxiety or stress',
-                'patterns': [f'{hot_count} hot, {cold_count} cold'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 5: Numbness
-        if numb_count >= 1:
-            results.append({
-                'emotion': 'Disconnection/Shock',
-                'confidence': 0.6,
-                'description': 'Numb sensations suggest emotional disconnection or shock',
-                'patterns': [f'{numb_count} numb sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # If no clear patterns, provide general analysis
-        if not results:
-            total_sensations = len([s for s in body_markings.values() if s])
-            if total_sensations == 0:
-                results.append({
-                    'emotion': 'Neutral/Calm',
-                    'confidence': 0.8,
-                    'description': 'No significant sensations detected, suggesting a calm state',
-                    'patterns': ['no sensations'],
-                    'source': 'local_pattern_analysis'
-                })
-            else:
-                results.append({
-                    'emotion': 'Mixed/Complex',
-                    'confidence': 0.5,
-                    'description': f'Complex pattern of {total_sensations} sensations suggests mixed emotions',
-                    'patterns': [f'{total_sensations} total sensations'],
-                    'source': 'local_pattern_analysis'
-                })
+    @staticmethod
+    def _primary_result(result: object) -> Dict:
+        """The result itself, or the most confident of a list of local pattern results"""
+        if isinstance(result, (list, tuple)):
+            return dict(max(result, key=lambda item: item.get('confidence', 0.0)))
+        return result
+    
+    async def analyze_views(self, views: Dict[str, Dict[str, str]],
+                            deadline: Optional[float] = None) -> Dict:
+        """Analyze front and back together: per-view results plus a merged result"""
+        per_view = {}
+        for view, body_markings in views.items():
+            neighbor = self._neighbor_result(body_markings, view)
+            if neighbor is not None:
+                per_view[view] = neighbor
+        
+        remaining = {view: body_markings for view, body_markings in views.items() if view not in per_view}
+        if remaining:
+            try:
+                per_view.update(await self.llm_service.analyze_views(remaining, deadline))
+            except Exception as e:
+                print(f"❌ Combined analysis failed: {e}")
+                print("🔄 Falling back to local pattern analysis")
+        
+        for view, body_markings in views.items():
+            if not per_view.get(view):
+                per_view[view] = self._local_pattern_analysis(body_markings)
+        
+        return {
+            'views': per_view,
+            'merged': self._merge_results(per_view)
+        }
+    
+    def _merge_results(self, per_view: Dict[str, object]) -> Dict:
+        """Combine per-view results into one: strongest emotion, all patterns"""
+        candidates = []
+        for view, result in per_view.items():
+            # Local pattern analysis returns a list of candidate emotions
+            for item in (result if isinstance(result, (list, tuple)) else [result]):
+                candidates.append((view, item))
+        
+        if not candidates:
+            return {}
+        
+        _, strongest = max(candidates, key=lambda candidate: candidate[1].get('confidence', 0.0))
+        patterns = []
+        for view, item in candidates:
+            for pattern in item.get('patterns', []):
+                tagged = f"{view}: {pattern}"
+                if tagged not in patterns:
+                    patterns.append(tagged)
+        
+        return {
+            'emotion': strongest.get('emotion', 'Unknown'),
+            'confidence': strongest.get('confidence', 0.0),
+            'description': " ".join(
+                f"{view.capitalize()}: {item.get('description', '')}" for view, item in candidates
+            ),
+            'patterns': patterns,
+            'source': "+".join(sorted({item.get('source', 'unknown') for _, item in candidates}))
+        }
+    
+    async def stream_analysis(self, body_markings: Dict[str, str], view: str,
+                              deadline: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Yield the local pattern result immediately, then the remote LLM refinement.
         
-        return results
+        The refinement skips the local classifier bypass: a confident local answer
+        is not a refinement, so without a remote one the local result stands.
+        """
+        yield {
+            'source': 'local_pattern_analysis',
+            'final': False,
+            'result': self._local_pattern_analysis(body_markings)
+        }
+        
+        try:
+            refined = await self._coalesced_analysis(body_markings, view, deadline, remote_only=True,
+                                                     local_checked=True)
+        except Exception as e:
+            print(f"❌ Remote refinement failed: {e}")
+            refined = None
+        
+        if refined:
+            yield {
+                'source': refined.get('source', 'remote_api'),
+                'final': True,
+                'result': refined
+            }
+        else:
+            yield {
+                'source': 'local_pattern_analysis',
+                'final': True,
+                'result': None,
+                'message': 'No remote refinement available; the local result stands'
+            }
+    
+    async def analyze_batch(self, items: AsyncIterator[Union[Tuple[Dict[str, str], str], str]],
+                            item_timeout: float) -> AsyncIterator[Dict]:
+        """Analyze many (body_markings, view) items, yielding one entry per item in input order.
+        
+        Items are taken in chunks of BATCH_CHUNK_SIZE as they arrive; a string
+        item is a validation error reported for that position. Identical maps
+        (by canonical key) are analyzed once. Each chunk goes through the local
+        classifier in one vectorized pass and the neighbour index; the rest go
+        to the providers at batch priority, at most BATCH_MAX_CONCURRENCY at a
+        time, each with ``item_timeout`` seconds. The last entry is a summary
+        with throughput.
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        namespace = self.llm_service.cache_namespace()
+        semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+        # Bounds how far reading the input can run ahead of the response
+        order: asyncio.Queue = asyncio.Queue(maxsize=settings.BATCH_MAX_PENDING)
+        analyses: Dict[str, Tuple[int, asyncio.Future]] = {}
+        tasks = set()
+        counts = Counter()
+        
+        async def analyze_remote(body_markings: Dict[str, str], view: str, future: asyncio.Future) -> None:
+            async with semaphore:
+                try:
+                    result = await self._coalesced_analysis(body_markings, view, time.monotonic() + item_timeout,
+                                                            priority=BATCH, local_checked=True)
+                except Exception as e:
+                    print(f"❌ Batch item analysis failed: {e}")
+                    result = None
+            future.set_result(result or self._local_pattern_analysis(body_markings))
+        
+        def run_chunk(chunk: List[Tuple[int, object]]) -> List[Tuple]:
+            """Dedupe and start the chunk's analyses; returns its entries for the order queue"""
+            entries, new = [], []
+            for index, item in chunk:
+                if isinstance(item, str):
+                    entries.append((index, None, None, item))
+                    continue
+                body_markings, view = item
+                key = canonical_key(body_markings, view, namespace)
+                if key in analyses:
+                    first, future = analyses[key]
+                    entries.append((index, future, first, None))
+                    continue
+                future = loop.create_future()
+                analyses[key] = (index, future)
+                entries.append((index, future, None, None))
+                new.append((body_markings, view, future))
+            
+            confident = self.llm_service.confident_local_results([(m, v) for m, v, _ in new])
+            for (body_markings, view, future), local in zip(new, confident):
+                if local is not None:
+                    counts['local'] += 1
+                    future.set_result(local)
+                    continue
+                neighbor = self._neighbor_result(body_markings, view)
+                if neighbor is not None:
+                    counts['neighbor'] += 1
+                    future.set_result(neighbor)
+                    continue
+                counts['remote'] += 1
+                task = asyncio.create_task(analyze_remote(body_markings, view, future))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            return entries
+        
+        async def produce() -> None:
+            chunk = []
+            index = 0
+            async for item in items:
+                chunk.append((index, item))
+                index += 1
+                if len(chunk) >= settings.BATCH_CHUNK_SIZE:
+                    for entry in run_chunk(chunk):
+                        await order.put(entry)
+                    chunk = []
+            for entry in run_chunk(chunk):
+                await order.put(entry)
+            await order.put(None)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                get = asyncio.ensure_future(order.get())
+                await asyncio.wait({get, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if not get.done() and producer.done() and producer.exception() is not None:
+                    # Reading the input failed (e.g. the client went away)
+                    get.cancel()
+                    raise producer.exception()
+                entry = await get
+                if entry is None:
+                    break
+                index, future, duplicate_of, error = entry
+                counts['items'] += 1
+                if error is not None:
+                    counts['invalid'] += 1
+                    yield {'index': index, 'status': 'invalid', 'error': error}
+                    continue
+                result = await future
+                event = {'index': index, 'status': 'ok', 'source': self._result_source(result), 'result': result}
+                if duplicate_of is not None:
+                    counts['duplicates'] += 1
+                    event['duplicate_of'] = duplicate_of
+                yield event
+        finally:
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+        
+        seconds = time.monotonic() - started
+        summary = {
+            'items': counts['items'],
+            'unique': len(analyses),
+            'duplicates': counts['duplicates'],
+            'invalid': counts['invalid'],
+            'local': counts['local'],
+            'neighbor': counts['neighbor'],
+            'remote': counts['remote'],
+            'seconds': round(seconds, 3),
+            'items_per_second': round(counts['items'] / seconds, 1) if seconds > 0 else 0.0
+        }
+        self.batch_totals['requests'] += 1
+        self.batch_totals.update({k: v for k, v in summary.items() if isinstance(v, int)})
+        self.last_batch = summary
+        yield {'summary': summary}
+    
+    @staticmethod
+    def _result_source(result: object) -> str:
+        """Source of an LLM result or of the first local pattern result"""
+        if isinstance(result, (list, tuple)):
+            result = result[0] if result else {}
+        return result.get('source', 'unknown')
+    
+    def _local_pattern_analysis(self, body_markings: Dict[str, str]) -> Tuple[Dict, ...]:
+        """Fallback to local pattern matching"""
+        return local_patterns.analyze(body_markings)
     
     def get_service_status(self) -> Dict:
         """Get the status of the emotion analysis service"""
@@ -166,5 +398,21 @@ class EmotionAnalysisService:
             'status': 'active',
             'llm_providers': len(self.llm_service.providers),
             'primary_provider': 'Gemini API' if self.llm_service.providers else 'Local patterns only',
-            'fallback_available': True
+            'fallback_available': True,
+            'connection_pools': self.llm_service.get_pool_stats(),
+            'provider_stats': self.llm_service.get_provider_stats(),
+            'circuit_breakers': self.llm_service.get_breaker_states(),
+            'provider_order': [p.__class__.__name__ for p in self.llm_service.ordered_providers()],
+            'result_cache': self.llm_service.cache.get_stats(),
+            'result_cache_l2': self.llm_service.l2_cache.get_stats() if self.llm_service.l2_cache else None,
+            'batching': self.llm_service.get_batch_stats(),
+            'quotas': self.llm_service.get_quota_stats(),
+            'local_classifier': self.llm_service.get_bypass_stats(),
+            'neighbor_index': {
+                **self.llm_service.neighbors.get_stats(),
+                'max_distance': settings.NEIGHBOR_MAX_DISTANCE
+            },
+            'hedging_enabled': settings.LLM_HEDGE_ENABLED,
+            'coalescing': {**self.coalescing_stats, 'in_flight': len(self._in_flight)},
+            'batch_analysis': {'totals': dict(self.batch_totals), 'last': self.last_batch}
         }
@@ -6,111 +6,250 @@ Prioritizes: 1) Gemini API, 2) OpenAI API, 3) Local pattern matching
 
 import os
 import json
-import requests
-from typing import Dict, List, Optional
+import time
+import asyncio
+import httpx
+from typing import Dict, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from ..core.config import settings
+from .provider_stats import ProviderStats
+from .circuit_breaker import CircuitBreaker
+from . import local_classifier, local_patterns
+from .result_cache import ResultCache, canonical_key
+from .micro_batcher import MicroBatcher
+from .neighbor_index import NeighborIndex
+from .persistent_cache import PersistentResultCache
+from .quota_scheduler import (
+    BACKGROUND, INTERACTIVE, PRIORITY_NAMES, OutboundScheduler, ProviderQuota
+)
+
+# Bump whenever the analysis prompt changes so cached results are not reused
+PROMPT_VERSION = 1
+
+# Fields a provider's JSON answer must contain to be used as-is
+REQUIRED_FIELDS = ['emotion', 'confidence', 'description', 'patterns', 'source']
+
+class ProviderHTTPError(Exception):
+    """Raised by remote providers on a non-200 response so callers can react to the status"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
+    async def startup(self) -> None:
+        """Acquire long-lived resources (no-op by default)"""
+        pass
+    
+    async def shutdown(self) -> None:
+        """Release long-lived resources (no-op by default)"""
+        pass
+    
     @abstractmethod
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+    async def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
         """Analyze emotions using the LLM provider"""
         pass
 
-class GeminiProvider(LLMProvider):
-    """Google Gemini API provider - PRIMARY SERVICE"""
+class HTTPProvider(LLMProvider):
+    """Base class for remote providers that own a pooled keep-alive HTTP client"""
     
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
-        self.model = "gemini-1.5-flash"
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.pool_stats = {
+            'requests': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'saturated': 0,
+            'connections_opened': 0
+        }
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Build the pooled client from the connection settings"""
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                settings.LLM_READ_TIMEOUT,
+                connect=settings.LLM_CONNECT_TIMEOUT
+            )
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client; created lazily if startup() was not called"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+    
+    async def startup(self) -> None:
+        """Open the connection pool"""
+        if self._client is None:
+            self._client = self._create_client()
+    
+    async def shutdown(self) -> None:
+        """Close the connection pool and its keep-alive connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _trace(self, event: str, info: Dict) -> None:
+        """httpcore trace hook, used to count fresh TCP connections"""
+        if event == "connection.connect_tcp.complete":
+            self.pool_stats['connections_opened'] += 1
     
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
-        """Analyze emotions using Gemini API"""
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        """POST through the pool while tracking usage counters"""
+        stats = self.pool_stats
+        stats['requests'] += 1
+        if stats['in_flight'] >= settings.LLM_POOL_MAX_CONNECTIONS:
+            stats['saturated'] += 1
+        stats['in_flight'] += 1
+        stats['peak_in_flight'] = max(stats['peak_in_flight'], stats['in_flight'])
         try:
-            # Create a prompt for emotion analysis
+            return await self.client.post(url, extensions={'trace': self._trace}, **kwargs)
+        finally:
+            stats['in_flight'] -= 1
+    
+    # Per-provider identity used in prompts, results and logs
+    label = "Remote"
+    source = "remote_api"
+    description_prefix = "AI analysis"
+    pattern_tag = "ai_analysis"
+    max_output_tokens = 1024
+    
+    # Requests/tokens per minute allowed by the provider account (0 = unlimited)
+    rpm = 0
+    tpm = 0
+    
+    def estimate_tokens(self, body_markings: Dict[str, str], view: str) -> int:
+        """Rough token cost of one call: prompt (~4 chars/token) plus the output cap"""
+        return len(self._build_prompt(body_markings, view)) // 4 + self.max_output_tokens
+    
+    @abstractmethod
+    async def _generate(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Send a prompt and return the generated text (raise ProviderHTTPError on non-200)"""
+        pass
+    
+    def _build_prompt(self, body_markings: Dict[str, str], view: str) -> str:
+        """Prompt for a single body map"""
+        sensations = ", ".join([f"{region}: {sensation}" for region, sensation in body_markings.items() if sensation])
+        
+        prompt = f"""
+        Analyze the emotional state based on these body sensations from the {view} view:
+        {sensations}
+        
+        Please provide:
+        1. Primary emotion(s) detected
+        2. Confidence level (0.0-1.0)
+        3. Brief explanation
+        4. Any patterns you notice
+        
+        Format your response as JSON with these fields:
+        - emotion: string
+        - confidence: float
+        - description: string
+        - patterns: array of strings
+        - source: "{self.source}"
+        """
+        return prompt.strip()
+    
+    def _build_batch_prompt(self, items: List[Tuple[str, Dict[str, str], str]]) -> str:
+        """Prompt asking for one result per (id, body_markings, view) item"""
+        lines = []
+        for item_id, body_markings, view in items:
             sensations = ", ".join([f"{region}: {sensation}" for region, sensation in body_markings.items() if sensation])
+            lines.append(f'- id "{item_id}" ({view} view): {sensations}')
+        listing = "\n        ".join(lines)
+        
+        prompt = f"""
+        Analyze the emotional state for each of these independent body maps.
+        Each line gives an item id, the body view and its sensations:
+        {listing}
+        
+        For every item provide the primary emotion(s), a confidence level (0.0-1.0),
+        a brief explanation and any patterns you notice.
+        
+        Format your response as a JSON array with one object per item and these fields:
+        - id: string (the item id)
+        - emotion: string
+        - confidence: float
+        - description: string
+        - patterns: array of strings
+        - source: "{self.source}"
+        """
+        return prompt.strip()
+    
+    @staticmethod
+    def _extract_json(text: str, open_char: str, close_char: str):
+        """Parse the outermost JSON object/array embedded in free text, or None"""
+        json_start = text.find(open_char)
+        json_end = text.rfind(close_char) + 1
+        if json_start == -1 or json_end <= json_start:
+            return None
+        try:
+            return json.loads(text[json_start:json_end])
+        except json.JSONDecodeError:
+            return None
+    
+    async def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Analyze emotions for one body map"""
+        try:
+            generated_text = await self._generate(self._build_prompt(body_markings, view), self.max_output_tokens)
             
-            prompt = f"""
-            Analyze the emotional state based on these body sensations from the {view} view:
-            {sensations}
-            
-            Please provide:
-            1. Primary emotion(s) detected
-            2. Confidence level (0.0-1.0)
-            3. Brief explanation
-            4. Any patterns you notice
-            
-            Format your response as JSON with these fields:
-            - emotion: string
-            - confidence: float
-            - description: string
-            - patterns: array of strings
-            - source: "gemini_api"
-            """
-            
-            # Make the API call
-            url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+            if generated_text is not None:
+                # Try to parse JSON from the response and validate the structure
+                parsed_result = self._extract_json(generated_text, '{', '}')
+                if isinstance(parsed_result, dict) and all(field in parsed_result for field in REQUIRED_FIELDS):
+                    return parsed_result
+                
+                # If JSON parsing fails, create a structured response from the text
+                return self._create_structured_response(generated_text, body_markings)
+                
+        except ProviderHTTPError:
+            raise
+        except Exception as e:
+            print(f"{self.label} API error: {e}")
+        
+        return None
+    
+    async def analyze_batch(self, items: List[Tuple[str, Dict[str, str], str]]) -> Optional[Dict[str, Dict]]:
+        """Analyze several body maps in one prompt.
+        
+        Returns the parsed results keyed by item id (items the model skipped or
+        mangled are simply missing), or None if the answer could not be parsed.
+        """
+        try:
+            max_tokens = min(8192, self.max_output_tokens * len(items))
+            generated_text = await self._generate(self._build_batch_prompt(items), max_tokens)
+            if generated_text is None:
+                return None
             
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": prompt.strip()
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "topK": 40,
-                    "topP": 0.95,
-                    "maxOutputTokens": 1024,
-                }
-            }
+            parsed = self._extract_json(generated_text, '[', ']')
+            if not isinstance(parsed, list):
+                return None
             
-            response = requests.post(url, json=payload, timeout=30)
+            results = {}
+            for entry in parsed:
+                if isinstance(entry, dict) and all(field in entry for field in REQUIRED_FIELDS):
+                    item_id = str(entry.pop('id', ''))
+                    results[item_id] = entry
+            return results
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract the generated text
-                if 'candidates' in result and len(result['candidates']) > 0:
-                    generated_text = result['candidates'][0]['content']['parts'][0]['text']
-                    
-                    # Try to parse JSON from the response
-                    try:
-                        # Look for JSON in the response
-                        json_start = generated_text.find('{')
-                        json_end = generated_text.rfind('}') + 1
-                        
-                        if json_start != -1 and json_end > json_start:
-                            json_text = generated_text[json_start:json_end]
-                            parsed_result = json.loads(json_text)
-                            
-                            # Validate the structure
-                            required_fields = ['emotion', 'confidence', 'description', 'patterns', 'source']
-                            if all(field in parsed_result for field in required_fields):
-                                return parsed_result
-                            
-                    except json.JSONDecodeError:
-                        pass
-                    
-                    # If JSON parsing fails, create a structured response from the text
-                    return self._create_structured_response(generated_text, body_markings)
-                    
-            elif response.status_code == 429:
-                print("⚠️  Gemini API rate limit hit")
-            elif response.status_code == 403:
-                print("⚠️  Gemini API quota exceeded")
-            else:
-                print(f"⚠️  Gemini API error: HTTP {response.status_code}")
-                
+        except ProviderHTTPError:
+            raise
         except Exception as e:
-            print(f"Gemini API error: {e}")
+            print(f"{self.label} API batch error: {e}")
         
         return None
     
     def _create_structured_response(self, text: str, body_markings: Dict[str, str]) -> Dict:
-        """Create a structured response from Gemini's text output"""
+        """Create a structured response from the provider's free-text output"""
         # Extract emotion keywords from the text
         emotion_keywords = [
             'anger', 'happiness', 'sadness', 'fear', 'anxiety', 
@@ -128,250 +267,136 @@ class GeminiProvider(LLMProvider):
         return {
             'emotion': detected_emotion,
             'confidence': 0.8,
-            'description': f'Gemini AI analysis: {text[:200]}...',
-            'patterns': ['gemini_ai_analysis'],
-            'source': 'gemini_api'
+            'description': f'{self.description_prefix}: {text[:200]}...',
+            'patterns': [self.pattern_tag],
+            'source': self.source
         }
+    
+    def get_pool_stats(self) -> Dict:
+        """Pool usage counters for sizing the connection pool"""
+        stats = dict(self.pool_stats)
+        requests = stats['requests']
+        stats['max_connections'] = settings.LLM_POOL_MAX_CONNECTIONS
+        stats['max_keepalive_connections'] = settings.LLM_POOL_MAX_KEEPALIVE
+        stats['connection_reuse_ratio'] = (
+            round(1 - stats['connections_opened'] / requests, 3) if requests else 0.0
+        )
+        return stats
 
-class OpenAIProvider(LLMProvider):
-    """OpenAI API provider - SECONDARY SERVICE"""
+class GeminiProvider(HTTPProvider):
+    """Google Gemini API provider - PRIMARY SERVICE"""
+    
+    label = "Gemini"
+    source = "gemini_api"
+    description_prefix = "Gemini AI analysis"
+    pattern_tag = "gemini_ai_analysis"
+    max_output_tokens = 1024
     
     def __init__(self, api_key: str):
+        super().__init__()
         self.api_key = api_key
-        self.base_url = "https://api.openai.com/v1/chat/completions"
-        self.model = "gpt-3.5-turbo"
+        self.base_url = settings.GEMINI_BASE_URL
+        self.model = settings.GEMINI_MODEL
+        self.rpm = settings.GEMINI_RPM
+        self.tpm = settings.GEMINI_TPM
     
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
-        """Analyze emotions using OpenAI API"""
-        try:
-            # Create a prompt for emotion analysis
-            sensations = ", ".join([f"{region}: {sensation}" for region, sensation in body_markings.items() if sensation])
-            
-            prompt = f"""
-            Analyze the emotional state based on these body sensations from the {view} view:
-            {sensations}
-            
-            Please provide:
-            1. Primary emotion(s) detected
-            2. Confidence level (0.0-1.0)
-            3. Brief explanation
-            4. Any patterns you notice
-            
-            Format your response as JSON with these fields:
-            - emotion: string
-            - confidence: float
-            - description: string
-            - patterns: array of strings
-            - source: "openai_api"
-            """
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are an expert in somatic psychology and emotion analysis."},
-                    {"role": "user", "content": prompt.strip()}
-                ],
-                "max_tokens": 500,
-                "temperature": 0.7
+    async def _generate(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Call Gemini generateContent and return the generated text"""
+        url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+        
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": prompt
+                }]
+            }],
+            "generationConfig": {
+                "temperature": 0.7,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": max_tokens,
             }
+        }
+        
+        response = await self._post(url, json=payload)
+        
+        if response.status_code == 200:
+            result = response.json()
             
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract the generated text
-                if 'choices' in result and len(result['choices']) > 0:
-                    generated_text = result['choices'][0]['message']['content']
-                    
-                    # Try to parse JSON from the response
-                    try:
-                        # Look for JSON in the response
-                        json_start = generated_text.find('{')
-                        json_end = generated_text.rfind('}') + 1
-                        
-                        if json_start != -1 and json_end > json_start:
-                            json_text = generated_text[json_start:json_end]
-                            parsed_result = json.loads(json_text)
-                            
-                            # Validate the structure
-                            required_fields = ['emotion', 'confidence', 'description', 'patterns', 'source']
-                            if all(field in parsed_result for field in required_fields):
-                                return parsed_result
-                            
-                    except json.JSONDecodeError:
-                        pass
-                    
-                    # If JSON parsing fails, create a structured response from the text
-                    return self._create_structured_response(generated_text, body_markings)
-                    
-            elif response.status_code == 429:
-                print("⚠️  OpenAI API rate limit hit")
-            elif response.status_code == 401:
-                print("⚠️  OpenAI API key invalid")
-            else:
-                print(f"⚠️  OpenAI API error: HTTP {response.status_code}")
-                
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
+            # Extract the generated text
+            if 'candidates' in result and len(result['candidates']) > 0:
+                return result['candidates'][0]['content']['parts'][0]['text']
+            return None
+        elif response.status_code == 429:
+            print("⚠️  Gemini API rate limit hit")
+        elif response.status_code == 403:
+            print("⚠️  Gemini API quota exceeded")
+        else:
+            print(f"⚠️  Gemini API error: HTTP {response.status_code}")
         
-        return None
+        raise ProviderHTTPError(response.status_code)
+
+class OpenAIProvider(HTTPProvider):
+    """OpenAI API provider - SECONDARY SERVICE"""
     
-    def _create_structured_response(self, text: str, body_markings: Dict[str, str]) -> Dict:
-        """Create a structured response from OpenAI's text output"""
-        # Extract emotion keywords from the text
-        emotion_keywords = [
-            'anger', 'happiness', 'sadness', 'fear', 'anxiety', 
-            'love', 'disgust', 'surprise', 'shame', 'pride',
-            'joy', 'excitement', 'calm', 'stress', 'relaxation',
-            'contentment', 'frustration', 'worry', 'peace', 'tension'
-        ]
-        
-        detected_emotion = "Mixed_Emotions"
-        for emotion in emotion_keywords:
-            if emotion.lower() in text.lower():
-                detected_emotion = emotion.capitalize()
-                break
+    label = "OpenAI"
+    source = "openai_api"
+    description_prefix = "OpenAI analysis"
+    pattern_tag = "openai_ai_analysis"
+    max_output_tokens = 500
+    
+    def __init__(self, api_key: str):
+        super().__init__()
+        self.api_key = api_key
+        self.base_url = settings.OPENAI_BASE_URL
+        self.model = settings.OPENAI_MODEL
+        self.rpm = settings.OPENAI_RPM
+        self.tpm = settings.OPENAI_TPM
+    
+    async def _generate(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Call OpenAI chat completions and return the generated text"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         
-        return {
-            'emotion': detected_emotion,
-            'confidence': 0.8,
-            'description': f'OpenAI analysis: {text[:200]}...',
-            'patterns': ['openai_ai_analysis'],
-            'source': 'openai_api'
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are an expert in somatic psychology and emotion analysis."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": 0.7
         }
+        
+        response = await self._post(self.base_url, headers=headers, json=payload)
+        
+        if response.status_code == 200:
+            result = response.json()
+            
+            # Extract the generated text
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content']
+            return None
+        elif response.status_code == 429:
+            print("⚠️  OpenAI API rate limit hit")
+        elif response.status_code == 401:
+            print("⚠️  OpenAI API key invalid")
+        else:
+            print(f"⚠️  OpenAI API error: HTTP {response.status_code}")
+        
+        raise ProviderHTTPError(response.status_code)
 
 class LocalPatternProvider(LLMProvider):
     """Local pattern matching provider - FINAL FALLBACK"""
     
-    def __init__(self):
-        # Define emotion patterns based on body sensations
-        self.EMOTION_PATTERNS = {
-            'hot': {
-                'head': ['Anger', 'Stress', 'Frustration'],
-                'chest': ['Anxiety', 'Excitement', 'Anger'],
-                'stomach': ['Nervousness', 'Excitement', 'Anger'],
-                'arms': ['Tension', 'Stress', 'Anger'],
-                'legs': ['Tension', 'Stress', 'Anger']
-            },
-            'warm': {
-                'head': ['Contentment', 'Happiness', 'Calm'],
-                'chest': ['Love', 'Happiness', 'Contentment'],
-                'stomach': ['Contentment', 'Happiness', 'Calm'],
-                'arms': ['Relaxation', 'Contentment', 'Happiness'],
-                'legs': ['Relaxation', 'Contentment', 'Happiness']
-            },
-            'cold': {
-                'head': ['Fear', 'Shock', 'Sadness'],
-                'chest': ['Fear', 'Sadness', 'Withdrawal'],
-                'stomach': ['Fear', 'Anxiety', 'Sadness'],
-                'arms': ['Fear', 'Withdrawal', 'Sadness'],
-                'legs': ['Fear', 'Withdrawal', 'Sadness']
-            },
-            'cool': {
-                'head': ['Calm', 'Peace', 'Relaxation'],
-                'chest': ['Calm', 'Peace', 'Relaxation'],
-                'stomach': ['Calm', 'Peace', 'Relaxation'],
-                'arms': ['Calm', 'Peace', 'Relaxation'],
-                'legs': ['Calm', 'Peace', 'Relaxation']
-            },
-            'numb': {
-                'head': ['Shock', 'Disconnection', 'Trauma'],
-                'chest': ['Shock', 'Disconnection', 'Trauma'],
-                'stomach': ['Shock', 'Disconnection', 'Trauma'],
-                'arms': ['Shock', 'Disconnection', 'Trauma'],
-                'legs': ['Shock', 'Disconnection', 'Trauma']
-            }
-        }
-    
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Dict:
-        """Analyze emotions using local pattern matching"""
-        # Count different sensation types
-        hot_count = sum(1 for sensation in body_markings.values() if sensation == 'hot')
-        warm_count = sum(1 for sensation in body_markings.values() if sensation == 'warm')
-        cold_count = sum(1 for sensation in body_markings.values() if sensation == 'cold')
-        cool_count = sum(1 for sensation in body_markings.values() if sensation == 'cool')
-        numb_count = sum(1 for sensation in body_markings.values() if sensation == 'numb')
-        
-        # Analyze patterns
-        results = []
-        
-        # Pattern 1: High energy (hot sensations)
-        if hot_count >= 2:
-            results.append({
-                'emotion': 'Anger/Excitement',
-                'confidence': 0.8,
-                'description': 'Multiple hot sensations suggest high energy emotions like anger or excitement',
-                'patterns': [f'{hot_count} hot sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 2: Positive warmth
-        if warm_count >= 2 and hot_count == 0:
-            results.append({
-                'emotion': 'Happiness/Contentment',
-                'confidence': 0.7,
-                'description': 'Warm sensations without hot suggest positive emotional state',
-                'patterns': [f'{warm_count} warm sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 3: Withdrawal (cold sensations)
-        if cold_count >= 2:
-            results.append({
-                'emotion': 'Sadness/Withdrawal',
-                'confidence': 0.7,
-                'description': 'Cold sensations suggest emotional withdrawal or sadness',
-                'patterns': [f'{cold_count} cold sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 4: Anxiety (mixed hot and cold)
-        if hot_count >= 1 and cold_count >= 1:
-            results.append({
-                'emotion': 'Anxiety/Stress',
-                'confidence': 0.6,
-                'description': 'Mixed hot and cold sensations suggest anxiety or stress',
-                'patterns': [f'{hot_count} hot, {cold_count} cold'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # Pattern 5: Numbness
-        if numb_count >= 1:
-            results.append({
-                'emotion': 'Disconnection/Shock',
-                'confidence': 0.6,
-                'description': 'Numb sensations suggest emotional disconnection or shock',
-                'patterns': [f'{numb_count} numb sensations'],
-                'source': 'local_pattern_analysis'
-            })
-        
-        # If no clear patterns, provide general analysis
-        if not results:
-            total_sensations = len([s for s in body_markings.values() if s])
-            if total_sensations == 0:
-                results.append({
-                    'emotion': 'Neutral/Calm',
-                    'confidence': 0.8,
-                    'description': 'No significant sensations detected, suggesting a calm state',
-                    'patterns': ['no sensations'],
-                    'source': 'local_pattern_analysis'
-                })
-            else:
-                results.append({
-                    'emotion': 'Mixed/Complex',
-                    'confidence': 0.5,
-                    'description': f'Complex pattern of {total_sensations} sensations suggests mixed emotions',
-                    'patterns': [f'{total_sensations} total sensations'],
-                    'source': 'local_pattern_analysis'
-                })
-        
-        return results
+    async def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Tuple[Dict, ...]:
+        """Analyze emotions using local pattern matching (shared precompiled engine)"""
+        return local_patterns.analyze(body_markings)
+
+# Small fixed map used to probe whether a tripped provider has recovered
+PROBE_MARKINGS = {'head': 'hot', 'chest': 'warm'}
 
 class LLMService:
     """Main LLM service that orchestrates different providers"""
@@ -400,24 +425,457 @@ class LLMService:
         print("✅ Local pattern provider initialized")
         
         print(f"🎯 Total providers: {len(self.providers)}")
+        
+        # Rolling latency / call counters per provider
+        self.stats = {
+            provider.__class__.__name__: ProviderStats(settings.LLM_LATENCY_WINDOW)
+            for provider in self.providers
+        }
+        
+        # Circuit breaker per remote provider
+        self.breakers = {
+            provider.__class__.__name__: CircuitBreaker(
+                window=settings.LLM_BREAKER_WINDOW,
+                min_calls=settings.LLM_BREAKER_MIN_CALLS,
+                error_rate=settings.LLM_BREAKER_ERROR_RATE,
+                slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+                open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+                trip_statuses=settings.LLM_BREAKER_TRIP_STATUSES
+            )
+            for provider in self.providers
+            if isinstance(provider, HTTPProvider)
+        }
+        self._probe_task: Optional[asyncio.Task] = None
+        
+        # Outbound quota scheduler for providers with configured limits
+        self.scheduler = OutboundScheduler(
+            {
+                provider.__class__.__name__: ProviderQuota(provider.rpm, provider.tpm, settings.QUOTA_BURST_SECONDS)
+                for provider in self.providers
+                if isinstance(provider, HTTPProvider) and (provider.rpm > 0 or provider.tpm > 0)
+            },
+            max_queue=settings.QUOTA_MAX_QUEUE
+        )
+        
+        # Optional micro-batching of concurrent calls per remote provider
+        self.batchers = {}
+        if settings.LLM_BATCH_ENABLED:
+            self.batchers = {
+                provider.__class__.__name__: MicroBatcher(
+                    provider,
+                    window=settings.LLM_BATCH_WINDOW_MS / 1000.0,
+                    max_size=settings.LLM_BATCH_MAX_SIZE
+                )
+                for provider in self.providers
+                if isinstance(provider, HTTPProvider)
+            }
+        
+        # Confidence-gated bypass of remote providers by the local classifier
+        self.bypass_stats = {'checked': 0, 'bypassed': 0}
+        
+        # Cache of remote provider results
+        self.cache = ResultCache(
+            max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+            ttl=settings.RESULT_CACHE_TTL
+        )
+        # Shared by all workers on the host and kept across restarts (opened on startup)
+        self.l2_cache: Optional[PersistentResultCache] = None
+        
+        # Every remote result by body-map bit vector, for near-duplicate lookups
+        self.neighbors = NeighborIndex(max_entries=settings.NEIGHBOR_INDEX_MAX_ENTRIES)
+    
+    async def startup(self) -> None:
+        """Open provider connection pools and the L2 cache and start recovery probing
+        (called on app startup)"""
+        if settings.RESULT_CACHE_ENABLED and settings.RESULT_CACHE_L2_ENABLED and self.l2_cache is None:
+            self.l2_cache = await asyncio.to_thread(
+                PersistentResultCache,
+                settings.RESULT_CACHE_L2_PATH,
+                max_bytes=settings.RESULT_CACHE_L2_MAX_BYTES,
+                ttl=settings.RESULT_CACHE_L2_TTL,
+                busy_timeout=settings.RESULT_CACHE_L2_BUSY_TIMEOUT
+            )
+        for provider in self.providers:
+            await provider.startup()
+        if self.breakers and self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_loop())
     
-    def analyze_emotions(self, body_markings: Dict[str, str], view: str) -> Dict:
-        """Analyze emotions using available providers in priority order"""
-        for i, provider in enumerate(self.providers):
+    async def shutdown(self) -> None:
+        """Stop probing and close provider connection pools (called on app shutdown)"""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
             try:
-                print(f"🔍 Trying provider {i+1}/{len(self.providers)}: {provider.__class__.__name__}")
-                
-                result = provider.analyze_emotions(body_markings, view)
-                
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        for provider in self.providers:
+            await provider.shutdown()
+        if self.l2_cache is not None:
+            await asyncio.to_thread(self.l2_cache.close)
+            self.l2_cache = None
+    
+    def get_pool_stats(self) -> Dict[str, Dict]:
+        """Connection pool usage per remote provider"""
+        return {
+            provider.__class__.__name__: provider.get_pool_stats()
+            for provider in self.providers
+            if isinstance(provider, HTTPProvider)
+        }
+    
+    def cache_namespace(self) -> str:
+        """Identifies the provider chain, models and prompt version behind a cached result"""
+        remote = ",".join(
+            f"{p.__class__.__name__}:{p.model}" for p in self.providers if isinstance(p, HTTPProvider)
+        )
+        return f"{remote or 'local'}|p{PROMPT_VERSION}"
+    
+    async def invalidate_cache(self, current_only: bool = False) -> int:
+        """Drop cached results (e.g. after a prompt or model change); returns the count"""
+        # The neighbour index only ever holds this process's namespace
+        self.neighbors.clear()
+        namespace = self.cache_namespace() if current_only else None
+        removed = self.cache.invalidate(namespace)
+        if self.l2_cache is not None:
+            removed += await asyncio.to_thread(self.l2_cache.invalidate, namespace)
+        return removed
+    
+    async def _cache_get(self, key: str) -> Optional[Dict]:
+        """In-process cache first, then the shared L2 cache (promoting hits), read in a
+        worker thread"""
+        cached = self.cache.get(key)
+        if cached is None and self.l2_cache is not None:
+            cached = await asyncio.to_thread(self.l2_cache.get, key)
+            if cached is not None:
+                self.cache.set(key, cached)
+        return cached
+    
+    async def cached_result(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Cached remote result for a map under the current namespace, if any"""
+        if not settings.RESULT_CACHE_ENABLED:
+            return None
+        return await self._cache_get(canonical_key(body_markings, view, self.cache_namespace()))
+    
+    def _cache_set(self, key: str, result: Dict) -> None:
+        """Store in both levels (the L2 write is queued for its writer thread)"""
+        self.cache.set(key, result)
+        if self.l2_cache is not None:
+            self.l2_cache.set(key, result)
+    
+    def _remember(self, body_markings: Dict[str, str], view: str, result: Dict) -> None:
+        """Index a remote result for near-duplicate lookups"""
+        if settings.NEIGHBOR_INDEX_ENABLED:
+            self.neighbors.add(body_markings, view, result)
+    
+    def _bypass_enabled(self) -> bool:
+        # Nothing to bypass without remote providers; keep the pattern fallback then
+        return settings.LOCAL_CLASSIFIER_BYPASS_ENABLED and bool(self.breakers)
+    
+    def _accept_local(self, result: Optional[Dict]) -> Optional[Dict]:
+        """Count one bypass check; the classifier result if it is confident enough"""
+        self.bypass_stats['checked'] += 1
+        if (result is None
+                or result['marked_regions'] < settings.LOCAL_CLASSIFIER_MIN_REGIONS
+                or result['confidence'] < settings.LOCAL_CLASSIFIER_BYPASS_THRESHOLD):
+            return None
+        self.bypass_stats['bypassed'] += 1
+        return result
+    
+    def _confident_local_result(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Local classifier result when it is confident enough to skip remote providers"""
+        if not self._bypass_enabled():
+            return None
+        result = self._accept_local(local_classifier.classify(body_markings, view))
+        if result is not None:
+            print(f"🎯 Local classifier confident ({result['confidence']}), skipping remote providers")
+        return result
+    
+    def confident_local_results(self, items: List[Tuple[Dict[str, str], str]]) -> List[Optional[Dict]]:
+        """_confident_local_result for many (body_markings, view) items in one vectorized pass"""
+        if not self._bypass_enabled():
+            return [None] * len(items)
+        return [self._accept_local(result) for result in local_classifier.classify_batch(items)]
+    
+    def get_bypass_stats(self) -> Dict:
+        """How often the local classifier answered instead of a remote provider"""
+        checked = self.bypass_stats['checked']
+        return {
+            **self.bypass_stats,
+            'bypass_rate': round(self.bypass_stats['bypassed'] / checked, 3) if checked else 0.0,
+            'threshold': settings.LOCAL_CLASSIFIER_BYPASS_THRESHOLD,
+            'enabled': settings.LOCAL_CLASSIFIER_BYPASS_ENABLED
+        }
+    
+    def get_quota_stats(self) -> Dict[str, Dict]:
+        """Quota scheduler admissions and queue depth per rate-limited provider"""
+        return self.scheduler.get_stats()
+    
+    def get_batch_stats(self) -> Dict[str, Dict]:
+        """Micro-batching counters and batch-size histograms per provider"""
+        return {name: batcher.get_stats() for name, batcher in self.batchers.items()}
+    
+    def get_breaker_states(self) -> Dict[str, Dict]:
+        """Circuit breaker state per remote provider"""
+        return {name: breaker.to_dict() for name, breaker in self.breakers.items()}
+    
+    def _health_score(self, provider: LLMProvider) -> float:
+        """Higher is better: observed success rate discounted by median latency"""
+        stats = self.stats[provider.__class__.__name__]
+        counters = stats.counters
+        # Laplace-smoothed so providers without history keep a neutral score
+        success_rate = (counters['successes'] + 1) / (counters['successes'] + counters['failures'] + 2)
+        p50 = stats.percentile(50) or 0.0
+        return success_rate / (1.0 + p50)
+    
+    def ordered_providers(self) -> List[LLMProvider]:
+        """Remote providers with a closed circuit (healthiest first), then local fallbacks"""
+        remote = [
+            p for p in self.providers
+            if isinstance(p, HTTPProvider) and self.breakers[p.__class__.__name__].allow_request()
+        ]
+        if settings.LLM_DYNAMIC_ORDERING:
+            # Stable sort keeps the configured priority between equally healthy providers
+            remote.sort(key=self._health_score, reverse=True)
+        local = [p for p in self.providers if not isinstance(p, HTTPProvider)]
+        return remote + local
+    
+    async def _probe_loop(self) -> None:
+        """Background task: probe providers whose open circuit has cooled down"""
+        while True:
+            await asyncio.sleep(settings.LLM_BREAKER_PROBE_INTERVAL)
+            for provider in self.providers:
+                name = provider.__class__.__name__
+                breaker = self.breakers.get(name)
+                if breaker is None or not breaker.ready_for_probe():
+                    continue
+                print(f"🩺 Probing {name} (circuit half-open)")
+                try:
+                    await asyncio.wait_for(
+                        self._call_provider(provider, PROBE_MARKINGS, 'front', BACKGROUND),
+                        settings.LLM_READ_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    breaker.record_failure()
+                print(f"🩺 {name} circuit is now {breaker.state}")
+    
+    def get_provider_stats(self) -> Dict[str, Dict]:
+        """Latency percentiles and call/hedge counters per provider"""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+    
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        """Delay before hedging: the configured latency percentile of the provider"""
+        stats = self.stats[provider.__class__.__name__]
+        if len(stats.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return max(settings.LLM_HEDGE_MIN_DELAY, stats.percentile(settings.LLM_HEDGE_PERCENTILE))
+    
+    async def _call_provider(self, provider: LLMProvider, body_markings: Dict[str, str], view: str,
+                             priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Call a single provider within its quota (through its micro-batcher if enabled)"""
+        name = provider.__class__.__name__
+        if isinstance(provider, HTTPProvider):
+            tokens = provider.estimate_tokens(body_markings, view)
+            if not await self._admit(name, tokens, priority):
+                return None
+        
+        batcher = self.batchers.get(name)
+        if batcher is not None:
+            return await self._tracked(provider, batcher.submit(body_markings, view))
+        return await self._tracked(provider, provider.analyze_emotions(body_markings, view))
+    
+    async def _admit(self, name: str, tokens: int, priority: int) -> bool:
+        """Ask the quota scheduler for a slot; False means route to the next provider"""
+        max_wait = settings.QUOTA_MAX_WAIT.get(PRIORITY_NAMES[priority], 0.0)
+        if await self.scheduler.acquire(name, tokens, priority, max_wait):
+            return True
+        print(f"🚦 {name} quota exhausted for {PRIORITY_NAMES[priority]} request, routing on")
+        self.stats[name].counters['quota_skips'] += 1
+        return False
+    
+    async def _tracked(self, provider: LLMProvider, call):
+        """Await a provider call, recording latency and outcome in its stats and breaker"""
+        name = provider.__class__.__name__
+        stats = self.stats[name]
+        start = time.monotonic()
+        breaker = self.breakers.get(name)
+        status_code = None
+        error = None
+        try:
+            result = await call
+        except asyncio.CancelledError:
+            stats.counters['cancelled'] += 1
+            raise
+        except ProviderHTTPError as e:
+            status_code = e.status_code
+            result = None
+            error = e
+        except Exception as e:
+            print(f"❌ Error with {name}: {e}")
+            result = None
+            error = e
+        latency = time.monotonic() - start
+        stats.record(latency, bool(result))
+        if breaker is not None:
+            if result:
+                breaker.record_success(latency)
+            elif not getattr(error, 'breaker_recorded', False):
+                breaker.record_failure(status_code)
+                if error is not None:
+                    # A failed micro-batch raises this same error in every caller: count it once
+                    error.breaker_recorded = True
+        return result
+    
+    async def _hedged_call(self, primary: LLMProvider, secondary: LLMProvider,
+                           body_markings: Dict[str, str], view: str,
+                           priority: int = INTERACTIVE,
+                           running: Optional[List[LLMProvider]] = None) -> Optional[Dict]:
+        """Race primary against secondary once primary exceeds its hedge delay.
+        
+        When it returns or is cancelled, ``running`` (if given) holds the
+        providers whose call was still in flight, so a caller whose budget ran
+        out can charge the timeout to each of them.
+        """
+        primary_task = asyncio.create_task(self._call_provider(primary, body_markings, view, priority))
+        tasks = [primary_task]
+        legs = {primary_task: primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+            if done:
+                # Primary answered in time; a failure falls through to plain fallback
+                result = primary_task.result()
                 if result:
-                    print(f"✅ Success with {provider.__class__.__name__}")
                     return result
-                else:
-                    print(f"❌ Failed with {provider.__class__.__name__}")
-                    
-            except Exception as e:
-                print(f"❌ Error with {provider.__class__.__name__}: {e}")
-                continue
+                fallback_task = asyncio.create_task(self._call_provider(secondary, body_markings, view, priority))
+                tasks.append(fallback_task)
+                legs[fallback_task] = secondary
+                return await fallback_task
+            
+            secondary_name = secondary.__class__.__name__
+            print(f"⏱️  {primary.__class__.__name__} slow, hedging with {secondary_name}")
+            self.stats[secondary_name].counters['hedge_calls'] += 1
+            secondary_task = asyncio.create_task(self._call_provider(secondary, body_markings, view, priority))
+            tasks.append(secondary_task)
+            legs[secondary_task] = secondary
+            
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result:
+                        if task is secondary_task:
+                            print(f"🏁 {secondary_name} won the hedge")
+                            self.stats[secondary_name].counters['hedge_wins'] += 1
+                        return result
+            return None
+        finally:
+            if running is not None:
+                # An awaited leg has already been cancelled along with us
+                running[:] = [legs[task] for task in tasks if not task.done() or task.cancelled()]
+            # Cancel whichever call lost the race (or all of them if we were cancelled)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _provider_budget(self, deadline: Optional[float], remote_left: int) -> Optional[float]:
+        """Share of the remaining deadline for the next remote call.
+        
+        Returns None when there is no deadline, 0 when too little time is left
+        for a remote call (the local fallback reserve is always kept back).
+        """
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic() - settings.LOCAL_FALLBACK_RESERVE
+        if remaining < settings.LLM_MIN_PROVIDER_BUDGET:
+            return 0
+        return min(remaining, max(remaining / remote_left, settings.LLM_MIN_PROVIDER_BUDGET))
+    
+    async def analyze_emotions(self, body_markings: Dict[str, str], view: str,
+                               deadline: Optional[float] = None, remote_only: bool = False,
+                               priority: int = INTERACTIVE, local_checked: bool = False) -> Optional[Dict]:
+        """Analyze emotions using available providers in priority order.
+        
+        ``deadline`` is an absolute ``time.monotonic()`` timestamp; the time left
+        is split across the remaining remote providers so the local fallback
+        always gets to answer before it. With ``remote_only`` the local fallback
+        is skipped and None is returned when no remote provider answers.
+        ``priority`` orders the call in the provider quota queues. Callers that
+        already ran the local classifier bypass check pass ``local_checked``.
+        """
+        cache_key = None
+        if settings.RESULT_CACHE_ENABLED:
+            cache_key = canonical_key(body_markings, view, self.cache_namespace())
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                print("⚡ Result cache hit")
+                return cached
+        
+        if not local_checked:
+            confident = self._confident_local_result(body_markings, view)
+            if confident is not None:
+                return confident
+        
+        providers = self.ordered_providers()
+        if remote_only:
+            providers = [p for p in providers if isinstance(p, HTTPProvider)]
+        i = 0
+        while i < len(providers):
+            provider = providers[i]
+            name = provider.__class__.__name__
+            
+            secondary = providers[i + 1] if i + 1 < len(providers) else None
+            hedged = settings.LLM_HEDGE_ENABLED and isinstance(provider, HTTPProvider) and isinstance(secondary, HTTPProvider)
+            step = 2 if hedged else 1
+            
+            budget = None
+            if isinstance(provider, HTTPProvider):
+                remote_left = sum(1 for p in providers[i:] if isinstance(p, HTTPProvider))
+                budget = self._provider_budget(deadline, remote_left)
+                if budget is not None and budget <= 0:
+                    print(f"⏭️  Skipping {name}: deadline budget exhausted")
+                    for skipped in providers[i:i + step]:
+                        self.stats[skipped.__class__.__name__].counters['deadline_skips'] += 1
+                    i += step
+                    continue
+                if hedged and budget is not None:
+                    # The hedged pair runs concurrently, so it shares both slices
+                    budget = min(budget * 2, deadline - time.monotonic() - settings.LOCAL_FALLBACK_RESERVE)
+            
+            print(f"🔍 Trying provider {i+1}/{len(providers)}: {name}")
+            # Providers still waiting on an answer if the budget runs out
+            running = [provider]
+            if hedged:
+                call = self._hedged_call(provider, secondary, body_markings, view, priority, running)
+            else:
+                call = self._call_provider(provider, body_markings, view, priority)
+            
+            try:
+                result = await asyncio.wait_for(call, budget)
+            except asyncio.TimeoutError:
+                for timed_out in running:
+                    timed_out_name = timed_out.__class__.__name__
+                    print(f"⏱️  {timed_out_name} exceeded its {budget:.2f}s budget")
+                    self.stats[timed_out_name].counters['timeouts'] += 1
+                    self.stats[timed_out_name].record(budget, False)
+                    if timed_out_name in self.breakers:
+                        self.breakers[timed_out_name].record_failure()
+                result = None
+            i += step
+            
+            if result:
+                print(f"✅ Success with {name}")
+                # Only remote answers are worth caching; local analysis is cheap
+                if cache_key is not None and isinstance(provider, HTTPProvider) and isinstance(result, dict):
+                    self._cache_set(cache_key, result)
+                if isinstance(provider, HTTPProvider) and isinstance(result, dict):
+                    self._remember(body_markings, view, result)
+                return result
+            else:
+                print(f"❌ Failed with {name}")
+        
+        if remote_only:
+            return None
         
         # This should never happen since LocalPatternProvider is always available
         print("❌ All providers failed - this shouldn't happen!")
@@ -428,3 +886,78 @@ class LLMService:
             'patterns': ['system_error'],
             'source': 'error'
         }
+    
+    async def _combined_remote_call(self, views: Dict[str, Dict[str, str]],
+                                    deadline: Optional[float], priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Analyze several views in a single remote prompt; returns results keyed by view"""
+        items = [(view, body_markings, view) for view, body_markings in views.items()]
+        providers = [p for p in self.ordered_providers() if isinstance(p, HTTPProvider)]
+        for i, provider in enumerate(providers):
+            name = provider.__class__.__name__
+            budget = self._provider_budget(deadline, len(providers) - i)
+            if budget is not None and budget <= 0:
+                self.stats[name].counters['deadline_skips'] += 1
+                continue
+            
+            tokens = sum(provider.estimate_tokens(body_markings, view) for view, body_markings in views.items())
+            if not await self._admit(name, tokens, priority):
+                continue
+            
+            print(f"🔍 Combined {'+'.join(views)} analysis with {name}")
+            try:
+                results = await asyncio.wait_for(self._tracked(provider, provider.analyze_batch(items)), budget)
+            except asyncio.TimeoutError:
+                print(f"⏱️  {name} exceeded its {budget:.2f}s budget")
+                self.stats[name].counters['timeouts'] += 1
+                self.breakers[name].record_failure()
+                results = None
+            
+            if results:
+                return {view: result for view, result in results.items() if view in views}
+        return {}
+    
+    async def analyze_views(self, views: Dict[str, Dict[str, str]],
+                            deadline: Optional[float] = None,
+                            priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Analyze several views of one body (e.g. front and back) with one remote call.
+        
+        Cached views are served from the cache; the rest go to the first healthy
+        remote provider in one prompt. Views it could not answer fall back to
+        per-view analysis, run concurrently.
+        """
+        results = {}
+        pending = {}
+        namespace = self.cache_namespace()
+        for view, body_markings in views.items():
+            cached = None
+            if settings.RESULT_CACHE_ENABLED:
+                cached = await self._cache_get(canonical_key(body_markings, view, namespace))
+            if cached is not None:
+                results[view] = cached
+            else:
+                pending[view] = body_markings
+        
+        for view in list(pending):
+            confident = self._confident_local_result(pending[view], view)
+            if confident is not None:
+                results[view] = confident
+                del pending[view]
+        
+        if len(pending) > 1:
+            combined = await self._combined_remote_call(pending, deadline, priority)
+            for view, result in combined.items():
+                results[view] = result
+                if settings.RESULT_CACHE_ENABLED:
+                    self._cache_set(canonical_key(pending[view], view, namespace), result)
+                self._remember(pending[view], view, result)
+            pending = {view: body_markings for view, body_markings in pending.items() if view not in results}
+        
+        if pending:
+            per_view = await asyncio.gather(*(
+                self.analyze_emotions(body_markings, view, deadline, priority=priority)
+                for view, body_markings in pending.items()
+            ))
+            results.update(zip(pending, per_view))
+        
+        return {view: results[view] for view in views}
+
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Local Classifier
+Region-aware emotion scoring: EMOTION_PATTERNS compiled into a weight matrix over a
+one-hot (view, region, sensation) encoding, so every emotion is scored in one matrix product.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SOURCE = 'local_classifier'
+
+# Region x sensation -> emotions, most characteristic first
+EMOTION_PATTERNS = {
+    'hot': {
+        'head': ['Anger', 'Stress', 'Frustration'],
+        'chest': ['Anxiety', 'Excitement', 'Anger'],
+        'stomach': ['Nervousness', 'Excitement', 'Anger'],
+        'arms': ['Tension', 'Stress', 'Anger'],
+        'legs': ['Tension', 'Stress', 'Anger']
+    },
+    'warm': {
+        'head': ['Contentment', 'Happiness', 'Calm'],
+        'chest': ['Love', 'Happiness', 'Contentment'],
+        'stomach': ['Contentment', 'Happiness', 'Calm'],
+        'arms': ['Relaxation', 'Contentment', 'Happiness'],
+        'legs': ['Relaxation', 'Contentment', 'Happiness']
+    },
+    'cold': {
+        'head': ['Fear', 'Shock', 'Sadness'],
+        'chest': ['Fear', 'Sadness', 'Withdrawal'],
+        'stomach': ['Fear', 'Anxiety', 'Sadness'],
+        'arms': ['Fear', 'Withdrawal', 'Sadness'],
+        'legs': ['Fear', 'Withdrawal', 'Sadness']
+    },
+    'cool': {
+        'head': ['Calm', 'Peace', 'Relaxation'],
+        'chest': ['Calm', 'Peace', 'Relaxation'],
+        'stomach': ['Calm', 'Peace', 'Relaxation'],
+        'arms': ['Calm', 'Peace', 'Relaxation'],
+        'legs': ['Calm', 'Peace', 'Relaxation']
+    },
+    'numb': {
+        'head': ['Shock', 'Disconnection', 'Trauma'],
+        'chest': ['Shock', 'Disconnection', 'Trauma'],
+        'stomach': ['Shock', 'Disconnection', 'Trauma'],
+        'arms': ['Shock', 'Disconnection', 'Trauma'],
+        'legs': ['Shock', 'Disconnection', 'Trauma']
+    }
+}
+
+# The frontend's BodyRegion values and the pattern group each one belongs to
+REGION_GROUPS = {
+    'head': 'head',
+    'neck': 'head',
+    'chest': 'chest',
+    'upper-back': 'chest',
+    'abdomen': 'stomach',
+    'lower-back': 'stomach',
+    'left-arm': 'arms',
+    'right-arm': 'arms',
+    'left-forearm': 'arms',
+    'right-forearm': 'arms',
+    'left-hand': 'arms',
+    'right-hand': 'arms',
+    'left-thigh': 'legs',
+    'right-thigh': 'legs',
+    'left-leg': 'legs',
+    'right-leg': 'legs',
+    'left-foot': 'legs',
+    'right-foot': 'legs'
+}
+
+REGIONS = tuple(REGION_GROUPS)
+SENSATIONS = ('hot', 'warm', 'cool', 'cold', 'numb')
+VIEWS = ('front', 'back')
+
+# Weight of an emotion by its rank in a pattern list
+RANK_WEIGHTS = (1.0, 0.4, 0.2)
+
+EMOTIONS = tuple(sorted({
+    emotion
+    for groups in EMOTION_PATTERNS.values()
+    for emotions in groups.values()
+    for emotion in emotions
+}))
+
+FEATURE_INDEX = {
+    (view, region, sensation): index
+    for index, (view, region, sensation) in enumerate(
+        (view, region, sensation) for view in VIEWS for region in REGIONS for sensation in SENSATIONS
+    )
+}
+N_FEATURES = len(FEATURE_INDEX)
+
+def _compile_weights() -> np.ndarray:
+    """(features x emotions) matrix; both views share the region patterns"""
+    emotion_index = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+    weights = np.zeros((N_FEATURES, len(EMOTIONS)), dtype=np.float32)
+    for (view, region, sensation), row in FEATURE_INDEX.items():
+        emotions = EMOTION_PATTERNS[sensation][REGION_GROUPS[region]]
+        for rank, emotion in enumerate(emotions):
+            weights[row, emotion_index[emotion]] = RANK_WEIGHTS[rank]
+    return weights
+
+WEIGHTS = _compile_weights()
+
+def encode(body_markings: Dict[str, str], view: str) -> np.ndarray:
+    """One-hot feature vector; regions or sensations outside the vocabulary are ignored"""
+    features = np.zeros(N_FEATURES, dtype=np.float32)
+    for region, sensation in body_markings.items():
+        index = FEATURE_INDEX.get((view, region, sensation))
+        if index is not None:
+            features[index] = 1.0
+    return features
+
+def encode_batch(items: Sequence[Tuple[Dict[str, str], str]]) -> np.ndarray:
+    """(n x features) matrix for (body_markings, view) items"""
+    features = np.zeros((len(items), N_FEATURES), dtype=np.float32)
+    for row, (body_markings, view) in enumerate(items):
+        for region, sensation in body_markings.items():
+            index = FEATURE_INDEX.get((view, region, sensation))
+            if index is not None:
+                features[row, index] = 1.0
+    return features
+
+def classify_batch(items: Sequence[Tuple[Dict[str, str], str]]) -> List[Optional[Dict]]:
+    """Score every emotion for every item in one matrix product.
+
+    Confidence is the average support the top emotion gets from each marked
+    region (1.0 when it is the primary emotion of every marked region). Items
+    without a recognised marking get None.
+    """
+    if not items:
+        return []
+    features = encode_batch(items)
+    scores = features @ WEIGHTS
+    marked = features.sum(axis=1)
+    ranked = np.argsort(-scores, axis=1)[:, :3]
+    top_scores = np.take_along_axis(scores, ranked, axis=1)
+    confidence = top_scores[:, 0] / np.maximum(marked, 1.0)
+
+    results = []
+    for regions, order, values, conf in zip(marked.astype(int).tolist(), ranked.tolist(),
+                                            top_scores.tolist(), confidence.tolist()):
+        if regions == 0:
+            results.append(None)
+            continue
+        emotion = EMOTIONS[order[0]]
+        results.append({
+            'emotion': emotion,
+            'confidence': round(conf, 3),
+            'description': f'{regions} marked region(s) most consistent with {emotion.lower()}',
+            'patterns': [f'{EMOTIONS[i]}: {value:.2f}' for i, value in zip(order, values) if value > 0],
+            'marked_regions': regions,
+            'source': SOURCE
+        })
+    return results
+
+def classify(body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+    """Score a single body map (see classify_batch)"""
+    return classify_batch([(body_markings, view)])[0]
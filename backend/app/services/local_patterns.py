@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Local Pattern Engine
+Shared rule-based analysis used by LocalPatternProvider and the service fallback.
+
+The rules only look at how many regions carry each sensation, so they are
+compiled once into a decision table indexed by (clamped) sensation counts and
+the resulting frozen result tuples are shared between calls.
+"""
+
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Tuple
+
+SOURCE = 'local_pattern_analysis'
+
+class FrozenResult(dict):
+    """Read-only result dict that can be shared between requests"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("local pattern results are shared and read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+# Rule templates: emotion, confidence, description, pattern format
+_RULES = (
+    ('Anger/Excitement', 0.8,
+     'Multiple hot sensations suggest high energy emotions like anger or excitement',
+     '{hot} hot sensations'),
+    ('Happiness/Contentment', 0.7,
+     'Warm sensations without hot suggest positive emotional state',
+     '{warm} warm sensations'),
+    ('Sadness/Withdrawal', 0.7,
+     'Cold sensations suggest emotional withdrawal or sadness',
+     '{cold} cold sensations'),
+    ('Anxiety/Stress', 0.6,
+     'Mixed hot and cold sensations suggest anxiety or stress',
+     '{hot} hot, {cold} cold'),
+    ('Disconnection/Shock', 0.6,
+     'Numb sensations suggest emotional disconnection or shock',
+     '{numb} numb sensations'),
+)
+
+def _fired_rules(hot: int, warm: int, cold: int, numb: int) -> Tuple[int, ...]:
+    """The original rule conditions, evaluated once per table cell"""
+    fired = []
+    if hot >= 2:                        # Pattern 1: High energy (hot sensations)
+        fired.append(0)
+    if warm >= 2 and hot == 0:          # Pattern 2: Positive warmth
+        fired.append(1)
+    if cold >= 2:                       # Pattern 3: Withdrawal (cold sensations)
+        fired.append(2)
+    if hot >= 1 and cold >= 1:          # Pattern 4: Anxiety (mixed hot and cold)
+        fired.append(3)
+    if numb >= 1:                       # Pattern 5: Numbness
+        fired.append(4)
+    return tuple(fired)
+
+# No rule distinguishes counts above these, so the table is indexed by clamped counts
+_CLAMP_HOT, _CLAMP_WARM, _CLAMP_COLD, _CLAMP_NUMB = 2, 2, 2, 1
+
+DECISION_TABLE = {
+    (hot, warm, cold, numb): _fired_rules(hot, warm, cold, numb)
+    for hot in range(_CLAMP_HOT + 1)
+    for warm in range(_CLAMP_WARM + 1)
+    for cold in range(_CLAMP_COLD + 1)
+    for numb in range(_CLAMP_NUMB + 1)
+}
+
+def count_sensations(body_markings: Dict[str, str]) -> Tuple[int, int, int, int, int]:
+    """Single pass over the markings: (hot, warm, cold, numb, total marked)"""
+    values = body_markings.values()
+    counts = Counter(values)
+    total = len(values) - counts[None] - counts['']
+    return counts['hot'], counts['warm'], counts['cold'], counts['numb'], total
+
+@lru_cache(maxsize=4096)
+def results_for_counts(hot: int, warm: int, cold: int, numb: int, total: int) -> Tuple[FrozenResult, ...]:
+    """Shared result tuple for one sensation count vector"""
+    fired = DECISION_TABLE[(min(hot, _CLAMP_HOT), min(warm, _CLAMP_WARM),
+                            min(cold, _CLAMP_COLD), min(numb, _CLAMP_NUMB))]
+    results = []
+    for rule in fired:
+        emotion, confidence, description, pattern = _RULES[rule]
+        results.append(FrozenResult(
+            emotion=emotion,
+            confidence=confidence,
+            description=description,
+            patterns=(pattern.format(hot=hot, warm=warm, cold=cold, numb=numb),),
+            source=SOURCE
+        ))
+
+    # If no clear patterns, provide general analysis
+    if not results:
+        if total == 0:
+            results.append(FrozenResult(
+                emotion='Neutral/Calm',
+                confidence=0.8,
+                description='No significant sensations detected, suggesting a calm state',
+                patterns=('no sensations',),
+                source=SOURCE
+            ))
+        else:
+            results.append(FrozenResult(
+                emotion='Mixed/Complex',
+                confidence=0.5,
+                description=f'Complex pattern of {total} sensations suggests mixed emotions',
+                patterns=(f'{total} total sensations',),
+                source=SOURCE
+            ))
+
+    return tuple(results)
+
+def analyze(body_markings: Dict[str, str]) -> Tuple[FrozenResult, ...]:
+    """Rule-based emotion analysis for one body map"""
+    return results_for_counts(*count_sensations(body_markings))
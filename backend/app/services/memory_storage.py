@@ -2,118 +2,802 @@
 """
 Simple In-Memory Storage Service
 Replaces PostgreSQL and Redis with simple Python dictionaries
+
+The dictionaries are split into lock-striped shards keyed by session id, so a
+session's mappings and emotion results always live in (and are changed under
+the lock of) one shard, and unrelated sessions never contend for a lock.
+
+Memory is bounded: sessions idle for longer than a TTL expire, and past the
+session or byte limits the least recently used sessions are evicted together
+with their mappings and emotion results. Eviction is incremental (a few
+sessions per write), so it never stalls a request.
+
+With a Journal attached, every mutation is also appended to a binary log and
+the state is periodically snapshotted, so the data survives restarts. Under the
+journal's ``always`` fsync policy a write returns once its records are on disk,
+waiting for that after releasing the shard lock.
+
+Each shard keeps ordered (created, id) indexes of its mappings (all of them, by
+view and by sensation) and of its sessions, so a page of a filtered list is a
+binary search plus a short scan per shard rather than a sort of everything.
 """
 
-from typing import Dict, List, Optional
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 import uuid
 
-class MemoryStorage:
-    """Simple in-memory storage for body mappings and sessions"""
-    
-    def __init__(self):
-        # In-memory storage
-        self.body_mappings: Dict[str, Dict] = {}
-        self.sessions: Dict[str, Dict] = {}
-        self.emotion_results: Dict[str, Dict] = {}
-        
-        # Simple counter for IDs
-        self._counter = 1
-    
+from ..core.config import settings
+from .compact_mapping import VIEW_SHIFT, CompactMapping, epoch_us, isoformat, sensation_code, sensation_codes, view_code
+from .pagination import OrderedIndex, PageBound, Position, first_page, mapping_matches
+from .storage_backend import StorageBackend
+from .storage_journal import (
+    Journal,
+    OP_CREATE_SESSION,
+    OP_DELETE_MAPPING,
+    OP_DELETE_SESSION,
+    OP_SAVE_MAPPING,
+    OP_SAVE_RESULT,
+    OP_UPDATE_MAPPING
+)
+
+def shard_of(key: str, shards: int) -> int:
+    """Stable shard index for a session id (the same in every process)"""
+    return zlib.crc32(key.encode()) % shards
+
+def sizeof(value) -> int:
+    """Approximate bytes held by a record (containers plus their keys and values)"""
+    size = sys.getsizeof(value)
+    kind = type(value)
+    if kind is dict:
+        for key, item in value.items():
+            size += sys.getsizeof(key) + (sizeof(item) if type(item) in _CONTAINERS else sys.getsizeof(item))
+    elif kind is list or kind is tuple:
+        for item in value:
+            size += sizeof(item) if type(item) in _CONTAINERS else sys.getsizeof(item)
+    return size
+
+_CONTAINERS = (dict, list, tuple)
+
+# Accounted bytes of one index entry (a created time and a key, both int64)
+_INDEX_ENTRY_BYTES = 16
+
+def _mapping_position(mapping: CompactMapping) -> Position:
+    return mapping.created, mapping.id
+
+def _session_position(entry: Tuple[int, str, Dict]) -> Position:
+    return entry[0], entry[1]
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * 4096
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _Shard:
+    """One lock and the sessions, mappings and emotion results guarded by it"""
+
+    def __init__(self, index: int, shards: int):
+        self.lock = threading.Lock()
+        # Mapping id (int) -> bit-packed record, decoded only when handed out
+        self.body_mappings: Dict[int, CompactMapping] = {}
+        # Least recently used first
+        self.sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self.emotion_results: Dict[int, Dict] = {}
+        # Monotonic time of each session's last use, and the bytes it accounts for
+        # (the session record plus its mappings and emotion results)
+        self.last_used: Dict[str, float] = {}
+        self.session_bytes: Dict[str, int] = {}
+        self.bytes = 0
+        # Mapping ids from this shard are shards + index, 2 * shards + index, ...:
+        # unique across shards and routable back to this one (id % shards).
+        # Only advanced with the lock held.
+        self.shards = shards
+        self.next_key = shards + index
+        self.clear_indexes()
+
+    def clear_indexes(self) -> None:
+        # Ordered (created, key) indexes: every mapping, mappings by view code and by
+        # sensation code (created on first use), and sessions
+        self.mapping_order = OrderedIndex()
+        self.by_view: Dict[int, OrderedIndex] = {}
+        self.by_sensation: Dict[int, OrderedIndex] = {}
+        self.session_order = OrderedIndex(int_keys=False)
+
+    def next_id(self) -> int:
+        key = self.next_key
+        self.next_key += self.shards
+        return key
+
+    def mapping_indexes(self) -> List[OrderedIndex]:
+        return [self.mapping_order, *self.by_view.values(), *self.by_sensation.values()]
+
+class MemoryStorage(StorageBackend):
+    """Thread-safe, memory-bounded in-memory storage for body mappings and sessions.
+
+    ``max_sessions`` and ``max_bytes`` (0 = unlimited) are split evenly across
+    shards; ``session_ttl`` is how long a session may go unused before it
+    expires. Every write evicts at most ``eviction_batch`` sessions from its
+    shard, so a shard over its limits converges over a few writes instead of
+    in one long pause. Byte counts are estimates of the records' Python objects.
+    """
+
+    name = 'memory'
+
+    def __init__(self, shards: int = 16, max_sessions: int = 0, max_bytes: int = 0,
+                 session_ttl: float = 0.0, eviction_batch: int = 8,
+                 journal: Optional[Journal] = None, compact_bytes: int = 64 * 1024 * 1024):
+        self._shards = [_Shard(index, shards) for index in range(shards)]
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.eviction_batch = eviction_batch
+        # Per-shard limits (rounded up so the totals are never below the configured ones)
+        self._shard_max_sessions = -(-max_sessions // shards)
+        self._shard_max_bytes = -(-max_bytes // shards)
+        self._evictions = Counter()
+        self._evictions_lock = threading.Lock()
+        # The journal sequence number of this thread's last appended record
+        self._appended = threading.local()
+
+        # Replay runs before the journal is attached, so it appends nothing
+        self._journal: Optional[Journal] = None
+        self.compact_bytes = compact_bytes
+        self._snapshot_thread: Optional[threading.Thread] = None
+        if journal is not None:
+            self._recover(journal)
+            journal.open()
+            self._journal = journal
+
+    def _session_shard(self, session_id: str) -> _Shard:
+        return self._shards[shard_of(session_id, len(self._shards))]
+
+    def _mapping_shard(self, key: int) -> _Shard:
+        """Shard holding a mapping (and its emotion result), from the id alone"""
+        return self._shards[key % len(self._shards)]
+
+    @staticmethod
+    def _mapping_key(mapping_id: str) -> Optional[int]:
+        """Internal integer key of an API mapping id (None if it cannot be one)"""
+        return int(mapping_id) if mapping_id.isdigit() else None
+
+    @staticmethod
+    def _session_view(session: Dict) -> Dict:
+        """Copy of a session that is safe to hand out of the lock"""
+        return {
+            'id': session['id'],
+            'created_at': isoformat(session['created']),
+            'body_mappings': [str(key) for key in session['body_mappings']]
+        }
+
+    # Accounting and eviction; all of these run with the shard lock held
+
+    @staticmethod
+    def _account(shard: _Shard, session_id: str, delta: int) -> None:
+        shard.session_bytes[session_id] += delta
+        shard.bytes += delta
+
+    def _expired(self, shard: _Shard, session_id: str, now: float) -> bool:
+        return self.session_ttl > 0 and now - shard.last_used[session_id] > self.session_ttl
+
+    @staticmethod
+    def _touch(shard: _Shard, session_id: str, now: float) -> None:
+        shard.last_used[session_id] = now
+        shard.sessions.move_to_end(session_id)
+
+    def _live_session(self, shard: _Shard, session_id: str, now: float) -> Optional[Dict]:
+        """The session, marked as just used, or None if it does not exist or has expired"""
+        session = shard.sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(shard, session_id, now):
+            self._count_evictions('mappings', self._remove_session(shard, session_id))
+            self._count_evictions('sessions_expired', 1)
+            return None
+        self._touch(shard, session_id, now)
+        return session
+
+    def _log(self, op: int, *fields) -> None:
+        if self._journal is not None:
+            self._appended.seq = self._journal.append(op, fields)
+
+    @contextmanager
+    def _writing(self, shard: _Shard):
+        """Hold the shard lock for a write, then (lock released, so the shard's other
+        callers need not wait for the disk) wait until the journal has it durably"""
+        with shard.lock:
+            yield
+        seq = getattr(self._appended, 'seq', None)
+        if seq is not None:
+            self._appended.seq = None
+            self._journal.wait_durable(seq)
+
+    def _new_session(self, shard: _Shard, session_id: str, now: float, created: Optional[int] = None) -> Dict:
+        created = epoch_us() if created is None else created
+        session = {
+            'id': session_id,
+            'created': created,
+            'body_mappings': []
+        }
+        if session_id in shard.sessions:
+            self._remove_session(shard, session_id)
+        self._log(OP_CREATE_SESSION, session_id, created)
+        shard.sessions[session_id] = session
+        shard.session_order.add(created, session_id)
+        shard.last_used[session_id] = now
+        shard.session_bytes[session_id] = 0
+        self._account(shard, session_id, sizeof(session) + _INDEX_ENTRY_BYTES)
+        return session
+
+    def _remove_session(self, shard: _Shard, session_id: str) -> int:
+        """Drop a session with its mappings and emotion results; returns the mapping count"""
+        self._log(OP_DELETE_SESSION, session_id)
+        session = shard.sessions.pop(session_id)
+        for key in session['body_mappings']:
+            mapping = shard.body_mappings.pop(key, None)
+            if mapping is not None:
+                self._unindex(shard, mapping)
+            shard.emotion_results.pop(key, None)
+        shard.session_order.stale += 1
+        del shard.last_used[session_id]
+        shard.bytes -= shard.session_bytes.pop(session_id)
+        self._compact_indexes(shard)
+        return len(session['body_mappings'])
+
+    # Ordered indexes; entries of removed records are left stale and compacted in bulk
+
+    @staticmethod
+    def _index(table: Dict[int, OrderedIndex], code: int) -> OrderedIndex:
+        index = table.get(code)
+        if index is None:
+            index = table[code] = OrderedIndex()
+        return index
+
+    @staticmethod
+    def _index_codes(mapping: CompactMapping) -> Tuple[int, Set[int]]:
+        """The view code and sensation codes a record is indexed under"""
+        return mapping.packed >> VIEW_SHIFT & 3, sensation_codes(mapping.packed, mapping.extra)
+
+    def _unindex(self, shard: _Shard, mapping: CompactMapping) -> int:
+        """Mark a removed record's index entries stale; returns their accounted bytes"""
+        view, sensations = self._index_codes(mapping)
+        shard.mapping_order.stale += 1
+        shard.by_view[view].stale += 1
+        for code in sensations:
+            shard.by_sensation[code].stale += 1
+        return _INDEX_ENTRY_BYTES * (2 + len(sensations))
+
+    @staticmethod
+    def _compact_indexes(shard: _Shard) -> None:
+        """Drop stale entries from indexes that are mostly stale (mapping ids are never
+        reused, so a live id means a live entry; updates move their entries eagerly)"""
+        for index in shard.mapping_indexes():
+            if index.needs_compaction():
+                index.compact(lambda created, key: key in shard.body_mappings)
+        if shard.session_order.needs_compaction():
+            shard.session_order.compact(
+                lambda created, session_id: session_id in shard.sessions and shard.sessions[session_id]['created'] == created
+            )
+
+    def _insert_mapping(self, shard: _Shard, session: Dict, mapping: CompactMapping) -> None:
+        self._log(OP_SAVE_MAPPING, mapping.id, mapping.session_id, mapping.packed, mapping.extra, mapping.created)
+        shard.body_mappings[mapping.id] = mapping
+        view, sensations = self._index_codes(mapping)
+        shard.mapping_order.add(mapping.created, mapping.id)
+        self._index(shard.by_view, view).add(mapping.created, mapping.id)
+        for code in sensations:
+            self._index(shard.by_sensation, code).add(mapping.created, mapping.id)
+        ids = session['body_mappings']
+        before = sys.getsizeof(ids)
+        ids.append(mapping.id)
+        indexed = _INDEX_ENTRY_BYTES * (2 + len(sensations))
+        self._account(shard, session['id'], mapping.nbytes() + sys.getsizeof(ids) - before + sizeof(mapping.id) + indexed)
+
+    def _replace_mapping(self, shard: _Shard, mapping: CompactMapping, updated: CompactMapping) -> None:
+        """Swap in a new record (never changed in place, so records already handed to
+        readers decoding outside the lock stay consistent)"""
+        self._log(OP_UPDATE_MAPPING, updated.id, updated.packed, updated.extra)
+        shard.body_mappings[updated.id] = updated
+        view, sensations = self._index_codes(mapping)
+        new_view, new_sensations = self._index_codes(updated)
+        entry = (updated.created, updated.id)
+        if new_view != view:
+            shard.by_view[view].remove(*entry)
+            self._index(shard.by_view, new_view).add(*entry)
+        for code in sensations - new_sensations:
+            shard.by_sensation[code].remove(*entry)
+        for code in new_sensations - sensations:
+            self._index(shard.by_sensation, code).add(*entry)
+        indexed = _INDEX_ENTRY_BYTES * (len(new_sensations) - len(sensations))
+        self._account(shard, mapping.session_id, updated.nbytes() - mapping.nbytes() + indexed)
+
+    def _drop_mapping(self, shard: _Shard, mapping: CompactMapping) -> None:
+        """Remove a mapping, its emotion result and its entry in the session"""
+        self._log(OP_DELETE_MAPPING, mapping.id)
+        key = mapping.id
+        del shard.body_mappings[key]
+        freed = mapping.nbytes() + sizeof(key) + self._unindex(shard, mapping)
+        result = shard.emotion_results.pop(key, None)
+        if result is not None:
+            freed += sizeof(result)
+        ids = shard.sessions[mapping.session_id]['body_mappings']
+        before = sys.getsizeof(ids)
+        ids.remove(key)
+        self._account(shard, mapping.session_id, sys.getsizeof(ids) - before - freed)
+        self._compact_indexes(shard)
+
+    def _store_result(self, shard: _Shard, mapping: CompactMapping, result: Dict) -> None:
+        self._log(OP_SAVE_RESULT, mapping.id, result)
+        previous = shard.emotion_results.get(mapping.id)
+        shard.emotion_results[mapping.id] = result
+        delta = sizeof(result) - (sizeof(previous) if previous is not None else 0)
+        self._account(shard, mapping.session_id, delta)
+
+    def _evict(self, shard: _Shard, now: float, keep: int = 1) -> None:
+        """Evict up to ``eviction_batch`` expired or least recently used sessions.
+
+        The ``keep`` most recently used sessions (after a write, the one just
+        written) are never evicted.
+        """
+        reasons = Counter()
+        while len(shard.sessions) > keep and sum(reasons.values()) < self.eviction_batch:
+            session_id = next(iter(shard.sessions))
+            if self._expired(shard, session_id, now):
+                reason = 'sessions_expired'
+            elif self._shard_max_sessions and len(shard.sessions) > self._shard_max_sessions:
+                reason = 'sessions_lru'
+            elif self._shard_max_bytes and shard.bytes > self._shard_max_bytes:
+                reason = 'sessions_over_bytes'
+            else:
+                break
+            reasons[reason] += 1
+            self._count_evictions('mappings', self._remove_session(shard, session_id))
+        for reason, count in reasons.items():
+            self._count_evictions(reason, count)
+
+    def _count_evictions(self, kind: str, count: int) -> None:
+        if count:
+            with self._evictions_lock:
+                self._evictions[kind] += count
+
+    # Sessions
+
     def create_session(self, session_id: Optional[str] = None) -> str:
         """Create a new session"""
         if not session_id:
             session_id = str(uuid.uuid4())
-        
-        self.sessions[session_id] = {
-            'id': session_id,
-            'created_at': datetime.now().isoformat(),
-            'body_mappings': []
-        }
-        
+
+        shard = self._session_shard(session_id)
+        now = time.monotonic()
+        with self._writing(shard):
+            self._new_session(shard, session_id, now)
+            self._evict(shard, now)
+
         return session_id
-    
+
+    def ensure_session(self, session_id: str) -> None:
+        """Create the session unless it already exists (atomic check-and-create)"""
+        shard = self._session_shard(session_id)
+        now = time.monotonic()
+        with self._writing(shard):
+            if self._live_session(shard, session_id, now) is None:
+                self._new_session(shard, session_id, now)
+                self._evict(shard, now)
+
+    def has_session(self, session_id: str) -> bool:
+        shard = self._session_shard(session_id)
+        with shard.lock:
+            return self._live_session(shard, session_id, time.monotonic()) is not None
+
     def save_body_mapping(self, session_id: str, body_markings: Dict[str, str], view: str) -> str:
-        """Save body mapping to memory"""
-        mapping_id = str(self._counter)
-        self._counter += 1
-        
-        mapping_data = {
-            'id': mapping_id,
-            'session_id': session_id,
-            'body_markings': body_markings,
-            'view': view,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        self.body_mappings[mapping_id] = mapping_data
-        
-        # Add to session
-        if session_id in self.sessions:
-            self.sessions[session_id]['body_mappings'].append(mapping_id)
-        
-        return mapping_id
-    
+        """Save body mapping to memory (creating the session if needed, so it can be evicted with it)"""
+        shard = self._session_shard(session_id)
+        now = time.monotonic()
+        with self._writing(shard):
+            session = self._live_session(shard, session_id, now)
+            if session is None:
+                session = self._new_session(shard, session_id, now)
+
+            key = shard.next_id()
+            # session['id'] rather than session_id, so the record shares the stored string
+            self._insert_mapping(shard, session, CompactMapping(key, session['id'], body_markings, view))
+            self._evict(shard, now)
+
+        return str(key)
+
+    def _live_mapping(self, shard: _Shard, key: int, now: float) -> Optional[CompactMapping]:
+        """A mapping whose session is still live (marking the session as used)"""
+        mapping = shard.body_mappings.get(key)
+        if mapping is None or self._live_session(shard, mapping.session_id, now) is None:
+            return None
+        return mapping
+
     def get_body_mapping(self, mapping_id: str) -> Optional[Dict]:
         """Get body mapping by ID"""
-        return self.body_mappings.get(mapping_id)
-    
+        key = self._mapping_key(mapping_id)
+        if key is None:
+            return None
+        shard = self._mapping_shard(key)
+        with shard.lock:
+            mapping = self._live_mapping(shard, key, time.monotonic())
+        return mapping.to_dict() if mapping is not None else None
+
+    def update_body_mapping(self, mapping_id: str, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Replace a mapping's markings and view; returns the updated mapping"""
+        key = self._mapping_key(mapping_id)
+        if key is None:
+            return None
+        shard = self._mapping_shard(key)
+        now = time.monotonic()
+        with self._writing(shard):
+            mapping = self._live_mapping(shard, key, now)
+            if mapping is None:
+                return None
+            updated = CompactMapping(key, mapping.session_id, body_markings, view, mapping.created)
+            self._replace_mapping(shard, mapping, updated)
+            self._evict(shard, now)
+        return updated.to_dict()
+
+    def delete_body_mapping(self, mapping_id: str) -> bool:
+        """Delete a mapping, its emotion result and its entry in the session"""
+        key = self._mapping_key(mapping_id)
+        if key is None:
+            return False
+        shard = self._mapping_shard(key)
+        with self._writing(shard):
+            mapping = self._live_mapping(shard, key, time.monotonic())
+            if mapping is None:
+                return False
+            self._drop_mapping(shard, mapping)
+            return True
+
     def get_session_mappings(self, session_id: str) -> List[Dict]:
         """Get all body mappings for a session"""
-        if session_id not in self.sessions:
-            return []
-        
-        mapping_ids = self.sessions[session_id]['body_mappings']
-        return [self.body_mappings.get(mid) for mid in mapping_ids if mid in self.body_mappings]
-    
-    def save_emotion_result(self, mapping_id: str, emotion_result: Dict) -> None:
-        """Save emotion analysis result"""
-        self.emotion_results[mapping_id] = {
-            'mapping_id': mapping_id,
-            'result': emotion_result,
-            'created_at': datetime.now().isoformat()
-        }
-    
+        shard = self._session_shard(session_id)
+        with shard.lock:
+            session = self._live_session(shard, session_id, time.monotonic())
+            if session is None:
+                return []
+
+            mappings = [shard.body_mappings[key] for key in session['body_mappings'] if key in shard.body_mappings]
+        # Records are only decoded once out of the lock
+        return [mapping.to_dict() for mapping in mappings]
+
+    def list_body_mappings(self) -> List[Dict]:
+        """All body mappings of live sessions, oldest first"""
+        mappings = []
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                mappings.extend(
+                    mapping for mapping in shard.body_mappings.values()
+                    if not self._expired(shard, mapping.session_id, now)
+                )
+        mappings.sort(key=lambda mapping: (mapping.created, mapping.id))
+        return [mapping.to_dict() for mapping in mappings]
+
+    def _mapping_run(self, shard: _Shard, limit: int, after: Optional[Position], bound: Optional[Position],
+                     now: float, view: Optional[str], session_id: Optional[str], sensation: Optional[str],
+                     created_from: Optional[int], created_to: Optional[int]) -> List[CompactMapping]:
+        """Up to ``limit + 1`` of the shard's matching mappings after ``after`` and up to
+        ``bound``, in order (lock held). Candidates come from the session's own list or
+        the smallest index covering the filters; every candidate is then checked in full."""
+        if session_id is not None:
+            session = shard.sessions.get(session_id)
+            if session is None:
+                return []
+            mappings = [shard.body_mappings[key] for key in session['body_mappings'] if key in shard.body_mappings]
+            entries = sorted(map(_mapping_position, mappings))
+        else:
+            candidates = [shard.mapping_order]
+            if view is not None:
+                candidates.append(shard.by_view.get(view_code(view)))
+            code = sensation_code(sensation) if sensation is not None else None
+            if code is not None:
+                candidates.append(shard.by_sensation.get(code))
+            if None in candidates:
+                return []
+            index = min(candidates, key=len)
+            entries = index.scan(index.start(created_from, after), created_to)
+
+        run = []
+        for created, key in entries:
+            if bound is not None and (created, key) > bound:
+                break
+            mapping = shard.body_mappings.get(key)
+            if mapping is None or mapping.created != created or (after is not None and (created, key) <= after):
+                continue
+            if self._expired(shard, mapping.session_id, now):
+                continue
+            if mapping_matches(mapping, view, session_id, sensation, created_from, created_to):
+                run.append(mapping)
+                if len(run) > limit:
+                    break
+        return run
+
+    def page_body_mappings(self, limit: int, after: Optional[Position] = None, view: Optional[str] = None,
+                           session_id: Optional[str] = None, sensation: Optional[str] = None,
+                           created_from: Optional[int] = None,
+                           created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """One page of mappings of live sessions, merged from every shard's run"""
+        now = time.monotonic()
+        shards = [self._session_shard(session_id)] if session_id is not None else self._shards
+        runs = []
+        bound = PageBound(limit)
+        for shard in shards:
+            with shard.lock:
+                run = self._mapping_run(shard, limit, after, bound.position, now, view, session_id, sensation,
+                                        created_from, created_to)
+            runs.append(run)
+            bound.add(map(_mapping_position, run))
+        mappings, position = first_page(runs, limit, _mapping_position)
+        return [mapping.to_dict() for mapping in mappings], position
+
+    # Emotion results
+
+    def save_emotion_result(self, mapping_id: str, emotion_result: Dict) -> bool:
+        """Save emotion analysis result; False if the mapping does not exist (or was evicted)"""
+        key = self._mapping_key(mapping_id)
+        if key is None:
+            return False
+        shard = self._mapping_shard(key)
+        now = time.monotonic()
+        with self._writing(shard):
+            mapping = self._live_mapping(shard, key, now)
+            if mapping is None:
+                return False
+            result = {
+                'mapping_id': mapping_id,
+                'result': emotion_result,
+                'created_at': datetime.now().isoformat()
+            }
+            self._store_result(shard, mapping, result)
+            self._evict(shard, now)
+            return True
+
     def get_emotion_result(self, mapping_id: str) -> Optional[Dict]:
         """Get emotion analysis result by mapping ID"""
-        return self.emotion_results.get(mapping_id)
-    
+        key = self._mapping_key(mapping_id)
+        if key is None:
+            return None
+        shard = self._mapping_shard(key)
+        with shard.lock:
+            if self._live_mapping(shard, key, time.monotonic()) is None:
+                return None
+            result = shard.emotion_results.get(key)
+            return dict(result) if result is not None else None
+
     def list_sessions(self) -> List[Dict]:
-        """List all sessions"""
-        return list(self.sessions.values())
-    
+        """List all live sessions"""
+        sessions = []
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                sessions.extend(
+                    self._session_view(session) for session_id, session in shard.sessions.items()
+                    if not self._expired(shard, session_id, now)
+                )
+        sessions.sort(key=lambda session: session['created_at'])
+        return sessions
+
+    def page_sessions(self, limit: int, after: Optional[Position] = None, created_from: Optional[int] = None,
+                      created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """One page of live sessions, merged from every shard's session index"""
+        now = time.monotonic()
+        runs = []
+        bound = PageBound(limit)
+        for shard in self._shards:
+            run = []
+            with shard.lock:
+                index = shard.session_order
+                for created, session_id in index.scan(index.start(created_from, after), created_to):
+                    if bound.position is not None and (created, session_id) > bound.position:
+                        break
+                    session = shard.sessions.get(session_id)
+                    if session is None or session['created'] != created or self._expired(shard, session_id, now):
+                        continue
+                    run.append((created, session_id, self._session_view(session)))
+                    if len(run) > limit:
+                        break
+            runs.append(run)
+            bound.add(map(_session_position, run))
+        entries, position = first_page(runs, limit, _session_position)
+        return [view for _, _, view in entries], position
+
     def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its mappings"""
-        if session_id not in self.sessions:
+        shard = self._session_shard(session_id)
+        with self._writing(shard):
+            if self._live_session(shard, session_id, time.monotonic()) is None:
+                return False
+            self._remove_session(shard, session_id)
+            return True
+
+    # Housekeeping
+
+    def sweep(self) -> None:
+        """Run one incremental eviction pass over every shard (for idle periods without
+        writes), and compact the journal once its live segment passes ``compact_bytes``"""
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                self._evict(shard, now, keep=0)
+        if self._journal is not None and self._journal.segment_bytes > self.compact_bytes:
+            self.compact(wait=False)
+
+    # Journal: recovery and compaction
+
+    def _recover(self, journal: Journal) -> None:
+        """Rebuild the state from the journal's snapshot and the segments after it"""
+        started = time.perf_counter()
+        header = journal.read_snapshot_header()
+        if header is not None:
+            shards, _, next_keys = header
+            if shards != len(self._shards):
+                raise ValueError(
+                    f"Journal in {journal.directory} was written with {shards} storage shards; "
+                    f"set STORAGE_SHARDS={shards} (mapping ids route to shards by id % shards)"
+                )
+            for shard, next_key in zip(self._shards, next_keys):
+                shard.next_key = next_key
+        records = 0
+        for op, fields in journal.replay():
+            self._apply(op, fields)
+            records += 1
+        journal.metrics['recovered_records'] = records
+        journal.metrics['recovery_seconds'] = round(time.perf_counter() - started, 3)
+        if records:
+            print(f"💾 Recovered {records} journal records from {journal.directory} "
+                  f"in {journal.metrics['recovery_seconds']}s")
+
+    def _apply(self, op: int, fields: tuple) -> None:
+        """Replay one journal record (no eviction; the next writes and sweeps catch up)"""
+        now = time.monotonic()
+        if op == OP_CREATE_SESSION:
+            session_id, created = fields
+            self._new_session(self._session_shard(session_id), session_id, now, created)
+        elif op == OP_DELETE_SESSION:
+            (session_id,) = fields
+            shard = self._session_shard(session_id)
+            if session_id in shard.sessions:
+                self._remove_session(shard, session_id)
+        elif op == OP_SAVE_MAPPING:
+            key, session_id, packed, extra, created = fields
+            shard = self._session_shard(session_id)
+            if self._mapping_shard(key) is not shard:
+                raise ValueError(f"Journal mapping {key} does not belong to the shard of session {session_id}")
+            session = shard.sessions.get(session_id) or self._new_session(shard, session_id, now)
+            self._insert_mapping(shard, session, CompactMapping.from_packed(key, session['id'], packed, extra, created))
+            shard.next_key = max(shard.next_key, key + len(self._shards))
+        else:
+            key = fields[0]
+            shard = self._mapping_shard(key)
+            mapping = shard.body_mappings.get(key)
+            if mapping is None:
+                return
+            if op == OP_UPDATE_MAPPING:
+                _, packed, extra = fields
+                updated = CompactMapping.from_packed(key, mapping.session_id, packed, extra, mapping.created)
+                self._replace_mapping(shard, mapping, updated)
+            elif op == OP_DELETE_MAPPING:
+                self._drop_mapping(shard, mapping)
+            elif op == OP_SAVE_RESULT:
+                self._store_result(shard, mapping, fields[1])
+
+    def compact(self, wait: bool = True) -> bool:
+        """Snapshot the current state and drop the journal segments it replaces.
+
+        Writers are paused only while the journal switches segments and each
+        shard's dicts are shallow-copied (records are never changed in place);
+        the snapshot itself is written by a background thread. Returns False if
+        there is no journal or a snapshot is already being written.
+        """
+        if self._journal is None or (self._snapshot_thread is not None and self._snapshot_thread.is_alive()):
             return False
-        
-        # Remove all mappings for this session
-        mapping_ids = self.sessions[session_id]['body_mappings']
-        for mid in mapping_ids:
-            if mid in self.body_mappings:
-                del self.body_mappings[mid]
-            if mid in self.emotion_results:
-                del self.emotion_results[mid]
-        
-        # Remove session
-        del self.sessions[session_id]
+        # Always lock shards in index order so this cannot deadlock with clear_all
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            first_segment = self._journal.begin_snapshot()
+            next_keys = [shard.next_key for shard in self._shards]
+            copies = [
+                ([(session_id, session['created']) for session_id, session in shard.sessions.items()],
+                 list(shard.body_mappings.values()),
+                 list(shard.emotion_results.items()))
+                for shard in self._shards
+            ]
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+
+        def records():
+            for sessions, _, _ in copies:
+                for session_id, created in sessions:
+                    yield OP_CREATE_SESSION, (session_id, created)
+            for _, mappings, _ in copies:
+                for mapping in mappings:
+                    yield OP_SAVE_MAPPING, (mapping.id, mapping.session_id, mapping.packed, mapping.extra, mapping.created)
+            for _, _, results in copies:
+                for key, result in results:
+                    yield OP_SAVE_RESULT, (key, result)
+
+        self._snapshot_thread = threading.Thread(
+            target=self._journal.write_snapshot, args=(first_segment, next_keys, records()),
+            name='storage-snapshot', daemon=True
+        )
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
         return True
-    
+
+    def close(self) -> None:
+        """Finish any snapshot and make the journal durable"""
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._journal is not None:
+            self._journal.close()
+
     def get_stats(self) -> Dict:
         """Get storage statistics"""
+        sessions = mappings = results = total_bytes = index_bytes = 0
+        for shard in self._shards:
+            with shard.lock:
+                sessions += len(shard.sessions)
+                mappings += len(shard.body_mappings)
+                results += len(shard.emotion_results)
+                total_bytes += shard.bytes
+                index_bytes += sum(index.nbytes() for index in shard.mapping_indexes()) + shard.session_order.nbytes()
+        with self._evictions_lock:
+            evictions = dict(self._evictions)
         return {
-            'total_sessions': len(self.sessions),
-            'total_mappings': len(self.body_mappings),
-            'total_emotion_results': len(self.emotion_results),
-            'memory_usage': 'In-memory storage'
+            'backend': self.name,
+            'total_sessions': sessions,
+            'total_mappings': mappings,
+            'total_emotion_results': results,
+            'shards': len(self._shards),
+            'memory_usage_bytes': total_bytes,
+            'index_bytes': index_bytes,
+            'process_rss_bytes': process_rss_bytes(),
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'session_ttl_seconds': self.session_ttl,
+            'evictions': {
+                'sessions_expired': evictions.get('sessions_expired', 0),
+                'sessions_lru': evictions.get('sessions_lru', 0),
+                'sessions_over_bytes': evictions.get('sessions_over_bytes', 0),
+                'mappings': evictions.get('mappings', 0)
+            },
+            'journal': self._journal.get_stats() if self._journal is not None else None
         }
-    
+
     def clear_all(self) -> None:
         """Clear all data (useful for testing)"""
-        self.body_mappings.clear()
-        self.sessions.clear()
-        self.emotion_results.clear()
-        self._counter = 1
-
-# Global instance
-memory_storage = MemoryStorage()
+        # Always lock shards in index order so concurrent clears cannot deadlock
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            for index, shard in enumerate(self._shards):
+                shard.body_mappings.clear()
+                shard.sessions.clear()
+                shard.emotion_results.clear()
+                shard.last_used.clear()
+                shard.session_bytes.clear()
+                shard.bytes = 0
+                shard.next_key = len(self._shards) + index
+                shard.clear_indexes()
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+        with self._evictions_lock:
+            self._evictions.clear()
+        # An empty snapshot supersedes everything journaled so far
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self.compact()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro Batcher
+Collects concurrent analyses for one provider and sends them as a single batched prompt
+"""
+
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+class MicroBatcher:
+    """Groups analysis requests for up to ``window`` seconds or ``max_size`` items.
+
+    The batch is sent through ``provider.analyze_batch`` and the parsed answers
+    are fanned back out to the waiting callers. Items missing from the batch
+    answer (or every item, if it could not be parsed) fall back to individual
+    ``provider.analyze_emotions`` calls.
+    """
+
+    def __init__(self, provider, window: float = 0.02, max_size: int = 8):
+        self.provider = provider
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[Dict[str, str], str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.size_histogram = Counter()
+        self.metrics = {
+            'batches': 0,
+            'items': 0,
+            'fallback_items': 0,
+            'parse_failures': 0
+        }
+
+    async def submit(self, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Queue one analysis and wait for its share of the batch result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((body_markings, view, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Hand the pending items to a batch task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up while waiting are dropped from the batch
+        batch = [item for item in self._pending if not item[2].done()]
+        self._pending = []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Dict[str, str], str, asyncio.Future]]) -> None:
+        self.metrics['batches'] += 1
+        self.metrics['items'] += len(batch)
+        self.size_histogram[len(batch)] += 1
+
+        if len(batch) == 1:
+            await self._run_single(*batch[0])
+            return
+
+        items = [(str(index), body_markings, view) for index, (body_markings, view, _) in enumerate(batch)]
+        try:
+            results = await self.provider.analyze_batch(items)
+        except Exception as e:
+            # e.g. ProviderHTTPError: every caller sees the same failure (the same
+            # exception object, so the provider's breaker counts one failed request)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if results is None:
+            self.metrics['parse_failures'] += 1
+            results = {}
+
+        missing = []
+        for (item_id, _, _), (body_markings, view, future) in zip(items, batch):
+            if item_id in results:
+                if not future.done():
+                    future.set_result(results[item_id])
+            else:
+                missing.append((body_markings, view, future))
+
+        if missing:
+            print(f"📦 Batch answer incomplete, re-running {len(missing)} item(s) individually")
+            self.metrics['fallback_items'] += len(missing)
+            await asyncio.gather(*(self._run_single(*item) for item in missing))
+
+    async def _run_single(self, body_markings: Dict[str, str], view: str, future: asyncio.Future) -> None:
+        if future.done():
+            return
+        try:
+            result = await self.provider.analyze_emotions(body_markings, view)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """Batch counters and batch-size histogram"""
+        return {
+            **self.metrics,
+            'window_ms': round(self.window * 1000, 1),
+            'max_size': self.max_size,
+            'size_histogram': {str(size): count for size, count in sorted(self.size_histogram.items())}
+        }
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Neighbor Index
+Hamming-distance nearest-neighbour search over the bit vectors of analyzed body maps.
+
+A map is encoded per view as one bit per (region, sensation) pair, packed into two
+64-bit words. Vectors are bucketed by view and popcount (number of marked regions):
+since |popcount(a) - popcount(b)| <= hamming(a, b), a query within radius r only
+scans the 2r + 1 neighbouring buckets, nearest first, each with one vectorized
+XOR + popcount pass. Exact matches are answered from a dict without scanning.
+
+Only maps that the bit vector describes completely are indexed or looked up: a
+map with a region or sensation outside the vocabulary (or no markings at all)
+has no faithful vector, so it never matches and is never served.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .local_classifier import REGIONS, SENSATIONS
+
+_BIT = {
+    (region, sensation): r * len(SENSATIONS) + s
+    for r, region in enumerate(REGIONS)
+    for s, sensation in enumerate(SENSATIONS)
+}
+_WORD_MASK = (1 << 64) - 1
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        """SWAR popcount for numpy releases without bitwise_count"""
+        words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (words * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+def encode(body_markings: Dict[str, str]) -> Optional[int]:
+    """Bit vector of one view's markings, or None if the map is empty or marks any
+    region or sensation outside the vocabulary"""
+    bits = 0
+    for region, sensation in body_markings.items():
+        bit = _BIT.get((region, sensation))
+        if bit is None:
+            return None
+        bits |= 1 << bit
+    return bits or None
+
+class _Bucket:
+    """Growable packed vectors (low and high 64-bit words) with their entry ids"""
+
+    def __init__(self, capacity: int = 64):
+        self.low = np.zeros(capacity, dtype=np.uint64)
+        self.high = np.zeros(capacity, dtype=np.uint64)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, bits: int, entry_id: int) -> None:
+        if self.size == len(self.ids):
+            capacity = self.size * 2
+            self.low = np.resize(self.low, capacity)
+            self.high = np.resize(self.high, capacity)
+            self.ids = np.resize(self.ids, capacity)
+        self.low[self.size] = bits & _WORD_MASK
+        self.high[self.size] = bits >> 64
+        self.ids[self.size] = entry_id
+        self.size += 1
+
+    def nearest(self, low: np.uint64, high: np.uint64) -> Tuple[int, int]:
+        """(distance, entry id) of the closest vector in the bucket"""
+        distances = _popcount(self.low[:self.size] ^ low)
+        distances += _popcount(self.high[:self.size] ^ high)
+        row = int(distances.argmin())
+        return int(distances[row]), int(self.ids[row])
+
+    @property
+    def nbytes(self) -> int:
+        return self.low.nbytes + self.high.nbytes + self.ids.nbytes
+
+class NeighborIndex:
+    """Stores results by body-map bit vector and finds the closest one within a radius.
+
+    Results are stored by reference; re-adding a vector replaces its result. Once
+    ``max_entries`` vectors are stored new ones are rejected until ``clear``.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self._exact: Dict[str, Dict[int, int]] = {}
+        self._results: List[Dict] = []
+        self.metrics = {
+            'lookups': 0,
+            'exact_hits': 0,
+            'neighbor_hits': 0,
+            'misses': 0,
+            'rejected': 0,
+            'unindexable': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def add(self, body_markings: Dict[str, str], view: str, result: Dict) -> None:
+        """Store a result under the map's bit vector (unless it has none)"""
+        bits = encode(body_markings)
+        if bits is None:
+            self.metrics['unindexable'] += 1
+            return
+        exact = self._exact.setdefault(view, {})
+        entry_id = exact.get(bits)
+        if entry_id is not None:
+            self._results[entry_id] = result
+            return
+        if len(self._results) >= self.max_entries:
+            self.metrics['rejected'] += 1
+            return
+        entry_id = len(self._results)
+        self._results.append(result)
+        exact[bits] = entry_id
+        bucket_key = (view, bin(bits).count('1'))
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = _Bucket()
+        bucket.append(bits, entry_id)
+
+    def nearest(self, body_markings: Dict[str, str], view: str, radius: int) -> Optional[Tuple[int, Dict]]:
+        """(distance, result) of the closest stored map within ``radius`` bits, or None"""
+        self.metrics['lookups'] += 1
+        bits = encode(body_markings)
+        if bits is None:
+            self.metrics['unindexable'] += 1
+            return None
+        entry_id = self._exact.get(view, {}).get(bits)
+        if entry_id is not None:
+            self.metrics['exact_hits'] += 1
+            return 0, self._results[entry_id]
+
+        low, high = np.uint64(bits & _WORD_MASK), np.uint64(bits >> 64)
+        marked = bin(bits).count('1')
+        best: Optional[Tuple[int, int]] = None
+        # Closest popcount buckets first; a bucket can't beat its popcount difference
+        counts = sorted(range(max(0, marked - radius), marked + radius + 1), key=lambda c: abs(c - marked))
+        for count in counts:
+            if best is not None and best[0] <= abs(count - marked):
+                break
+            bucket = self._buckets.get((view, count))
+            if bucket is None or bucket.size == 0:
+                continue
+            candidate = bucket.nearest(low, high)
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+
+        if best is None or best[0] > radius:
+            self.metrics['misses'] += 1
+            return None
+        self.metrics['neighbor_hits'] += 1
+        return best[0], self._results[best[1]]
+
+    def clear(self) -> int:
+        """Drop every stored vector; returns the count"""
+        count = len(self._results)
+        self._buckets.clear()
+        self._exact.clear()
+        self._results = []
+        return count
+
+    def get_stats(self) -> Dict:
+        """Lookup counters, size and memory held by the packed vectors"""
+        return {
+            **self.metrics,
+            'entries': len(self._results),
+            'max_entries': self.max_entries,
+            'vector_bytes': sum(bucket.nbytes for bucket in self._buckets.values()),
+            'buckets': len(self._buckets)
+        }
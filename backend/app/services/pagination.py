@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Pagination
+Opaque cursors and ordered indexes for paging through body mappings and sessions.
+
+Lists are ordered by (created, key), where key is the mapping id or the session id, and
+a cursor is the (created, key) position of the last item handed out. A page is then
+"the first ``limit`` items after that position", which an ordered index answers by
+binary search, however deep the page.
+"""
+
+import base64
+import heapq
+import itertools
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .compact_mapping import CompactMapping, epoch_us, has_sensation, unpack_view
+
+Key = Union[int, str]
+Position = Tuple[int, Key]
+
+# Cursor kinds, so a session cursor is not accepted for mappings and vice versa
+MAPPINGS = 'm'
+SESSIONS = 's'
+
+def encode_cursor(kind: str, position: Position) -> str:
+    created, key = position
+    data = json.dumps([kind, created, key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def decode_cursor(kind: str, cursor: str) -> Position:
+    """The position in a cursor from ``encode_cursor``; ValueError if it is not one of ``kind``"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_kind, created, key = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    key_type = int if kind == MAPPINGS else str
+    if cursor_kind != kind or type(created) is not int or type(key) is not key_type:
+        raise ValueError("Cursor does not belong to this list")
+    return created, key
+
+def to_epoch_us(moment: Optional[datetime]) -> Optional[int]:
+    """A query datetime as stored timestamps are kept (naive local time, see ``epoch_us``)"""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return epoch_us(moment)
+
+def mapping_matches(mapping: CompactMapping, view: Optional[str] = None, session_id: Optional[str] = None,
+                    sensation: Optional[str] = None, created_from: Optional[int] = None,
+                    created_to: Optional[int] = None) -> bool:
+    """Whether a record passes every given filter (``created_to`` is exclusive)"""
+    return (
+        (session_id is None or mapping.session_id == session_id)
+        and (created_from is None or mapping.created >= created_from)
+        and (created_to is None or mapping.created < created_to)
+        and (view is None or unpack_view(mapping.packed, mapping.extra) == view)
+        and (sensation is None or has_sensation(mapping.packed, mapping.extra, sensation))
+    )
+
+def first_page(runs: Iterable[List], limit: int, position: Callable) -> Tuple[List, Optional[Position]]:
+    """Merge runs already in (created, key) order into one page of ``limit`` items and the
+    position to continue from (None if nothing is left). Each run should hold up to
+    ``limit + 1`` items, so a longer merged list means there is another page."""
+    items = list(itertools.islice(heapq.merge(*runs, key=position), limit + 1))
+    if len(items) <= limit:
+        return items, None
+    return items[:limit], position(items[limit - 1])
+
+class PageBound:
+    """The (limit + 1)-th smallest position among the runs collected so far: nothing
+    after it can make the page, so runs collected later may stop there"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.best: List[Position] = []
+
+    def add(self, positions: Iterable[Position]) -> None:
+        self.best = heapq.nsmallest(self.limit + 1, itertools.chain(self.best, positions))
+
+    @property
+    def position(self) -> Optional[Position]:
+        return self.best[-1] if len(self.best) > self.limit else None
+
+class OrderedIndex:
+    """(created, key) entries in ascending order, created times and integer keys in
+    int64 arrays (string keys in a list).
+
+    Appending in order, the usual case for new records, is O(1); other inserts
+    and ``remove`` shift the arrays. Entries of deleted records may instead be
+    left behind and counted in ``stale``: readers check every entry against the
+    live record anyway, and ``compact`` drops them in one pass.
+    """
+
+    __slots__ = ('created', 'keys', 'stale')
+
+    def __init__(self, int_keys: bool = True):
+        self.created = array('q')
+        self.keys = array('q') if int_keys else []
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self.created)
+
+    def after(self, position: Position) -> int:
+        """Index of the first entry after ``position``"""
+        created, key = position
+        low = bisect_left(self.created, created)
+        high = bisect_right(self.created, created, low)
+        return bisect_right(self.keys, key, low, high)
+
+    def start(self, created_from: Optional[int], position: Optional[Position]) -> int:
+        """Index of the first entry at or after ``created_from`` and after ``position``"""
+        start = bisect_left(self.created, created_from) if created_from is not None else 0
+        return max(start, self.after(position)) if position is not None else start
+
+    def add(self, created: int, key: Key) -> None:
+        if not self.created or (created, key) > (self.created[-1], self.keys[-1]):
+            self.created.append(created)
+            self.keys.append(key)
+        else:
+            index = self.after((created, key))
+            self.created.insert(index, created)
+            self.keys.insert(index, key)
+
+    def remove(self, created: int, key: Key) -> None:
+        index = self.after((created, key)) - 1
+        if index >= 0 and self.created[index] == created and self.keys[index] == key:
+            del self.created[index]
+            del self.keys[index]
+
+    def scan(self, start: int, created_to: Optional[int] = None) -> Iterator[Tuple[int, Key]]:
+        """Entries from index ``start`` on, up to (excluding) ``created_to``"""
+        end = bisect_left(self.created, created_to, start) if created_to is not None else len(self.created)
+        created, keys = self.created, self.keys
+        for index in range(start, end):
+            yield created[index], keys[index]
+
+    def compact(self, live: Callable[[int, Key], bool]) -> None:
+        """Drop every entry ``live`` rejects, keeping the order"""
+        entries = [(created, key) for created, key in zip(self.created, self.keys) if live(created, key)]
+        self.created = array('q', [created for created, _ in entries])
+        self.keys = array('q', [key for _, key in entries]) if isinstance(self.keys, array) else [key for _, key in entries]
+        self.stale = 0
+
+    def needs_compaction(self) -> bool:
+        """Whether stale entries make up over half of a not-tiny index"""
+        return self.stale > 1024 and self.stale * 2 > len(self.created)
+
+    def nbytes(self) -> int:
+        """Bytes of the arrays themselves (string keys are shared with the records)"""
+        return self.created.itemsize * len(self.created) + 8 * len(self.keys)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Persistent Cache
+SQLite (WAL mode) L2 cache for emotion analysis results, shared by every worker on the host
+and kept across restarts. Keys are the same canonical keys as the in-process ResultCache.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals (id, bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+    BEGIN UPDATE totals SET bytes = bytes + new.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results
+    BEGIN UPDATE totals SET bytes = bytes + new.size - old.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+    BEGIN UPDATE totals SET bytes = bytes - old.size WHERE id = 0; END;
+"""
+
+class PersistentResultCache:
+    """Size-bounded, TTL-expiring result cache in a SQLite file.
+
+    WAL mode lets readers in every process run alongside a writer. ``get`` is a
+    blocking read, so async callers run it in a worker thread; every write (new
+    results, read-time refreshes, expiry and eviction) goes to a writer thread
+    with its own connection, so ``set`` never waits on the database. Writes
+    wait at most ``busy_timeout`` seconds for the lock and are dropped (and
+    counted) rather than retried, as are writes arriving while ``max_pending``
+    are already queued. Entries past ``max_bytes`` are evicted least recently
+    used first; read times are refreshed at most every ``touch_interval``
+    seconds so lookups rarely need to write. Expiry uses wall-clock time since
+    entries outlive the process.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: float = 86400.0,
+                 busy_timeout: float = 0.05, touch_interval: float = 60.0, max_pending: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Workers starting together may race on creating the schema, so wait longer here
+        self._db = self._connect(timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        self._writer = self._connect(timeout=busy_timeout)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'expirations': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'write_errors': 0,
+            'dropped_writes': 0
+        }
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._write_loop, name='l2-cache-writer', daemon=True)
+        self._thread.start()
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._metrics_lock:
+            self.metrics[name] += amount
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result, or None on miss/expiry (blocks on a read)"""
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at, accessed_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️  L2 cache read failed: {e}")
+            row = None
+        if row is None:
+            self._count('misses')
+            return None
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at <= now:
+            self._submit(self._expire, key, now)
+            self._count('expirations')
+            self._count('misses')
+            return None
+        if now - accessed_at > self.touch_interval:
+            self._submit(self._write, "UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        """Queue an insert or refresh of a result; the writer then evicts past ``max_bytes``"""
+        payload = json.dumps(value, default=str)
+        size = len(key) + len(payload)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        self._submit(self._insert, key, payload, size, now + (self.ttl if ttl is None else ttl), now)
+
+    def _submit(self, write: Callable, *args) -> Optional[Future]:
+        """Queue a write for the writer thread; None (and counted) if the queue is full"""
+        future = Future()
+        try:
+            self._queue.put_nowait((future, write, args))
+        except queue.Full:
+            self._count('dropped_writes')
+            return None
+        return future
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, write, args = item
+            try:
+                future.set_result(write(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def flush(self) -> None:
+        """Wait until every write queued so far has been applied"""
+        future = self._submit(lambda: None)
+        if future is not None:
+            future.result()
+
+    def _insert(self, key: str, payload: str, size: int, expires_at: float, now: float) -> None:
+        written = self._write(
+            "INSERT INTO results (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+            (key, payload, size, expires_at, now)
+        )
+        if written:
+            self._evict()
+
+    def _expire(self, key: str, now: float) -> None:
+        self._write("DELETE FROM results WHERE key = ? AND expires_at <= ?", (key, now))
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used ones, until under ``max_bytes``"""
+        if self._total_bytes(self._writer) <= self.max_bytes:
+            return
+        purged = self._write("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        self._count('expirations', purged or 0)
+        while self._total_bytes(self._writer) > self.max_bytes:
+            evicted = self._write(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed_at LIMIT 64)"
+            )
+            if not evicted:
+                break
+            self._count('evictions', evicted)
+
+    def _total_bytes(self, db: sqlite3.Connection) -> int:
+        return db.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def _write(self, sql: str, params: tuple = ()) -> Optional[int]:
+        """Run one write statement on the writer connection; the row count, or None if
+        the database was busy"""
+        try:
+            return self._writer.execute(sql, params).rowcount
+        except sqlite3.Error as e:
+            self._count('write_errors')
+            print(f"⚠️  L2 cache write failed: {e}")
+            return None
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Drop every entry, or only those under a provider/prompt namespace; returns the
+        count (blocks until the writer thread has run it)"""
+        if namespace is None:
+            future = self._submit(self._write, "DELETE FROM results")
+        else:
+            # Keys under a namespace sort between "ns|" and "ns}" ("}" follows "|")
+            future = self._submit(self._write, "DELETE FROM results WHERE key >= ? AND key < ?",
+                                  (f"{namespace}|", f"{namespace}}}"))
+        removed = (future.result() if future is not None else None) or 0
+        self._count('invalidations', removed)
+        return removed
+
+    def close(self) -> None:
+        """Apply the queued writes, then stop the writer thread and close the connections"""
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        self._db.close()
+
+    def get_stats(self) -> Dict:
+        """Hit/miss/eviction counters for this process plus the shared file's size"""
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        try:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            total_bytes = self._total_bytes(self._db)
+        except sqlite3.Error:
+            entries = total_bytes = None
+        return {
+            **self.metrics,
+            'queued_writes': self._queue.qsize(),
+            'hit_rate': round(self.metrics['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'bytes': total_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'path': self.path
+        }
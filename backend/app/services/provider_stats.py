@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Provider Statistics
+Rolling latency percentiles and call counters for each LLM provider
+"""
+
+from collections import deque
+from typing import Dict, Optional
+
+class ProviderStats:
+    """Rolling latency window and call counters for a single provider"""
+
+    def __init__(self, window: int = 500):
+        self.latencies = deque(maxlen=window)
+        self.counters = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'cancelled': 0,
+            'timeouts': 0,
+            'deadline_skips': 0,
+            'quota_skips': 0,
+            'hedge_calls': 0,
+            'hedge_wins': 0
+        }
+
+    def record(self, latency: float, success: bool) -> None:
+        """Record a completed call"""
+        self.latencies.append(latency)
+        self.counters['calls'] += 1
+        self.counters['successes' if success else 'failures'] += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile (seconds) over the rolling window"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict:
+        """Counters plus p50/p95/p99 latency in milliseconds"""
+        data = dict(self.counters)
+        data['samples'] = len(self.latencies)
+        for pct in (50, 95, 99):
+            value = self.percentile(pct)
+            data[f'p{pct}_ms'] = round(value * 1000, 1) if value is not None else None
+        return data
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Quota Scheduler
+Per-provider token buckets (requests and tokens per minute) with a bounded priority queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional
+
+# Request priorities: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch', BACKGROUND: 'background'}
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``per_minute`` tokens per minute"""
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, amount: float) -> bool:
+        self._refill()
+        return self.tokens >= amount
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def give(self, amount: float) -> None:
+        """Return tokens taken for a call that was never sent"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available"""
+        self._refill()
+        return max(0.0, (amount - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+class ProviderQuota:
+    """Requests-per-minute and tokens-per-minute buckets for one provider (0 disables a limit)"""
+
+    def __init__(self, rpm: int, tpm: int, burst_seconds: float = 10.0):
+        self.requests = TokenBucket(rpm, max(1.0, rpm * burst_seconds / 60.0)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, max(1.0, tpm * burst_seconds / 60.0)) if tpm > 0 else None
+
+    def _buckets(self, tokens: int) -> List[tuple]:
+        buckets = []
+        if self.requests is not None:
+            buckets.append((self.requests, 1))
+        if self.tokens is not None:
+            # A call larger than the burst can still go through once the bucket is full
+            buckets.append((self.tokens, min(tokens, self.tokens.capacity)))
+        return buckets
+
+    def try_acquire(self, tokens: int) -> bool:
+        """Take one request and ``tokens`` tokens if both buckets allow it"""
+        buckets = self._buckets(tokens)
+        if not all(bucket.available(amount) for bucket, amount in buckets):
+            return False
+        for bucket, amount in buckets:
+            bucket.take(amount)
+        return True
+
+    def refund(self, tokens: int) -> None:
+        """Undo a ``try_acquire`` whose call was never sent"""
+        for bucket, amount in self._buckets(tokens):
+            bucket.give(amount)
+
+    def wait_time(self, tokens: int) -> float:
+        return max((bucket.time_until(amount) for bucket, amount in self._buckets(tokens)), default=0.0)
+
+class OutboundScheduler:
+    """Admits outbound provider calls within quota, highest priority first.
+
+    A call that fits the quota right now (and has no equal-or-higher priority
+    call queued ahead of it) goes straight through. Otherwise it may wait in a
+    bounded priority queue for up to ``max_wait`` seconds; with ``max_wait`` 0
+    (interactive traffic) or a full queue it is rejected at once so the caller
+    can route to the next provider. The bound counts live waiters only: entries
+    of calls that timed out or were cancelled linger in the heap until the drain
+    (or a compaction once they outnumber the live ones) drops them.
+    """
+
+    def __init__(self, quotas: Dict[str, ProviderQuota], max_queue: int = 100):
+        self.quotas = quotas
+        self.max_queue = max_queue
+        self._queues: Dict[str, list] = {name: [] for name in quotas}
+        self._timers: Dict[str, Optional[asyncio.TimerHandle]] = {name: None for name in quotas}
+        self._waiting: Dict[str, int] = {name: 0 for name in quotas}
+        self._sequence = itertools.count()
+        self.metrics = {
+            name: {'granted': 0, 'queued': 0, 'rejected': 0, 'refunded': 0}
+            for name in quotas
+        }
+
+    async def acquire(self, name: str, tokens: int, priority: int = INTERACTIVE, max_wait: float = 0.0) -> bool:
+        """True if the call may be sent now; False means route it elsewhere"""
+        quota = self.quotas.get(name)
+        if quota is None:
+            return True
+
+        queue = self._queues[name]
+        metrics = self.metrics[name]
+        ahead = any(not entry[3].done() and entry[0] <= priority for entry in queue)
+        if not ahead and quota.try_acquire(tokens):
+            metrics['granted'] += 1
+            return True
+
+        if max_wait <= 0 or self._waiting[name] >= self.max_queue:
+            metrics['rejected'] += 1
+            return False
+
+        if len(queue) > 2 * self._waiting[name] + 16:
+            queue[:] = [entry for entry in queue if not entry[3].done()]
+            heapq.heapify(queue)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue, (priority, next(self._sequence), tokens, future))
+        self._waiting[name] += 1
+        metrics['queued'] += 1
+        self._schedule_drain(name)
+        try:
+            await asyncio.wait((future,), timeout=max_wait)
+        except asyncio.CancelledError:
+            # Cancelled just after the drain admitted us: the call will not be sent
+            if future.done() and not future.cancelled():
+                quota.refund(tokens)
+                metrics['refunded'] += 1
+                self._schedule_drain(name)
+            raise
+        finally:
+            self._waiting[name] -= 1
+            # Give up our place in the queue if we were not admitted
+            if not future.done():
+                future.cancel()
+        if future.cancelled():
+            metrics['rejected'] += 1
+            return False
+        metrics['granted'] += 1
+        return True
+
+    def _schedule_drain(self, name: str) -> None:
+        if self._timers[name] is not None:
+            return
+        queue = self._queues[name]
+        delay = self.quotas[name].wait_time(queue[0][2]) if queue else 0.0
+        self._timers[name] = asyncio.get_running_loop().call_later(delay, self._drain, name)
+
+    def _drain(self, name: str) -> None:
+        """Release queued calls in priority order while the quota allows"""
+        self._timers[name] = None
+        queue = self._queues[name]
+        quota = self.quotas[name]
+        while queue:
+            _, _, tokens, future = queue[0]
+            if future.done():
+                heapq.heappop(queue)
+                continue
+            if not quota.try_acquire(tokens):
+                self._schedule_drain(name)
+                return
+            heapq.heappop(queue)
+            future.set_result(True)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Granted/queued/rejected/refunded counts and current queue depth per provider"""
+        stats = {}
+        for name, quota in self.quotas.items():
+            data = dict(self.metrics[name])
+            data['queue_depth'] = self._waiting[name]
+            if quota.requests is not None:
+                quota.requests._refill()
+                data['requests_available'] = round(quota.requests.tokens, 2)
+            if quota.tokens is not None:
+                quota.tokens._refill()
+                data['tokens_available'] = int(quota.tokens.tokens)
+            stats[name] = data
+        return stats
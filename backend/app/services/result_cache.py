@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Result Cache
+In-process LRU + TTL cache for emotion analysis results, keyed on a canonical body-map encoding
+"""
+
+import copy
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+def canonical_markings(body_markings: Dict[str, str]) -> str:
+    """Order-independent encoding of the marked regions (unmarked regions are dropped).
+
+    JSON-encoded, so client strings containing separators cannot make two different
+    maps share a key.
+    """
+    items = sorted((region, sensation) for region, sensation in body_markings.items() if sensation)
+    return json.dumps(items, separators=(',', ':'))
+
+def canonical_key(body_markings: Dict[str, str], view: str, namespace: str) -> str:
+    """Cache key: provider/prompt namespace, view and canonical markings"""
+    return f"{namespace}|{view}|{canonical_markings(body_markings)}"
+
+class ResultCache:
+    """LRU cache bounded by entry count and approximate bytes, with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached result, or None on miss/expiry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.metrics['misses'] += 1
+            return None
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.metrics['expirations'] += 1
+            self.metrics['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.metrics['hits'] += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        """Insert or refresh a result, evicting least-recently-used entries past the bounds"""
+        size = len(key) + len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, size, copy.deepcopy(value))
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.metrics['evictions'] += 1
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Drop every entry, or only those under a provider/prompt namespace; returns the count"""
+        if namespace is None:
+            keys = list(self._entries)
+        else:
+            prefix = f"{namespace}|"
+            keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        self.metrics['invalidations'] += len(keys)
+        return len(keys)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_stats(self) -> Dict:
+        """Hit/miss/eviction counters plus current size"""
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        return {
+            **self.metrics,
+            'hit_rate': round(self.metrics['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl
+        }
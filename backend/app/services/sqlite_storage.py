@@ -0,0 +1,714 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage
+Persistent storage backend in an embedded SQLite database (WAL mode), so sessions,
+mappings and emotion results survive restarts.
+
+Writes are write-behind by default: each mutation is applied to an in-process overlay
+and queued, and a writer thread commits the queue in grouped transactions (executemany
+over the connection's cached prepared statements), so no request waits for the disk.
+Reads consult the overlay first and the database second, so callers always see their
+own writes even before they are committed.
+
+Write-through mode (STORAGE_BACKEND=shared) instead commits every mutation before
+returning and keeps no overlay, so several worker processes can share one database
+file: whatever one worker has acknowledged, every other worker reads. Mapping ids come
+from a counter row in the database, claimed a block at a time per process, so ids
+never collide between workers or across restarts.
+"""
+
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Collection, Dict, List, Optional, Tuple
+
+from .compact_mapping import VIEW_SHIFT, CompactMapping, epoch_us, isoformat, sensation_code, sensation_codes, view_code
+from .pagination import Position, first_page, mapping_matches
+from .storage_backend import StorageBackend, StorageBusy
+
+# The view bits of a packed mapping; queries must spell it exactly as the index does
+_VIEW = f"((packed >> {VIEW_SHIFT}) & 3)"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS body_mappings (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    packed INTEGER NOT NULL,
+    extra TEXT,
+    created INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS body_mappings_session ON body_mappings (session_id, id);
+CREATE INDEX IF NOT EXISTS body_mappings_created ON body_mappings (created, id);
+CREATE INDEX IF NOT EXISTS body_mappings_view ON body_mappings ({_VIEW}, created, id);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created, id);
+-- Which known sensations each mapping has, in (created, id) order per sensation
+CREATE TABLE IF NOT EXISTS mapping_sensations (
+    sensation INTEGER NOT NULL,
+    created INTEGER NOT NULL,
+    mapping_id INTEGER NOT NULL,
+    PRIMARY KEY (sensation, created, mapping_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mapping_sensations_mapping ON mapping_sensations (mapping_id);
+CREATE TABLE IF NOT EXISTS emotion_results (
+    mapping_id INTEGER PRIMARY KEY,
+    result TEXT NOT NULL,
+    created INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO counters (name, next) SELECT 'body_mappings', COALESCE(MAX(id), 0) + 1 FROM body_mappings;
+"""
+
+_INSERT_SESSION = "INSERT INTO sessions (id, created) VALUES (?, ?) ON CONFLICT (id) DO NOTHING"
+_INSERT_MAPPING = "INSERT INTO body_mappings (id, session_id, packed, extra, created) VALUES (?, ?, ?, ?, ?)"
+_INSERT_SENSATION = "INSERT OR IGNORE INTO mapping_sensations (sensation, created, mapping_id) VALUES (?, ?, ?)"
+_DELETE_SENSATIONS = "DELETE FROM mapping_sensations WHERE mapping_id = ?"
+_DELETE_SESSION_SENSATIONS = (
+    "DELETE FROM mapping_sensations WHERE mapping_id IN (SELECT id FROM body_mappings WHERE session_id = ?)"
+)
+_UPDATE_MAPPING = "UPDATE body_mappings SET packed = ?, extra = ? WHERE id = ?"
+_DELETE_MAPPING = "DELETE FROM body_mappings WHERE id = ?"
+_UPSERT_RESULT = (
+    "INSERT INTO emotion_results (mapping_id, result, created) VALUES (?, ?, ?) "
+    "ON CONFLICT (mapping_id) DO UPDATE SET result = excluded.result, created = excluded.created"
+)
+_DELETE_RESULT = "DELETE FROM emotion_results WHERE mapping_id = ?"
+_DELETE_SESSION_RESULTS = (
+    "DELETE FROM emotion_results WHERE mapping_id IN (SELECT id FROM body_mappings WHERE session_id = ?)"
+)
+_DELETE_SESSION_MAPPINGS = "DELETE FROM body_mappings WHERE session_id = ?"
+_DELETE_SESSION = "DELETE FROM sessions WHERE id = ?"
+_RESERVE_IDS = "UPDATE counters SET next = next + ? WHERE name = 'body_mappings' RETURNING next"
+
+_MAPPING_COLUMNS = "id, session_id, packed, extra, created"
+# Bumped (PRAGMA user_version) when existing databases need a data migration
+_SCHEMA_VERSION = 1
+
+# Overlay entries: (sequence number of the last queued write, state), where a state of
+# None means deleted
+_Pending = Tuple[int, Optional[object]]
+
+def _record(row) -> CompactMapping:
+    mapping_id, session_id, packed, extra, created = row
+    return CompactMapping.from_packed(mapping_id, session_id, packed, json.loads(extra) if extra else None, created)
+
+def _sensation_rows(record: CompactMapping) -> List[Tuple[str, tuple]]:
+    return [(_INSERT_SENSATION, (code, record.created, record.id)) for code in sorted(sensation_codes(record.packed, record.extra))]
+
+def _result_view(mapping_id: int, row: Tuple[str, int]) -> Dict:
+    result, created = row
+    return {'mapping_id': str(mapping_id), 'result': json.loads(result), 'created_at': isoformat(created)}
+
+class SQLiteStorage(StorageBackend):
+    """Storage in a SQLite file with write-behind batching.
+
+    Queued writes are committed at most ``batch_size`` at a time, waiting up
+    to ``flush_interval`` seconds for a batch to fill. A batch that fails to
+    commit stays in the overlay and is retried with exponential backoff (up to
+    ``max_retry_delay`` seconds apart) until it commits; meanwhile ``health``
+    reports the error. Once ``max_pending`` writes are queued, further writes
+    raise StorageBusy instead of waiting (backpressure rather than unbounded
+    memory or a blocked caller). With ``write_through`` each write is
+    committed by the caller instead, waiting up to ``busy_timeout`` seconds
+    for another process's transaction before raising StorageBusy. Mapping ids are claimed ``id_block``
+    at a time; a restart skips the rest of its block.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, batch_size: int = 512, flush_interval: float = 0.05,
+                 max_pending: int = 100_000, write_through: bool = False, id_block: int = 1024,
+                 busy_timeout: float = 5.0, max_retry_delay: float = 5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_through = write_through
+        self.id_block = id_block
+        self.busy_timeout = busy_timeout
+        self.max_retry_delay = max_retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Workers starting together may race on creating the schema, so wait longer here
+        writer = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("PRAGMA synchronous=NORMAL")
+        writer.executescript(_SCHEMA)
+        self._migrate(writer)
+        self._writer = writer
+        self._connections = threading.local()
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._ids = iter(())
+        self._reserve_ids()
+        self._sessions: Dict[str, _Pending] = {}
+        self._mappings: Dict[int, _Pending] = {}
+        self._results: Dict[int, _Pending] = {}
+        # Session deleted while pending: its committed mappings with smaller ids are hidden
+        self._cutoffs: Dict[str, _Pending] = {}
+
+        # Updated under _lock: request threads and the writer thread both count
+        self.metrics = Counter()
+        # The error of the batch being retried, None while writes commit
+        self.write_error: Optional[str] = None
+        self._closing = threading.Event()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        if not write_through:
+            self._thread = threading.Thread(target=self._write_loop, name='sqlite-storage-writer', daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _migrate(db: sqlite3.Connection) -> None:
+        """Bring an existing database's data up to _SCHEMA_VERSION (once, whichever worker
+        gets there first)"""
+        if db.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("PRAGMA user_version").fetchone()[0] < 1:
+                rows = db.execute(f"SELECT {_MAPPING_COLUMNS} FROM body_mappings").fetchall()
+                db.executemany(
+                    _INSERT_SENSATION,
+                    [params for row in rows for _, params in _sensation_rows(_record(row))]
+                )
+                if rows:
+                    print(f"💾 Indexed the sensations of {len(rows)} stored body mappings")
+            db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            db.execute("COMMIT")
+        except sqlite3.Error:
+            db.execute("ROLLBACK")
+            raise
+
+    # Reading
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection: reads (WAL readers never wait for a writer) and, in
+        write-through mode, this thread's writes"""
+        db = getattr(self._connections, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            # Per connection: commits append to the WAL without an fsync each
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._connections.db = db
+        return db
+
+    def _hidden(self, session_id: str, mapping_id: int, cutoffs: Dict[str, _Pending]) -> bool:
+        """Whether a committed mapping belongs to a session whose deletion is still queued"""
+        cutoff = cutoffs.get(session_id)
+        return cutoff is not None and mapping_id < cutoff[1]
+
+    def _snapshot(self) -> Tuple[Dict, Dict, Dict, Dict]:
+        """Copies of the overlay, taken before reading the database so nothing committed
+        in between is missed (committed writes are only then dropped from the overlay)"""
+        with self._lock:
+            return dict(self._sessions), dict(self._mappings), dict(self._results), dict(self._cutoffs)
+
+    def _mapping(self, key: int) -> Optional[CompactMapping]:
+        with self._lock:
+            pending = self._mappings.get(key)
+            cutoffs = dict(self._cutoffs) if self._cutoffs else {}
+        if pending is not None:
+            return pending[1]
+        row = self._connection().execute(
+            f"SELECT {_MAPPING_COLUMNS} FROM body_mappings WHERE id = ?", (key,)
+        ).fetchone()
+        if row is None or self._hidden(row[1], key, cutoffs):
+            return None
+        return _record(row)
+
+    def _session_exists(self, session_id: str) -> bool:
+        with self._lock:
+            pending = self._sessions.get(session_id)
+        if pending is not None:
+            return pending[1] is not None
+        return self._connection().execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
+
+    @staticmethod
+    def _mapping_key(mapping_id: str) -> Optional[int]:
+        return int(mapping_id) if mapping_id.isdigit() else None
+
+    def _merged_mappings(self, where: str = "", params: tuple = (),
+                         session_ids: Optional[Collection[str]] = None) -> List[CompactMapping]:
+        """Committed mappings matching ``where`` (which must select by ``session_ids``, if
+        given) with queued writes applied, oldest first"""
+        _, mappings, _, cutoffs = self._snapshot()
+        rows = self._connection().execute(f"SELECT {_MAPPING_COLUMNS} FROM body_mappings {where}", params)
+        merged = {
+            row[0]: _record(row) for row in rows
+            if row[0] not in mappings and not self._hidden(row[1], row[0], cutoffs)
+        }
+        for key, (_, record) in mappings.items():
+            if record is not None and (session_ids is None or record.session_id in session_ids):
+                merged[key] = record
+        return sorted(merged.values(), key=lambda record: (record.created, record.id))
+
+    # Writing
+
+    def _reserve_ids(self) -> None:
+        """Claim the next ``id_block`` mapping ids from the shared counter (lock held or
+        during construction)"""
+        try:
+            (end,) = self._connection().execute(_RESERVE_IDS, (self.id_block,)).fetchall()[0]
+        except sqlite3.OperationalError as e:
+            # "database is locked": other workers held the write lock past busy_timeout
+            raise StorageBusy(f"Could not reserve mapping ids: {e}") from e
+        self._ids = iter(range(end - self.id_block, end))
+        self._next_id = end - self.id_block
+
+    def _next_mapping_id(self) -> int:
+        with self._lock:
+            key = next(self._ids, None)
+            if key is None:
+                self._reserve_ids()
+                key = next(self._ids)
+            self._next_id = key + 1
+        return key
+
+    def _enqueue(self, statements: List[Tuple[str, tuple]], overlay: List[Tuple[Dict, object, object]],
+                 deleted_session: Optional[str] = None) -> None:
+        """Queue statements under one sequence number and apply their overlay changes;
+        StorageBusy (and no changes) if ``max_pending`` writes are already queued.
+
+        ``deleted_session`` also hides the session's committed mappings (ids below
+        the next one to be issued) and drops its queued ones. In write-through mode
+        the statements are committed here instead and the overlay is left alone.
+        """
+        if self.write_through:
+            try:
+                self._write([statements])
+            except sqlite3.OperationalError as e:
+                raise StorageBusy(f"Write not committed: {e}") from e
+            return
+        with self._lock:
+            seq = next(self._seq)
+            # Never waits; the writer cannot drop this sequence number from the overlay
+            # before the lock is released
+            try:
+                self._queue.put_nowait((seq, statements))
+            except queue.Full:
+                self.metrics['rejected'] += 1
+                raise StorageBusy(f"{self._queue.maxsize} writes are waiting for the database") from None
+            for pending, key, state in overlay:
+                pending[key] = (seq, state)
+            if deleted_session is not None:
+                self._cutoffs[deleted_session] = (seq, self._next_id)
+                for key, (_, record) in list(self._mappings.items()):
+                    if record is not None and record.session_id == deleted_session:
+                        self._mappings[key] = (seq, None)
+                        self._results[key] = (seq, None)
+            self.metrics['queued'] += 1
+
+    def _count(self, **amounts) -> None:
+        """Add to ``metrics`` under the lock"""
+        with self._lock:
+            self.metrics.update(amounts)
+
+    def _new_session_state(self, session_id: str) -> Dict:
+        return {'id': session_id, 'created': epoch_us()}
+
+    def create_session(self, session_id: Optional[str] = None) -> str:
+        """Create a new session"""
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        state = self._new_session_state(session_id)
+        # Replacing a session drops its previous mappings, as MemoryStorage does
+        self._enqueue(
+            [(_DELETE_SESSION_RESULTS, (session_id,)), (_DELETE_SESSION_SENSATIONS, (session_id,)),
+             (_DELETE_SESSION_MAPPINGS, (session_id,)), (_DELETE_SESSION, (session_id,)),
+             (_INSERT_SESSION, (session_id, state['created']))],
+            [(self._sessions, session_id, state)],
+            deleted_session=session_id
+        )
+        return session_id
+
+    def ensure_session(self, session_id: str) -> None:
+        """Create the session unless it already exists"""
+        if not self._session_exists(session_id):
+            state = self._new_session_state(session_id)
+            self._enqueue([(_INSERT_SESSION, (session_id, state['created']))], [(self._sessions, session_id, state)])
+
+    def has_session(self, session_id: str) -> bool:
+        return self._session_exists(session_id)
+
+    def save_body_mapping(self, session_id: str, body_markings: Dict[str, str], view: str) -> str:
+        """Queue a body mapping (and its session, if new); returns the mapping id at once"""
+        statements = []
+        overlay = []
+        if not self._session_exists(session_id):
+            state = self._new_session_state(session_id)
+            statements.append((_INSERT_SESSION, (session_id, state['created'])))
+            overlay.append((self._sessions, session_id, state))
+        key = self._next_mapping_id()
+        record = CompactMapping(key, session_id, body_markings, view)
+        extra = json.dumps(record.extra) if record.extra is not None else None
+        statements.append((_INSERT_MAPPING, (key, session_id, record.packed, extra, record.created)))
+        statements.extend(_sensation_rows(record))
+        overlay.append((self._mappings, key, record))
+        self._enqueue(statements, overlay)
+        self._count(mappings_saved=1)
+        return str(key)
+
+    def get_body_mapping(self, mapping_id: str) -> Optional[Dict]:
+        """Get body mapping by ID"""
+        key = self._mapping_key(mapping_id)
+        record = self._mapping(key) if key is not None else None
+        return record.to_dict() if record is not None else None
+
+    def update_body_mapping(self, mapping_id: str, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Replace a mapping's markings and view; returns the updated mapping"""
+        key = self._mapping_key(mapping_id)
+        record = self._mapping(key) if key is not None else None
+        if record is None:
+            return None
+        updated = CompactMapping(key, record.session_id, body_markings, view, record.created)
+        extra = json.dumps(updated.extra) if updated.extra is not None else None
+        self._enqueue(
+            [(_UPDATE_MAPPING, (updated.packed, extra, key)), (_DELETE_SENSATIONS, (key,)), *_sensation_rows(updated)],
+            [(self._mappings, key, updated)]
+        )
+        return updated.to_dict()
+
+    def delete_body_mapping(self, mapping_id: str) -> bool:
+        """Delete a mapping together with its emotion result"""
+        key = self._mapping_key(mapping_id)
+        if key is None or self._mapping(key) is None:
+            return False
+        self._enqueue(
+            [(_DELETE_RESULT, (key,)), (_DELETE_SENSATIONS, (key,)), (_DELETE_MAPPING, (key,))],
+            [(self._mappings, key, None), (self._results, key, None)]
+        )
+        return True
+
+    def get_session_mappings(self, session_id: str) -> List[Dict]:
+        """Get all body mappings for a session"""
+        if not self._session_exists(session_id):
+            return []
+        records = self._merged_mappings("WHERE session_id = ?", (session_id,), (session_id,))
+        return [record.to_dict() for record in records]
+
+    def list_body_mappings(self) -> List[Dict]:
+        """All body mappings, oldest first"""
+        return [record.to_dict() for record in self._merged_mappings()]
+
+    def page_body_mappings(self, limit: int, after: Optional[Position] = None, view: Optional[str] = None,
+                           session_id: Optional[str] = None, sensation: Optional[str] = None,
+                           created_from: Optional[int] = None,
+                           created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """One page of committed mappings, read in index order (the sensation table for a
+        known sensation, otherwise the session, view or created index) only as far as
+        the page needs, merged with queued writes"""
+        _, pending, _, cutoffs = self._snapshot()
+        code = sensation_code(sensation) if sensation is not None else None
+        if code is not None:
+            source = "mapping_sensations s JOIN body_mappings m ON m.id = s.mapping_id"
+            created, key = "s.created", "s.mapping_id"
+            clauses, params = ["s.sensation = ?"], [code]
+        else:
+            source = "body_mappings m"
+            created, key = "m.created", "m.id"
+            clauses, params = [], []
+        if after is not None:
+            clauses.append(f"({created}, {key}) > (?, ?)")
+            params.extend(after)
+        if created_from is not None:
+            clauses.append(f"{created} >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            clauses.append(f"{created} < ?")
+            params.append(created_to)
+        if session_id is not None:
+            clauses.append("m.session_id = ?")
+            params.append(session_id)
+        if view is not None:
+            clauses.append(f"{_VIEW.replace('packed', 'm.packed')} = ?")
+            params.append(view_code(view))
+        if sensation is not None and code is None:
+            clauses.append("m.extra IS NOT NULL")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = ', '.join(f"m.{column}" for column in _MAPPING_COLUMNS.split(', '))
+
+        committed = []
+        rows = self._connection().execute(f"SELECT {columns} FROM {source} {where} ORDER BY {created}, {key}", params)
+        try:
+            for row in rows:
+                if row[0] in pending or self._hidden(row[1], row[0], cutoffs):
+                    continue
+                record = _record(row)
+                if mapping_matches(record, view, session_id, sensation):
+                    committed.append(record)
+                    if len(committed) > limit:
+                        break
+        finally:
+            rows.close()
+        queued = sorted(
+            (record for _, record in pending.values()
+             if record is not None and (after is None or (record.created, record.id) > after)
+             and mapping_matches(record, view, session_id, sensation, created_from, created_to)),
+            key=lambda record: (record.created, record.id)
+        )
+        records, position = first_page([committed, queued], limit, lambda record: (record.created, record.id))
+        return [record.to_dict() for record in records], position
+
+    def save_emotion_result(self, mapping_id: str, emotion_result: Dict) -> bool:
+        """Queue a mapping's emotion result; False if the mapping does not exist"""
+        key = self._mapping_key(mapping_id)
+        if key is None or self._mapping(key) is None:
+            return False
+        created = epoch_us()
+        self._enqueue(
+            [(_UPSERT_RESULT, (key, json.dumps(emotion_result, default=str), created))],
+            [(self._results, key, {'result': emotion_result, 'created': created})]
+        )
+        self._count(emotion_results_saved=1)
+        return True
+
+    def get_emotion_result(self, mapping_id: str) -> Optional[Dict]:
+        """Get emotion analysis result by mapping ID"""
+        key = self._mapping_key(mapping_id)
+        if key is None or self._mapping(key) is None:
+            return None
+        with self._lock:
+            pending = self._results.get(key)
+        if pending is not None:
+            state = pending[1]
+            if state is None:
+                return None
+            return {'mapping_id': str(key), 'result': state['result'], 'created_at': isoformat(state['created'])}
+        row = self._connection().execute(
+            "SELECT result, created FROM emotion_results WHERE mapping_id = ?", (key,)
+        ).fetchone()
+        return _result_view(key, row) if row is not None else None
+
+    def list_sessions(self) -> List[Dict]:
+        """List all sessions"""
+        pending_sessions, _, _, _ = self._snapshot()
+        sessions = {
+            session_id: created
+            for session_id, created in self._connection().execute("SELECT id, created FROM sessions")
+            if session_id not in pending_sessions
+        }
+        for session_id, (_, state) in pending_sessions.items():
+            if state is not None:
+                sessions[session_id] = state['created']
+        mapping_ids: Dict[str, List[str]] = {session_id: [] for session_id in sessions}
+        for record in self._merged_mappings():
+            if record.session_id in mapping_ids:
+                mapping_ids[record.session_id].append(str(record.id))
+        return [
+            {'id': session_id, 'created_at': isoformat(created), 'body_mappings': mapping_ids[session_id]}
+            for session_id, created in sorted(sessions.items(), key=lambda item: item[1])
+        ]
+
+    def page_sessions(self, limit: int, after: Optional[Position] = None, created_from: Optional[int] = None,
+                      created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """One page of sessions from the created index, merged with queued writes"""
+        pending_sessions, _, _, _ = self._snapshot()
+        clauses, params = [], []
+        if after is not None:
+            clauses.append("(created, id) > (?, ?)")
+            params.extend(after)
+        if created_from is not None:
+            clauses.append("created >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            clauses.append("created < ?")
+            params.append(created_to)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        committed = []
+        rows = self._connection().execute(f"SELECT created, id FROM sessions {where} ORDER BY created, id", params)
+        try:
+            for created, session_id in rows:
+                if session_id not in pending_sessions:
+                    committed.append((created, session_id))
+                    if len(committed) > limit:
+                        break
+        finally:
+            rows.close()
+        queued = sorted(
+            (state['created'], session_id) for session_id, (_, state) in pending_sessions.items()
+            if state is not None and (after is None or (state['created'], session_id) > after)
+            and (created_from is None or state['created'] >= created_from)
+            and (created_to is None or state['created'] < created_to)
+        )
+        entries, position = first_page([committed, queued], limit, lambda entry: entry)
+        if not entries:
+            return [], None
+
+        session_ids = {session_id for _, session_id in entries}
+        mapping_ids: Dict[str, List[str]] = {session_id: [] for session_id in session_ids}
+        records = self._merged_mappings(
+            f"WHERE session_id IN ({', '.join('?' * len(session_ids))})", tuple(session_ids), session_ids
+        )
+        for record in records:
+            mapping_ids[record.session_id].append(str(record.id))
+        return [
+            {'id': session_id, 'created_at': isoformat(created), 'body_mappings': mapping_ids[session_id]}
+            for created, session_id in entries
+        ], position
+
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session and all its mappings"""
+        if not self._session_exists(session_id):
+            return False
+        self._enqueue(
+            [(_DELETE_SESSION_RESULTS, (session_id,)), (_DELETE_SESSION_SENSATIONS, (session_id,)),
+             (_DELETE_SESSION_MAPPINGS, (session_id,)), (_DELETE_SESSION, (session_id,))],
+            [(self._sessions, session_id, None)],
+            deleted_session=session_id
+        )
+        return True
+
+    # Writer thread
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, writes: List[List[Tuple[str, tuple]]], db: Optional[sqlite3.Connection] = None) -> None:
+        """Commit the statements of several writes in one transaction (rolled back and
+        re-raised on error); ``db`` defaults to this thread's connection"""
+        db = db or self._connection()
+        # Consecutive runs of the same statement go through one executemany
+        groups: List[Tuple[str, List[tuple]]] = []
+        for statements in writes:
+            for sql, params in statements:
+                if groups and groups[-1][0] == sql:
+                    groups[-1][1].append(params)
+                else:
+                    groups.append((sql, [params]))
+        started = time.perf_counter()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            for sql, rows in groups:
+                db.executemany(sql, rows)
+            db.execute("COMMIT")
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            self._count(write_errors=len(writes), flush_seconds=time.perf_counter() - started)
+            raise
+        self._count(flushes=1, written=len(writes), flush_seconds=time.perf_counter() - started)
+
+    def _commit(self, batch: List[Tuple[int, List[Tuple[str, tuple]]]]) -> None:
+        """Run a batch of queued writes in one transaction, retrying with backoff until it
+        commits, then drop them from the overlay (which serves them until then)"""
+        delay = 0.05
+        while True:
+            try:
+                self._write([statements for _, statements in batch], self._writer)
+                break
+            except sqlite3.Error as e:
+                if self._closing.is_set():
+                    # Shutting down: the overlay goes with the process, so say what is lost
+                    print(f"❌ SQLite storage gave up on {len(batch)} queued writes at shutdown: {e}")
+                    return
+                if self.write_error is None:
+                    print(f"❌ SQLite storage write of {len(batch)} queued writes failed, retrying: {e}")
+                self.write_error = str(e)
+                self._count(write_retries=1)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        if self.write_error is not None:
+            print("✅ SQLite storage writes are committing again")
+            self.write_error = None
+
+        last = batch[-1][0]
+        with self._lock:
+            for pending in (self._sessions, self._mappings, self._results, self._cutoffs):
+                for key in [key for key, (seq, _) in pending.items() if seq <= last]:
+                    del pending[key]
+
+    # Housekeeping
+
+    def flush(self) -> None:
+        """Block until every queued write is committed"""
+        self._queue.join()
+
+    def get_stats(self) -> Dict:
+        """Get storage statistics (committed rows; queued writes are reported separately)"""
+        db = self._connection()
+        with self._lock:
+            metrics = Counter(self.metrics)
+        flushes = metrics['flushes']
+        return {
+            'backend': self.name,
+            'total_sessions': db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            'total_mappings': db.execute("SELECT COUNT(*) FROM body_mappings").fetchone()[0],
+            'total_emotion_results': db.execute("SELECT COUNT(*) FROM emotion_results").fetchone()[0],
+            'database_bytes': sum(
+                os.path.getsize(path) for path in (self.path, f'{self.path}-wal') if os.path.exists(path)
+            ),
+            'path': self.path,
+            'mode': 'write-through' if self.write_through else 'write-behind',
+            'next_mapping_id': self._next_id,
+            'pending_writes': self._queue.qsize(),
+            'queued_writes': metrics['queued'],
+            'committed_writes': metrics['written'],
+            'write_errors': metrics['write_errors'],
+            'write_retries': metrics['write_retries'],
+            'failing_write_error': self.write_error,
+            'rejected_writes': metrics['rejected'],
+            'flushes': flushes,
+            'avg_writes_per_flush': round(metrics['written'] / flushes, 1) if flushes else 0.0,
+            'avg_flush_ms': round(metrics['flush_seconds'] * 1000 / flushes, 3) if flushes else 0.0
+        }
+
+    def health(self) -> Optional[str]:
+        """The error queued writes are stuck on, if any"""
+        if self.write_error is not None:
+            return f"queued writes are not committing: {self.write_error}"
+        return None
+
+    def clear_all(self) -> None:
+        """Clear all data (useful for testing)"""
+        self.flush()
+        with self._lock:
+            self._writer.executescript(
+                "BEGIN; DELETE FROM emotion_results; DELETE FROM mapping_sensations; DELETE FROM body_mappings; "
+                "DELETE FROM sessions; COMMIT;"
+            )
+            for pending in (self._sessions, self._mappings, self._results, self._cutoffs):
+                pending.clear()
+
+    def close(self) -> None:
+        """Commit everything queued and stop the writer (a batch still failing by then is
+        given up after its next attempt)"""
+        if self._thread is not None:
+            self._closing.set()
+            self._queue.put(None)
+            self._thread.join()
+        self._writer.close()
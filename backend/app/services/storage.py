@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Storage
+Selects the storage backend from settings: "memory" (MemoryStorage, lost on restart
+unless journaled), "sqlite" (SQLiteStorage, persisted in a WAL-mode database file) or
+"shared" (SQLiteStorage in write-through mode, one database for every worker process).
+"""
+
+from ..core.config import settings
+from .storage_backend import StorageBackend
+
+def create_storage() -> StorageBackend:
+    """The backend named by settings.STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND in ('sqlite', 'shared'):
+        from .sqlite_storage import SQLiteStorage
+
+        shared = settings.STORAGE_BACKEND == 'shared'
+        print(f"💾 Using {'shared ' if shared else ''}SQLite storage at {settings.STORAGE_SQLITE_PATH}")
+        return SQLiteStorage(
+            settings.STORAGE_SQLITE_PATH,
+            batch_size=settings.STORAGE_SQLITE_BATCH_SIZE,
+            flush_interval=settings.STORAGE_SQLITE_FLUSH_INTERVAL,
+            max_pending=settings.STORAGE_SQLITE_MAX_PENDING,
+            write_through=shared,
+            id_block=settings.STORAGE_SQLITE_ID_BLOCK,
+            busy_timeout=settings.STORAGE_SQLITE_BUSY_TIMEOUT
+        )
+    if settings.STORAGE_BACKEND != 'memory':
+        raise ValueError(
+            f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND!r} (expected 'memory', 'sqlite' or 'shared')"
+        )
+
+    from .memory_storage import MemoryStorage
+    from .storage_journal import Journal
+
+    journal = None
+    if settings.STORAGE_JOURNAL_ENABLED:
+        print(f"💾 Journaling in-memory storage to {settings.STORAGE_JOURNAL_DIR} (fsync {settings.STORAGE_JOURNAL_FSYNC})")
+        journal = Journal(
+            settings.STORAGE_JOURNAL_DIR,
+            fsync=settings.STORAGE_JOURNAL_FSYNC,
+            fsync_interval=settings.STORAGE_JOURNAL_FSYNC_INTERVAL
+        )
+    return MemoryStorage(
+        shards=settings.STORAGE_SHARDS,
+        max_sessions=settings.STORAGE_MAX_SESSIONS,
+        max_bytes=settings.STORAGE_MAX_BYTES,
+        session_ttl=settings.STORAGE_SESSION_TTL,
+        eviction_batch=settings.STORAGE_EVICTION_BATCH,
+        journal=journal,
+        compact_bytes=settings.STORAGE_JOURNAL_COMPACT_BYTES
+    )
+
+# Global instance
+storage = create_storage()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Storage Backend
+The interface every storage backend implements: sessions, their body mappings and the
+emotion results of those mappings. Mapping ids are strings of digits.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .pagination import Position
+
+class StorageBusy(Exception):
+    """The backend cannot take a write right now (e.g. its write queue is full); the
+    caller may retry later"""
+    pass
+
+class StorageBackend(ABC):
+    """Sessions, body mappings and emotion results.
+
+    Methods are synchronous and may block on locks, the disk or another process's
+    transaction, so call them from worker threads (plain ``def`` routes, or
+    ``run_in_threadpool``), not from the event loop. A write the backend cannot
+    take right now raises StorageBusy, which the API answers with a 503.
+    """
+
+    name = 'storage'
+
+    @abstractmethod
+    def create_session(self, session_id: Optional[str] = None) -> str:
+        """Create a new (or replace an existing) session; returns its id"""
+        pass
+
+    @abstractmethod
+    def ensure_session(self, session_id: str) -> None:
+        """Create the session unless it already exists"""
+        pass
+
+    @abstractmethod
+    def has_session(self, session_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def save_body_mapping(self, session_id: str, body_markings: Dict[str, str], view: str) -> str:
+        """Store a mapping (creating its session if needed); returns the mapping id"""
+        pass
+
+    @abstractmethod
+    def get_body_mapping(self, mapping_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def update_body_mapping(self, mapping_id: str, body_markings: Dict[str, str], view: str) -> Optional[Dict]:
+        """Replace a mapping's markings and view; returns the updated mapping"""
+        pass
+
+    @abstractmethod
+    def delete_body_mapping(self, mapping_id: str) -> bool:
+        """Delete a mapping together with its emotion result"""
+        pass
+
+    @abstractmethod
+    def get_session_mappings(self, session_id: str) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def list_body_mappings(self) -> List[Dict]:
+        """All body mappings, oldest first"""
+        pass
+
+    @abstractmethod
+    def page_body_mappings(self, limit: int, after: Optional[Position] = None, view: Optional[str] = None,
+                           session_id: Optional[str] = None, sensation: Optional[str] = None,
+                           created_from: Optional[int] = None,
+                           created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """Up to ``limit`` mappings in (created, id) order after position ``after``,
+        matching every given filter (created times in epoch microseconds, ``created_to``
+        exclusive), and the position of the next page (None on the last one)"""
+        pass
+
+    def iter_body_mappings(self, page_size: int = 1000) -> Iterator[Dict]:
+        """Every body mapping, oldest first, fetched ``page_size`` at a time so the whole
+        list is never held at once"""
+        after = None
+        while True:
+            mappings, after = self.page_body_mappings(page_size, after)
+            yield from mappings
+            if after is None:
+                return
+
+    @abstractmethod
+    def save_emotion_result(self, mapping_id: str, emotion_result: Dict) -> bool:
+        """Store a mapping's emotion result; False if the mapping does not exist"""
+        pass
+
+    @abstractmethod
+    def get_emotion_result(self, mapping_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def list_sessions(self) -> List[Dict]:
+        """All sessions, oldest first, each with its mapping ids"""
+        pass
+
+    @abstractmethod
+    def page_sessions(self, limit: int, after: Optional[Position] = None, created_from: Optional[int] = None,
+                      created_to: Optional[int] = None) -> Tuple[List[Dict], Optional[Position]]:
+        """Up to ``limit`` sessions in (created, id) order after position ``after``, and
+        the position of the next page (None on the last one)"""
+        pass
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session with all its mappings and emotion results"""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        pass
+
+    @abstractmethod
+    def clear_all(self) -> None:
+        """Delete everything (useful for testing)"""
+        pass
+
+    def sweep(self) -> None:
+        """Periodic housekeeping (expiry, eviction); nothing by default"""
+        pass
+
+    def health(self) -> Optional[str]:
+        """Why the backend is currently failing to persist writes, or None if it is not"""
+        return None
+
+    def flush(self) -> None:
+        """Wait until every accepted write is durable; nothing to wait for by default"""
+        pass
+
+    def close(self) -> None:
+        """Flush and release resources at shutdown"""
+        self.flush()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Storage Journal
+Append-only binary log of MemoryStorage mutations plus periodic snapshots, so in-memory
+storage survives restarts.
+
+Every record is ``op (1 byte) | payload length (4) | crc32 of payload (4) | payload``.
+The log is split into numbered segments (journal-000001.log, ...). A snapshot is a file
+of the same records holding just the live state (sessions, mappings, results), written
+after switching to a new segment; it names the first segment it does not cover, so
+recovery loads the snapshot (memory-mapped) and replays only the segments after it,
+and compaction deletes the segments the snapshot replaces. A torn record at the end of
+a segment (crash mid-write) fails its length or checksum and ends replay there.
+
+The journal belongs to one process: a second one (e.g. another uvicorn worker) opening
+the same directory is refused rather than interleaving its own log and id sequence.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process is assumed
+    fcntl = None
+
+OP_CREATE_SESSION = 1
+OP_DELETE_SESSION = 2
+OP_SAVE_MAPPING = 3
+OP_UPDATE_MAPPING = 4
+OP_DELETE_MAPPING = 5
+OP_SAVE_RESULT = 6
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+_JOURNAL_MAGIC = b'BFMJ'
+_SNAPSHOT_MAGIC = b'BFMS'
+_VERSION = 1
+_HEADER = struct.Struct('<BII')
+_SNAPSHOT_HEADER = struct.Struct('<HIQ')
+_Q = struct.Struct('<q')
+_QQ = struct.Struct('<qq')
+_QQQ = struct.Struct('<qqq')
+_LEN = struct.Struct('<I')
+
+def _text(value: str) -> bytes:
+    data = value.encode()
+    return _LEN.pack(len(data)) + data
+
+def _read_text(payload: memoryview, offset: int) -> Tuple[str, int]:
+    (length,) = _LEN.unpack_from(payload, offset)
+    offset += _LEN.size
+    return str(payload[offset:offset + length], 'utf-8'), offset + length
+
+def _json(value: Optional[Dict]) -> str:
+    return json.dumps(value, default=str, separators=(',', ':')) if value is not None else ''
+
+# Encoding: one function per op, from the fields MemoryStorage passes to ``append``
+
+def encode(op: int, fields: tuple) -> bytes:
+    if op == OP_CREATE_SESSION:
+        session_id, created = fields
+        payload = _Q.pack(created) + _text(session_id)
+    elif op == OP_DELETE_SESSION:
+        (session_id,) = fields
+        payload = _text(session_id)
+    elif op == OP_SAVE_MAPPING:
+        key, session_id, packed, extra, created = fields
+        payload = _QQQ.pack(key, packed, created) + _text(session_id) + _text(_json(extra))
+    elif op == OP_UPDATE_MAPPING:
+        key, packed, extra = fields
+        payload = _QQ.pack(key, packed) + _text(_json(extra))
+    elif op == OP_DELETE_MAPPING:
+        (key,) = fields
+        payload = _Q.pack(key)
+    elif op == OP_SAVE_RESULT:
+        key, result = fields
+        payload = _Q.pack(key) + _text(_json(result))
+    else:
+        raise ValueError(f"Unknown journal op {op}")
+    return _HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+
+def decode(op: int, payload: memoryview) -> tuple:
+    if op == OP_CREATE_SESSION:
+        (created,) = _Q.unpack_from(payload, 0)
+        session_id, _ = _read_text(payload, _Q.size)
+        return session_id, created
+    if op == OP_DELETE_SESSION:
+        return (_read_text(payload, 0)[0],)
+    if op == OP_SAVE_MAPPING:
+        key, packed, created = _QQQ.unpack_from(payload, 0)
+        session_id, offset = _read_text(payload, _QQQ.size)
+        extra, _ = _read_text(payload, offset)
+        return key, session_id, packed, json.loads(extra) if extra else None, created
+    if op == OP_UPDATE_MAPPING:
+        key, packed = _QQ.unpack_from(payload, 0)
+        extra, _ = _read_text(payload, _QQ.size)
+        return key, packed, json.loads(extra) if extra else None
+    if op == OP_DELETE_MAPPING:
+        return _Q.unpack_from(payload, 0)
+    if op == OP_SAVE_RESULT:
+        (key,) = _Q.unpack_from(payload, 0)
+        return key, json.loads(_read_text(payload, _Q.size)[0])
+    raise ValueError(f"Unknown journal op {op}")
+
+def read_records(path: str, offset: int) -> Iterator[Tuple[int, tuple]]:
+    """(op, fields) for each intact record from ``offset`` on, via a read-only mmap"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                end = len(data)
+                while offset + _HEADER.size <= end:
+                    op, length, crc = _HEADER.unpack_from(view, offset)
+                    start = offset + _HEADER.size
+                    with view[start:start + length] as payload:
+                        intact = start + length <= end and zlib.crc32(payload) == crc
+                        fields = decode(op, payload) if intact else None
+                    if not intact:
+                        print(f"⚠️  Journal {os.path.basename(path)}: torn record at byte {offset}, ignoring the rest")
+                        break
+                    yield op, fields
+                    offset = start + length
+            finally:
+                view.release()
+
+class Journal:
+    """The live log segment, its fsync policy, snapshots and compaction.
+
+    fsync ``always`` makes an append durable once ``wait_durable`` returns for its
+    sequence number: a background thread fsyncs whatever has been appended since
+    its last fsync (group commit), outside the journal lock, and wakes the waiters
+    it covered. The wait blocks the calling thread for a disk flush, so callers
+    should be worker threads, never the event loop. ``interval`` fsyncs every
+    ``fsync_interval`` seconds from the same thread (a crash loses at most that
+    much); ``never`` only flushes to the OS at that interval.
+    """
+
+    def __init__(self, directory: str, fsync: str = 'interval', fsync_interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r} (expected one of {FSYNC_POLICIES})")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._owner = self._claim_directory()
+        self._lock = threading.Lock()
+        self._file = None
+        self.segment = 0
+        self.segment_bytes = 0
+        self.metrics = {'appended': 0, 'fsyncs': 0, 'snapshots': 0, 'last_snapshot_seconds': None,
+                        'recovered_records': 0, 'recovery_seconds': None, 'durable_waits': 0}
+        # Sequence numbers of the last appended and the last fsynced record
+        self._appended = 0
+        self._synced = 0
+        self._sync_error: Optional[OSError] = None
+        self._sync_changed = threading.Condition()
+        self._stop = threading.Event()
+        self._syncer = None
+
+    # Files
+
+    def _claim_directory(self):
+        """Hold an exclusive lock on the directory's lock file for the journal's lifetime"""
+        owner = open(os.path.join(self.directory, 'lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(owner.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                owner.close()
+                raise RuntimeError(
+                    f"Journal directory {self.directory} is in use by another process; "
+                    f"with several workers use STORAGE_BACKEND=shared"
+                ) from None
+        return owner
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, 'snapshot.bin')
+
+    def segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f'journal-{number:06d}.log')
+
+    def segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('journal-') and name.endswith('.log'):
+                numbers.append(int(name[len('journal-'):-len('.log')]))
+        return sorted(numbers)
+
+    # Recovery
+
+    def read_snapshot_header(self) -> Optional[Tuple[int, int, List[int]]]:
+        """(shards, first segment not covered, per-shard next mapping keys), or None"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, 'rb') as f:
+            if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not a storage snapshot")
+            version, shards, first_segment = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+            if version != _VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            next_keys = list(struct.unpack(f'<{shards}q', f.read(8 * shards)))
+        return shards, first_segment, next_keys
+
+    def replay(self) -> Iterator[Tuple[int, tuple]]:
+        """Every record of the snapshot and then of the segments after it, in order"""
+        header = self.read_snapshot_header()
+        first_segment = 1
+        if header is not None:
+            shards, first_segment, _ = header
+            offset = len(_SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER.size + 8 * shards
+            yield from read_records(self.snapshot_path, offset)
+        for number in self.segments():
+            if number >= first_segment:
+                yield from read_records(self.segment_path(number), len(_JOURNAL_MAGIC))
+
+    # Appending
+
+    def open(self) -> None:
+        """Start a fresh segment after every existing one and the fsync thread"""
+        with self._lock:
+            self._rotate(max(self.segments(), default=0) + 1)
+        self._syncer = threading.Thread(target=self._sync_loop, name='storage-journal-fsync', daemon=True)
+        self._syncer.start()
+
+    def _rotate(self, number: int) -> None:
+        """Switch appends to segment ``number`` (journal lock held)"""
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        self._file = open(self.segment_path(number), 'ab', buffering=1024 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(_JOURNAL_MAGIC)
+        self.segment = number
+        self.segment_bytes = self._file.tell()
+
+    def append(self, op: int, fields: tuple) -> int:
+        """Write a record (buffered); returns its sequence number for ``wait_durable``"""
+        record = encode(op, fields)
+        with self._lock:
+            self._file.write(record)
+            self.segment_bytes += len(record)
+            self.metrics['appended'] += 1
+            self._appended += 1
+            seq = self._appended
+        if self.fsync == 'always':
+            with self._sync_changed:
+                self._sync_changed.notify_all()
+        return seq
+
+    def wait_durable(self, seq: int) -> None:
+        """With fsync ``always``, block until record ``seq`` is on disk (OSError if the
+        fsync covering it failed); otherwise return at once"""
+        if self.fsync != 'always':
+            return
+        with self._sync_changed:
+            self.metrics['durable_waits'] += 1
+            while self._synced < seq:
+                if self._sync_error is not None:
+                    raise OSError(f"Journal fsync failed: {self._sync_error}")
+                self._sync_changed.wait()
+
+    def _sync(self) -> None:
+        """Flush and fsync the live segment in place (journal lock held)"""
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+            self.metrics['fsyncs'] += 1
+
+    def _sync_outside_lock(self) -> None:
+        """Flush under the journal lock, fsync without it (through a duplicate descriptor,
+        so a concurrent segment switch cannot close it underneath), then wake waiters"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            upto = self._appended
+            if self.fsync == 'never':
+                return
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        except OSError as e:
+            print(f"❌ Journal fsync failed: {e}")
+            with self._sync_changed:
+                self._sync_error = e
+                self._sync_changed.notify_all()
+            return
+        finally:
+            os.close(fd)
+        with self._sync_changed:
+            self.metrics['fsyncs'] += 1
+            self._sync_error = None
+            self._synced = max(self._synced, upto)
+            self._sync_changed.notify_all()
+
+    def _sync_loop(self) -> None:
+        if self.fsync != 'always':
+            while not self._stop.wait(self.fsync_interval):
+                self._sync_outside_lock()
+            return
+        while True:
+            with self._sync_changed:
+                # Appends arriving during an fsync are all covered by the next one
+                while self._appended <= self._synced and not self._stop.is_set():
+                    self._sync_changed.wait()
+            if self._stop.is_set():
+                return
+            self._sync_outside_lock()
+
+    # Snapshots
+
+    def begin_snapshot(self) -> int:
+        """Switch to a new segment; the snapshot of the current state then covers every
+        earlier one. Call with the storage quiesced (all shard locks held)."""
+        with self._lock:
+            self._rotate(self.segment + 1)
+            return self.segment
+
+    def write_snapshot(self, first_segment: int, next_keys: List[int], records: Iterator[Tuple[int, tuple]]) -> None:
+        """Write the snapshot atomically (temp file, fsync, rename), then delete the
+        segments it covers"""
+        started = time.perf_counter()
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'wb', buffering=1024 * 1024) as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(_SNAPSHOT_HEADER.pack(_VERSION, len(next_keys), first_segment))
+            f.write(struct.pack(f'<{len(next_keys)}q', *next_keys))
+            for op, fields in records:
+                f.write(encode(op, fields))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.snapshot_path)
+        for number in self.segments():
+            if number < first_segment:
+                os.remove(self.segment_path(number))
+        self.metrics['snapshots'] += 1
+        self.metrics['last_snapshot_seconds'] = round(time.perf_counter() - started, 3)
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._sync_changed:
+            self._sync_changed.notify_all()
+        if self._syncer is not None:
+            self._syncer.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            upto = self._appended
+        with self._sync_changed:
+            self._synced = max(self._synced, upto)
+            self._sync_changed.notify_all()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.metrics,
+            'directory': self.directory,
+            'fsync': self.fsync,
+            'segment': self.segment,
+            'segment_bytes': self.segment_bytes
+        }
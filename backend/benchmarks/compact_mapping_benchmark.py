@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compact mapping benchmark: memory per stored body mapping and decode throughput for the
+bit-packed CompactMapping records, against the dict records MemoryStorage used to keep.
+
+Run from the backend directory:
+    python -m benchmarks.compact_mapping_benchmark --count 10000000 --dict-count 1000000
+
+Memory is the growth of the process RSS while filling an id -> record dict, so it includes
+the dict slots and integer keys the storage needs as well. The dict baseline is run at a
+smaller count by default since 10M of them need far more memory than most machines have.
+"""
+
+import argparse
+import gc
+import random
+import time
+from datetime import datetime
+
+from app.services.compact_mapping import CompactMapping
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.memory_storage import process_rss_bytes
+
+SESSION_ID = 'b3c1f7a2-5d4e-4f6a-9b8c-0d1e2f3a4b5c'
+
+def random_maps(count: int, seed: int):
+    """A pool of random maps (reused cyclically so generating them is not measured)"""
+    rng = random.Random(seed)
+    return [
+        ({region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(1, 6))},
+         rng.choice(('front', 'back')))
+        for _ in range(count)
+    ]
+
+def dict_record(mapping_id: int, body_markings, view):
+    """The record shape MemoryStorage stored before CompactMapping"""
+    return {
+        'id': str(mapping_id),
+        'session_id': SESSION_ID,
+        'body_markings': dict(body_markings),
+        'view': view,
+        'created_at': datetime.now().isoformat()
+    }
+
+def fill(count: int, maps, make):
+    gc.collect()
+    before = process_rss_bytes()
+    start = time.perf_counter()
+    records = {}
+    for i in range(count):
+        body_markings, view = maps[i % len(maps)]
+        records[i] = make(i, body_markings, view)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = process_rss_bytes() - before
+    return records, used / count, count / elapsed
+
+def decode_rate(records, sample: int, decode) -> float:
+    keys = list(records)[:sample]
+    start = time.perf_counter()
+    for key in keys:
+        decode(records[key])
+    return len(keys) / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10_000_000, help='compact records to store')
+    parser.add_argument('--dict-count', type=int, default=1_000_000, help='dict records to store (0 = skip)')
+    parser.add_argument('--decode-sample', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    maps = random_maps(100_000, args.seed)
+    session_id = SESSION_ID
+
+    if args.dict_count:
+        records, per_record, rate = fill(args.dict_count, maps, dict_record)
+        decoded = decode_rate(records, args.decode_sample, dict)
+        print(f"dict records     {args.dict_count:>11,}: {per_record:7.1f} bytes/mapping, "
+              f"{rate:>11,.0f} stores/s, {decoded:>11,.0f} copies/s")
+        del records
+
+    records, per_record, rate = fill(
+        args.count, maps, lambda i, body_markings, view: CompactMapping(i, session_id, body_markings, view)
+    )
+    decoded = decode_rate(records, args.decode_sample, CompactMapping.to_dict)
+    print(f"compact records  {args.count:>11,}: {per_record:7.1f} bytes/mapping, "
+          f"{rate:>11,.0f} stores/s, {decoded:>11,.0f} decodes/s")
+
+if __name__ == '__main__':
+    main()
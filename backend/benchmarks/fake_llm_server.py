@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Fake LLM server: a deterministic local stand-in for the Gemini generateContent and
+OpenAI chat-completions APIs, with configurable latency, error rates and malformed output.
+
+Run from the backend directory:
+    python -m benchmarks.fake_llm_server --port 9100 --config profile.json
+then point the backend at it:
+    GEMINI_BASE_URL=http://127.0.0.1:9100/v1beta/models
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1/chat/completions
+
+Each provider has a profile (see DEFAULT_PROFILE). Profiles can be replaced at runtime
+with POST /__config {"gemini": {...}, "openai": {...}}, which also reseeds the random
+source so a scenario replays the same sequence of latencies and failures.
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+DEFAULT_PROFILE = {
+    # fixed: value_ms | uniform: min_ms, max_ms | lognormal: median_ms, sigma | exponential: mean_ms
+    'latency': {'distribution': 'lognormal', 'median_ms': 300.0, 'sigma': 0.4},
+    # Probability of answering with each HTTP status instead of 200
+    'error_rates': {'429': 0.0, '403': 0.0, '500': 0.0, '503': 0.0},
+    # 200 responses whose generated text is not valid JSON
+    'malformed_text_rate': 0.0,
+    # 200 responses whose body itself is not valid JSON
+    'malformed_body_rate': 0.0
+}
+
+EMOTIONS = ('Anxiety', 'Anger', 'Calm', 'Sadness', 'Excitement', 'Contentment', 'Fear', 'Shock')
+_ITEM_ID = re.compile(r'- id "([^"]*)"')
+
+class FakeLLM:
+    """Provider profiles, the shared seeded random source and request counters"""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.profiles = {'gemini': copy.deepcopy(DEFAULT_PROFILE), 'openai': copy.deepcopy(DEFAULT_PROFILE)}
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+
+    def configure(self, profiles: Dict, seed: Optional[int] = None) -> None:
+        for name, profile in profiles.items():
+            merged = copy.deepcopy(DEFAULT_PROFILE)
+            merged.update(profile)
+            self.profiles[name] = merged
+        self.seed = self.seed if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.counts.clear()
+
+    def latency(self, provider: str) -> float:
+        spec = self.profiles[provider]['latency']
+        distribution = spec.get('distribution', 'fixed')
+        if distribution == 'uniform':
+            ms = self.rng.uniform(spec['min_ms'], spec['max_ms'])
+        elif distribution == 'lognormal':
+            ms = spec['median_ms'] * self.rng.lognormvariate(0.0, spec.get('sigma', 0.5))
+        elif distribution == 'exponential':
+            ms = self.rng.expovariate(1.0 / spec['mean_ms'])
+        else:
+            ms = spec.get('value_ms', 0.0)
+        return ms / 1000.0
+
+    def outcome(self, provider: str) -> str:
+        """'200', an error status, 'malformed_text' or 'malformed_body'"""
+        profile = self.profiles[provider]
+        roll = self.rng.random()
+        for status, rate in profile['error_rates'].items():
+            if roll < rate:
+                return status
+            roll -= rate
+        for kind in ('malformed_text', 'malformed_body'):
+            rate = profile[f'{kind}_rate']
+            if roll < rate:
+                return kind
+            roll -= rate
+        return '200'
+
+def analysis_for(text: str, source: str) -> Dict:
+    """Deterministic analysis derived from the prompt text"""
+    digest = hashlib.sha256(text.encode()).digest()
+    return {
+        'emotion': EMOTIONS[digest[0] % len(EMOTIONS)],
+        'confidence': round(0.5 + digest[1] / 510, 2),
+        'description': 'Deterministic analysis from the fake LLM server',
+        'patterns': [f'pattern-{digest[2] % 16}'],
+        'source': source
+    }
+
+def generated_text(prompt: str, source: str, malformed: bool) -> str:
+    """JSON answer to a single or batch prompt (truncated when malformed)"""
+    item_ids = _ITEM_ID.findall(prompt)
+    if item_ids:
+        answer = json.dumps([{'id': item_id, **analysis_for(f'{item_id}|{prompt}', source)} for item_id in item_ids])
+    else:
+        answer = json.dumps(analysis_for(prompt, source))
+    return answer[:len(answer) // 2] if malformed else answer
+
+fake = FakeLLM()
+app = FastAPI(title="Fake LLM server")
+
+async def respond(provider: str, prompt: str, wrap) -> Response:
+    fake.counts[f'{provider}_requests'] += 1
+    outcome = fake.outcome(provider)
+    fake.counts[f'{provider}_{outcome}'] += 1
+    await asyncio.sleep(fake.latency(provider))
+    if outcome == 'malformed_body':
+        return Response(content='{"candidates": [', media_type='application/json')
+    if outcome not in ('200', 'malformed_text'):
+        return JSONResponse({'error': {'code': int(outcome), 'message': 'fake failure'}}, status_code=int(outcome))
+    source = 'gemini_api' if provider == 'gemini' else 'openai_api'
+    return JSONResponse(wrap(generated_text(prompt, source, outcome == 'malformed_text')))
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini_generate_content(model_action: str, request: Request) -> Response:
+    """Gemini ``{model}:generateContent``"""
+    if not model_action.endswith(':generateContent'):
+        return JSONResponse({'error': {'code': 404, 'message': 'unknown method'}}, status_code=404)
+    body = await request.json()
+    prompt = body['contents'][0]['parts'][0]['text']
+    return await respond('gemini', prompt, lambda text: {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}]
+    })
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request) -> Response:
+    """OpenAI chat completions"""
+    body = await request.json()
+    prompt = body['messages'][-1]['content']
+    return await respond('openai', prompt, lambda text: {
+        'object': 'chat.completion',
+        'model': body.get('model'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}]
+    })
+
+@app.post("/__config")
+async def configure(request: Request) -> Dict:
+    """Replace provider profiles (and optionally the seed); resets counters"""
+    body = await request.json()
+    seed = body.pop('seed', None)
+    fake.configure(body, seed)
+    return {'profiles': fake.profiles, 'seed': fake.seed}
+
+@app.get("/__stats")
+async def stats() -> Dict:
+    return {'profiles': fake.profiles, 'seed': fake.seed, 'counts': dict(fake.counts)}
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', help='JSON file with {"gemini": profile, "openai": profile}')
+    args = parser.parse_args()
+
+    profiles = {}
+    if args.config:
+        with open(args.config) as f:
+            profiles = json.load(f)
+    fake.configure(profiles, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Persistent L2 cache benchmark: lookup latency while several worker processes read and write.
+
+Run from the backend directory:
+    python -m benchmarks.l2_cache_benchmark --entries 100000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.persistent_cache import PersistentResultCache
+from app.services.result_cache import canonical_key
+
+RESULT = {
+    'emotion': 'Anxiety',
+    'confidence': 0.82,
+    'description': 'Tight chest and a hot head are typical of anxious arousal. ' * 4,
+    'patterns': ['hot head', 'warm chest', 'tense shoulders'],
+    'source': 'gemini_api'
+}
+
+def key_for(i: int) -> str:
+    return canonical_key({'chest': 'warm', 'head': 'hot', 'map': str(i)}, 'front', 'GeminiProvider:gemini-1.5-flash|p1')
+
+def worker(path: str, entries: int, lookups: int, write_ratio: float, seed: int, queue) -> None:
+    """Mixed reads and writes from one process; reports read latencies in ms (writes are
+    queued for the cache's writer thread, so only reads are timed)"""
+    cache = PersistentResultCache(path, max_bytes=1 << 30)
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(lookups):
+        key = key_for(rng.randrange(entries))
+        if rng.random() < write_ratio:
+            cache.set(key, RESULT)
+            continue
+        start = time.perf_counter()
+        cache.get(key)
+        latencies.append((time.perf_counter() - start) * 1000)
+    cache.close()
+    queue.put((latencies, cache.metrics['write_errors'], cache.metrics['dropped_writes']))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--lookups', type=int, default=20_000, help='operations per worker')
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'l2.sqlite3')
+        cache = PersistentResultCache(path, max_bytes=1 << 30, max_pending=args.entries + 1)
+        start = time.perf_counter()
+        for i in range(args.entries):
+            cache.set(key_for(i), RESULT)
+        cache.flush()
+        fill_seconds = time.perf_counter() - start
+        stats = cache.get_stats()
+        cache.close()
+
+        queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, args.entries, args.lookups, args.write_ratio, seed, queue))
+            for seed in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _, _ in outcomes for latency in worker_latencies)
+    write_errors = sum(errors for _, errors, _ in outcomes)
+    dropped = sum(dropped for _, _, dropped in outcomes)
+    print(f"entries:      {stats['entries']:,} ({stats['bytes'] / 1024 / 1024:.1f} MB payload, filled in {fill_seconds:.1f}s)")
+    print(f"workers:      {args.workers} x {args.lookups:,} ops, {args.write_ratio:.0%} writes, {elapsed:.1f}s")
+    print(f"get latency:  p50 {statistics.median(latencies):.3f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)]:.3f} ms")
+    print(f"busy writes:  {write_errors} ({dropped} dropped on a full write queue)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Neighbor index benchmark: query latency and memory at a large number of stored maps.
+
+Run from the backend directory:
+    python -m benchmarks.neighbor_index_benchmark --entries 1000000 --queries 2000
+"""
+
+import argparse
+import random
+import resource
+import statistics
+import time
+
+from app.services.local_classifier import REGIONS, SENSATIONS, VIEWS
+from app.services.neighbor_index import NeighborIndex
+
+def random_map(rng: random.Random, max_regions: int) -> dict:
+    regions = rng.sample(REGIONS, rng.randint(1, max_regions))
+    return {region: rng.choice(SENSATIONS) for region in regions}
+
+def perturb(rng: random.Random, body_markings: dict) -> dict:
+    """Change, add or drop one region, as a user tweaking a previous map would"""
+    markings = dict(body_markings)
+    action = rng.choice(('change', 'add', 'drop'))
+    if action == 'drop' and len(markings) > 1:
+        del markings[rng.choice(list(markings))]
+    elif action == 'add' and len(markings) < len(REGIONS):
+        markings[rng.choice([r for r in REGIONS if r not in markings])] = rng.choice(SENSATIONS)
+    else:
+        region = rng.choice(list(markings))
+        markings[region] = rng.choice([s for s in SENSATIONS if s != markings[region]])
+    return markings
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--radius', type=int, default=2)
+    parser.add_argument('--max-regions', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # One shared result object so the numbers reflect the index, not stored payloads
+    result = {'emotion': 'Benchmark', 'confidence': 0.9, 'description': '', 'patterns': [], 'source': 'benchmark'}
+    index = NeighborIndex(max_entries=args.entries)
+
+    rss_before = max_rss_mb()
+    stored = []
+    start = time.perf_counter()
+    while len(index) < args.entries:
+        markings, view = random_map(rng, args.max_regions), rng.choice(VIEWS)
+        index.add(markings, view, result)
+        if len(stored) < args.queries:
+            stored.append((markings, view))
+    build_seconds = time.perf_counter() - start
+    rss_after = max_rss_mb()
+
+    def timed_queries(queries):
+        latencies, hits = [], 0
+        for markings, view in queries:
+            start = time.perf_counter()
+            hits += index.nearest(markings, view, args.radius) is not None
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            'hit_rate': round(hits / len(queries), 3),
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3)
+        }
+
+    near = [(perturb(rng, markings), view) for markings, view in stored]
+    fresh = [(random_map(rng, args.max_regions), rng.choice(VIEWS)) for _ in range(args.queries)]
+    stats = index.get_stats()
+
+    print(f"entries:        {len(index):,} (built in {build_seconds:.1f}s)")
+    print(f"vector memory:  {stats['vector_bytes'] / 1024 / 1024:.1f} MB in {stats['buckets']} buckets")
+    print(f"process growth: {rss_after - rss_before:.1f} MB max RSS (vectors, exact-match dict, entry list)")
+    print(f"exact queries:  {timed_queries(stored)}")
+    print(f"1-edit queries: {timed_queries(near)}")
+    print(f"random queries: {timed_queries(fresh)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Pagination benchmark: serving GET /body-mappings/ as one list of everything versus a
+page at a time from the storage indexes, with and without filters.
+
+Run from the backend directory:
+    python -m benchmarks.pagination_benchmark --mappings 1000000
+
+Times are storage call plus JSON encoding of the response body, the median of
+``--repeats`` runs. "deep page" starts from a cursor half-way through the data.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from app.services.compact_mapping import epoch_us
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.memory_storage import MemoryStorage
+from app.services.sqlite_storage import SQLiteStorage
+from app.services.storage_backend import StorageBusy
+
+def fill(storage, mappings: int, sessions: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for _ in range(mappings):
+        markings = {region: rng.choice(SENSATIONS[:4]) for region in rng.sample(REGIONS, rng.randint(1, 6))}
+        # A rare sensation, so one filter is selective
+        if rng.random() < 0.01:
+            markings[rng.choice(REGIONS)] = 'numb'
+        session_id, view = f'session-{rng.randrange(sessions)}', rng.choice(('front', 'back'))
+        while True:
+            try:
+                storage.save_body_mapping(session_id, markings, view)
+                break
+            except StorageBusy:
+                time.sleep(0.001)
+    storage.flush()
+
+def timed(call, repeats: int):
+    """Median milliseconds of ``call`` and its last result"""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+def run(name: str, storage, repeats: int, limit: int) -> None:
+    full_ms, everything = timed(lambda: json.dumps({'mappings': storage.list_body_mappings()}), 1)
+    middle = json.loads(everything)['mappings'][len(json.loads(everything)['mappings']) // 2]
+    middle_position = (epoch_us(datetime.fromisoformat(middle['created_at'])), int(middle['id']))
+    window_to = middle_position[0] + 1000  # the next millisecond of traffic or so
+    cases = {
+        'first page': {},
+        'deep page': {'after': middle_position},
+        'view=back': {'view': 'back'},
+        'sensation=numb (1%)': {'sensation': 'numb'},
+        'view=back, sensation=cold': {'view': 'back', 'sensation': 'cold'},
+        'session': {'session_id': middle['session_id']},
+        'created range': {'created_from': middle_position[0], 'created_to': window_to}
+    }
+    print(f"\n{name}: {len(everything) / 1e6:.1f} MB as one list, built and encoded in {full_ms:,.0f} ms")
+    for case, filters in cases.items():
+        def page():
+            mappings, position = storage.page_body_mappings(limit, **filters)
+            return json.dumps({'mappings': mappings}), len(mappings)
+        ms, (_, count) = timed(page, repeats)
+        print(f"  {case:<28} {ms:>8.2f} ms  ({count} mappings)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mappings', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=50_000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skip-sqlite', action='store_true')
+    args = parser.parse_args()
+
+    storage = MemoryStorage()
+    fill(storage, args.mappings, args.sessions, args.seed)
+    run('memory', storage, args.repeats, args.limit)
+    del storage
+
+    if not args.skip_sqlite:
+        storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(prefix='pagination-benchmark-'), 'storage.sqlite3'))
+        fill(storage, args.mappings, args.sessions, args.seed)
+        run('sqlite', storage, args.repeats, args.limit)
+        storage.close()
+
+if __name__ == '__main__':
+    main()
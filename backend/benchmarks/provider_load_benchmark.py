@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Provider load benchmark: drives POST /emotions/analyze at a fixed request rate against the
+backend wired to the fake LLM server, one scenario (provider profile) at a time.
+
+Run from the backend directory:
+    python -m benchmarks.provider_load_benchmark --qps 20 --duration 15
+    python -m benchmarks.provider_load_benchmark --scenarios baseline gemini_429 --output results.json
+
+Each scenario starts a fresh backend process (so breakers and stats start clean) with
+result caching, the neighbour index and the local classifier bypass disabled, so every
+request reaches the providers. Results are written as JSON (default
+benchmarks/results/provider_load_<commit>.json) for comparison between commits.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from app.services.local_classifier import REGIONS, SENSATIONS
+
+HEALTHY = {'latency': {'distribution': 'lognormal', 'median_ms': 300.0, 'sigma': 0.4}}
+
+SCENARIOS = {
+    'baseline': {'gemini': HEALTHY, 'openai': HEALTHY},
+    'gemini_429': {
+        'gemini': {**HEALTHY, 'error_rates': {'429': 0.2}},
+        'openai': HEALTHY
+    },
+    'gemini_5xx': {
+        'gemini': {**HEALTHY, 'error_rates': {'500': 0.1, '503': 0.1}},
+        'openai': HEALTHY
+    },
+    'gemini_malformed': {
+        'gemini': {**HEALTHY, 'malformed_text_rate': 0.1, 'malformed_body_rate': 0.1},
+        'openai': HEALTHY
+    },
+    'gemini_slow_tail': {
+        'gemini': {'latency': {'distribution': 'lognormal', 'median_ms': 400.0, 'sigma': 1.0}},
+        'openai': HEALTHY
+    },
+    'gemini_down': {
+        'gemini': {**HEALTHY, 'error_rates': {'403': 1.0}},
+        'openai': HEALTHY
+    },
+    'all_down': {
+        'gemini': {**HEALTHY, 'error_rates': {'503': 1.0}},
+        'openai': {**HEALTHY, 'error_rates': {'429': 1.0}}
+    }
+}
+
+BACKEND_ENV = {
+    'GEMINI_API_KEY': 'fake-gemini-key',
+    'OPENAI_API_KEY': 'fake-openai-key',
+    'RESULT_CACHE_ENABLED': 'false',
+    'RESULT_CACHE_L2_ENABLED': 'false',
+    'NEIGHBOR_INDEX_ENABLED': 'false',
+    'LOCAL_CLASSIFIER_BYPASS_ENABLED': 'false',
+    'REQUEST_COALESCING_ENABLED': 'false'
+}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(module: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', module, '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+def wait_until_up(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+def random_map(rng: random.Random) -> Dict[str, str]:
+    regions = rng.sample(REGIONS, rng.randint(1, 6))
+    return {region: rng.choice(SENSATIONS) for region in regions}
+
+def classify(status: int, body: Dict) -> str:
+    """Which path answered: gemini, openai, unparsed_<provider>, local_fallback or http_<status>"""
+    if status != 200:
+        return f'http_{status}'
+    data = body.get('data') or {}
+    source = data.get('source', 'unknown')
+    if source in ('gemini_api', 'openai_api'):
+        provider = source.split('_')[0]
+        # Answers the provider could not parse are wrapped as "<provider>_ai_analysis"
+        if f'{provider}_ai_analysis' in data.get('patterns', []):
+            return f'unparsed_{provider}'
+        return provider
+    return 'local_fallback'
+
+async def drive(base_url: str, qps: float, duration: float, seed: int) -> Dict:
+    """Open-loop load: request i is sent at i / qps seconds regardless of earlier responses"""
+    rng = random.Random(seed)
+    total = int(qps * duration)
+    latencies: List[float] = []
+    outcomes = Counter()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        async def one(markings: Dict[str, str], view: str) -> None:
+            start = time.perf_counter()
+            try:
+                response = await client.post('/api/v1/emotions/analyze', json={'body_markings': markings, 'view': view})
+                outcome = classify(response.status_code, response.json())
+            except (httpx.HTTPError, ValueError) as e:
+                outcome = f'client_error_{type(e).__name__}'
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            await asyncio.sleep(max(0.0, started + i / qps - time.perf_counter()))
+            tasks.append(asyncio.create_task(one(random_map(rng), rng.choice(('front', 'back')))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    answered_remote = outcomes['gemini'] + outcomes['openai']
+    return {
+        'requests': total,
+        'seconds': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 2),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies), 1),
+            'p95': round(latencies[int(len(latencies) * 0.95) - 1], 1),
+            'p99': round(latencies[int(len(latencies) * 0.99) - 1], 1),
+            'max': round(latencies[-1], 1)
+        },
+        'outcomes': dict(outcomes),
+        'primary_rate': round(outcomes['gemini'] / total, 4),
+        'fallback_rate': round((total - outcomes['gemini']) / total, 4),
+        'remote_rate': round(answered_remote / total, 4),
+        'local_fallback_rate': round(outcomes['local_fallback'] / total, 4)
+    }
+
+def run_scenario(name: str, profiles: Dict, qps: float, duration: float, seed: int) -> Dict:
+    fake_port, app_port = free_port(), free_port()
+    fake = start_server('benchmarks.fake_llm_server:app', fake_port, {})
+    backend = None
+    try:
+        wait_until_up(f'http://127.0.0.1:{fake_port}/__stats')
+        httpx.post(f'http://127.0.0.1:{fake_port}/__config', json={**profiles, 'seed': seed}).raise_for_status()
+        backend = start_server('main:app', app_port, {
+            **BACKEND_ENV,
+            'GEMINI_BASE_URL': f'http://127.0.0.1:{fake_port}/v1beta/models',
+            'OPENAI_BASE_URL': f'http://127.0.0.1:{fake_port}/v1/chat/completions'
+        })
+        wait_until_up(f'http://127.0.0.1:{app_port}/health')
+        result = asyncio.run(drive(f'http://127.0.0.1:{app_port}', qps, duration, seed))
+        result['fake_server'] = httpx.get(f'http://127.0.0.1:{fake_port}/__stats').json()['counts']
+        status = httpx.get(f'http://127.0.0.1:{app_port}/api/v1/emotions/status').json()['data']
+        result['circuit_breakers'] = {name: state['state'] for name, state in status['circuit_breakers'].items()}
+        return result
+    finally:
+        for process in (backend, fake):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--qps', type=float, default=20.0)
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--output', help='results file (default benchmarks/results/provider_load_<commit>.json)')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        'benchmark': 'provider_load',
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'qps': args.qps,
+        'duration_seconds': args.duration,
+        'seed': args.seed,
+        'scenarios': {}
+    }
+    for name in args.scenarios:
+        print(f"▶ {name}: {args.qps} qps for {args.duration}s")
+        result = run_scenario(name, SCENARIOS[name], args.qps, args.duration, args.seed)
+        report['scenarios'][name] = {'profiles': SCENARIOS[name], **result}
+        latency = result['latency_ms']
+        print(f"  p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+              f"{result['throughput_rps']} rps, fallback {result['fallback_rate']:.1%}, "
+              f"local {result['local_fallback_rate']:.1%}")
+
+    output = args.output or os.path.join('benchmarks', 'results', f'provider_load_{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
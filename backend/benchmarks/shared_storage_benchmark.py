@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Shared storage benchmark: several worker processes on one STORAGE_BACKEND=shared
+database, as under `uvicorn --workers N`.
+
+Run from the backend directory:
+    python -m benchmarks.shared_storage_benchmark --workers 1 2 4 --seconds 5
+
+Each worker loops over a request mix (save a mapping, read it back, read a random
+mapping saved by any worker, save an emotion result for every other mapping) for a
+fixed time. Afterwards every worker reads every mapping the others saved, and the
+run fails if any id was issued twice or any mapping is missing.
+
+Throughput can only scale with workers up to the number of cores. Reads run in
+parallel (WAL); write transactions are serialized by SQLite, so "in writes" (share
+of wall time a worker spends committing) bounds the speed-up at about 1 / that share.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.sqlite_storage import SQLiteStorage
+
+def worker(path: str, index: int, seconds: float, start, barrier, results) -> None:
+    storage = SQLiteStorage(path, write_through=True)
+    rng = random.Random(index)
+    saved = []
+    operations = 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        markings = {region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(1, 6))}
+        mapping_id = storage.save_body_mapping(f'session-{index}-{rng.randrange(100)}', markings, 'front')
+        saved.append(mapping_id)
+        storage.get_body_mapping(mapping_id)
+        storage.get_body_mapping(str(rng.randint(1, int(mapping_id))))
+        operations += 3
+        if len(saved) % 2 == 0:
+            storage.save_emotion_result(mapping_id, {'emotion': 'Calm', 'confidence': 0.8})
+            operations += 1
+    results.put((index, operations, saved, storage.metrics['flush_seconds'] / seconds))
+    # Every worker must see every other worker's acknowledged writes
+    everyone = barrier.get()
+    missing = sum(1 for mapping_id in everyone if storage.get_body_mapping(mapping_id) is None)
+    results.put((index, missing, None, None))
+    storage.close()
+
+def run(workers: int, seconds: float, directory: str) -> None:
+    path = os.path.join(directory, f'shared-{workers}.sqlite3')
+    SQLiteStorage(path, write_through=True).close()
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    barrier = context.Queue()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(path, index, seconds, start, barrier, results))
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(1.0)
+    start.set()
+    reports = [results.get() for _ in processes]
+    ids = [mapping_id for _, _, saved, _ in reports for mapping_id in saved]
+    for _ in processes:
+        barrier.put(ids)
+    missing = sum(results.get()[1] for _ in processes)
+    for process in processes:
+        process.join()
+
+    operations = sum(count for _, count, _, _ in reports)
+    writing = sum(share for _, _, _, share in reports) / workers
+    duplicates = len(ids) - len(set(ids))
+    print(f"{workers:>7} {operations / seconds:>10,.0f} {len(ids) / seconds:>10,.0f} {writing:>10.0%} "
+          f"{duplicates:>10} {missing:>12}")
+    if duplicates or missing:
+        raise SystemExit(f"❌ {duplicates} duplicate ids, {missing} mappings not visible to every worker")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='shared-storage-benchmark-')
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'workers':>7} {'ops/s':>10} {'saves/s':>10} {'in writes':>10} {'duplicates':>10} {'not visible':>12}")
+    for workers in args.workers:
+        run(workers, args.seconds, directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Storage backend benchmark: how long save_body_mapping / save_emotion_result calls take
+for the in-memory backend and for SQLite with and without write-behind batching.
+
+Run from the backend directory:
+    python -m benchmarks.storage_backend_benchmark --writes 100000
+
+"sqlite, per-write commits" runs the same backend with a batch size of one and no
+batching delay, i.e. one transaction per write as a synchronous store would need.
+Call latency is what a request handler waits for; "durable" is the time until the
+writer has committed everything. A write refused with StorageBusy (write queue full)
+is retried after a millisecond, as a client would after a 503, and counted in "busy".
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.memory_storage import MemoryStorage
+from app.services.sqlite_storage import SQLiteStorage
+from app.services.storage_backend import StorageBusy
+
+def retried(call, busy: list):
+    """``call()``, retried while the backend refuses it as busy"""
+    while True:
+        try:
+            return call()
+        except StorageBusy:
+            busy[0] += 1
+            time.sleep(0.001)
+
+def run(storage, writes: int, sessions: int, seed: int):
+    rng = random.Random(seed)
+    latencies = []
+    busy = [0]
+    started = time.perf_counter()
+    for i in range(writes):
+        markings = {region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(1, 6))}
+        session_id, view = f'session-{rng.randrange(sessions)}', rng.choice(('front', 'back'))
+        call = time.perf_counter()
+        mapping_id = retried(lambda: storage.save_body_mapping(session_id, markings, view), busy)
+        if i % 2 == 0:
+            retried(lambda: storage.save_emotion_result(mapping_id, {'emotion': 'Calm', 'confidence': 0.8}), busy)
+        latencies.append((time.perf_counter() - call) * 1e6)
+    accepted = time.perf_counter() - started
+    storage.flush()
+    durable = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'p50_us': statistics.median(latencies),
+        'p99_us': latencies[int(len(latencies) * 0.99) - 1],
+        'writes_per_s': writes / durable,
+        'accepted_s': accepted,
+        'durable_s': durable,
+        'busy': busy[0]
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writes', type=int, default=100_000, help='mappings saved (half also get a result)')
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='storage-benchmark-')
+    backends = {
+        'memory': lambda: MemoryStorage(),
+        'sqlite, write-behind': lambda: SQLiteStorage(os.path.join(directory, 'batched.sqlite3')),
+        'sqlite, per-write commits': lambda: SQLiteStorage(
+            os.path.join(directory, 'unbatched.sqlite3'), batch_size=1, flush_interval=0.0
+        )
+    }
+    print(f"{'backend':<26} {'call p50':>10} {'call p99':>10} {'writes/s':>10} {'accepted':>9} {'durable':>9} {'busy':>7}")
+    for name, create in backends.items():
+        storage = create()
+        result = run(storage, args.writes, args.sessions, args.seed)
+        extra = ''
+        if isinstance(storage, SQLiteStorage):
+            stats = storage.get_stats()
+            extra = f"  ({stats['avg_writes_per_flush']} writes/transaction)"
+        storage.close()
+        print(f"{name:<26} {result['p50_us']:>8.1f}us {result['p99_us']:>8.1f}us {result['writes_per_s']:>10,.0f} "
+              f"{result['accepted_s']:>8.2f}s {result['durable_s']:>8.2f}s {result['busy']:>7,}{extra}")
+
+if __name__ == '__main__':
+    main()
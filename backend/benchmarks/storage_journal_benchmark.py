@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Storage journal benchmark: write throughput of MemoryStorage under each journal fsync
+policy, and recovery time for a large store from the log alone and from a snapshot
+plus log tail.
+
+Run from the backend directory:
+    python -m benchmarks.storage_journal_benchmark --mappings 1000000
+
+Throughput is single-threaded save_body_mapping calls (every other one followed by
+save_emotion_result). With "always" each call waits for an fsync (concurrent writers
+would share them), so it runs fewer writes.
+"""
+
+import argparse
+import gc
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.memory_storage import MemoryStorage
+from app.services.storage_journal import FSYNC_POLICIES, Journal
+
+def write(storage: MemoryStorage, count: int, rng: random.Random) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        markings = {region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(1, 6))}
+        mapping_id = storage.save_body_mapping(f'session-{rng.randrange(count // 10 + 1)}', markings,
+                                               rng.choice(('front', 'back')))
+        if i % 2 == 0:
+            storage.save_emotion_result(mapping_id, {'emotion': 'Calm', 'confidence': 0.8})
+    return time.perf_counter() - started
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def recover(path: str):
+    gc.collect()
+    started = time.perf_counter()
+    storage = MemoryStorage(journal=Journal(path, fsync='never'))
+    elapsed = time.perf_counter() - started
+    return storage, elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writes', type=int, default=100_000, help='writes per fsync policy')
+    parser.add_argument('--always-writes', type=int, default=2_000, help='writes with fsync=always')
+    parser.add_argument('--mappings', type=int, default=1_000_000, help='store size for recovery')
+    parser.add_argument('--tail', type=float, default=0.1, help='log tail after the snapshot, as a share of --mappings')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix='journal-benchmark-')
+
+    print(f"{'journal':<16} {'writes':>8} {'mappings/s':>11} {'vs none':>8}")
+    baseline = None
+    for policy in ('none',) + tuple(reversed(FSYNC_POLICIES)):
+        count = args.always_writes if policy == 'always' else args.writes
+        journal = Journal(os.path.join(root, policy), fsync=policy) if policy != 'none' else None
+        storage = MemoryStorage(journal=journal)
+        rate = count / write(storage, count, random.Random(args.seed))
+        storage.close()
+        baseline = baseline or rate
+        print(f"{policy:<16} {count:>8,} {rate:>11,.0f} {rate / baseline:>7.0%}")
+
+    path = os.path.join(root, 'recovery')
+    storage = MemoryStorage(journal=Journal(path, fsync='never'))
+    write(storage, args.mappings, random.Random(args.seed))
+    storage.close()
+    log_bytes = directory_bytes(path)
+    del storage
+
+    storage, from_log = recover(path)
+    mappings = storage.get_stats()['total_mappings']
+    started = time.perf_counter()
+    storage.compact()
+    snapshot_seconds = time.perf_counter() - started
+    write(storage, int(args.mappings * args.tail), random.Random(args.seed + 1))
+    storage.close()
+    snapshot_bytes = directory_bytes(path)
+    del storage
+
+    storage, from_snapshot = recover(path)
+    records = storage.get_stats()['journal']['recovered_records']
+    storage.close()
+    print(f"\nrecovery of {mappings:,} mappings (+{args.mappings // 2:,} emotion results)")
+    print(f"  log only:              {from_log:6.2f}s  ({log_bytes / 1e6:.0f} MB of log)")
+    print(f"  snapshot + {args.tail:.0%} tail:    {from_snapshot:6.2f}s  ({records:,} records, "
+          f"{snapshot_bytes / 1e6:.0f} MB on disk; snapshot written in {snapshot_seconds:.2f}s)")
+    shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
 from app.routers import body_mapping, emotions, users
 from app.core.config import settings
+from app.services.storage import storage
+from app.services.storage_backend import StorageBusy
 
 app = FastAPI(
     title="Body Feel Map API",
@@ -25,12 +31,41 @@ app.include_router(body_mapping.router, prefix="/api/v1")
 app.include_router(emotions.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
 
+@app.exception_handler(StorageBusy)
+async def storage_busy(request: Request, exc: StorageBusy):
+    """A storage backend that cannot take writes right now: ask the client to retry"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Storage is busy, retry shortly: {exc}"},
+        headers={"Retry-After": "1"}
+    )
+
+async def sweep_storage():
+    """Expire idle sessions even when no writes arrive to evict them"""
+    while True:
+        await asyncio.sleep(60)
+        await run_in_threadpool(storage.sweep)
+
+@app.on_event("startup")
+async def startup():
+    await emotions.emotion_service.startup()
+    app.state.storage_sweeper = asyncio.create_task(sweep_storage())
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.storage_sweeper.cancel()
+    await emotions.emotion_service.shutdown()
+    storage.close()
+
 @app.get("/")
 async def root():
     return {"message": "Body Feel Map API", "version": "1.0.0"}
 
 @app.get("/health")
 async def health_check():
+    problem = storage.health()
+    if problem is not None:
+        return JSONResponse(status_code=503, content={"status": "degraded", "storage": problem})
     return {"status": "healthy"}
 
 if __name__ == "__main__":
@@ -0,0 +1,19 @@
+"""
+Shared pytest fixtures. Run from the backend directory:
+    python -m pytest -q
+"""
+
+import pytest
+
+from app.core.config import settings
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture(autouse=True)
+def l2_cache_path(tmp_path, monkeypatch):
+    """Keep any persistent L2 result cache a test opens out of the source tree"""
+    path = str(tmp_path / 'llm_result_cache.sqlite3')
+    monkeypatch.setattr(settings, 'RESULT_CACHE_L2_PATH', path)
+    return path
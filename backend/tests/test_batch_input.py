@@ -0,0 +1,59 @@
+"""Size limits on /emotions/analyze/batch request bodies (user-015)"""
+
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import main
+from app.core.config import settings
+from app.routers.emotions import read_ndjson_items
+
+class ChunkedRequest:
+    """Just enough of a Request for read_ndjson_items: the body in the given chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+def line(view='front'):
+    return json.dumps({'body_markings': {'head': 'hot'}, 'view': view}).encode()
+
+@pytest.mark.anyio
+async def test_lines_split_across_chunks_are_reassembled():
+    body = line() + b"\n\n" + line('back') + b"\n" + b"not json\n" + line()
+    chunks = [body[index:index + 3] for index in range(0, len(body), 3)]
+    items = await read_ndjson_items(ChunkedRequest(chunks))
+    assert items == [({'head': 'hot'}, 'front'), ({'head': 'hot'}, 'back'), 'Invalid JSON line',
+                     ({'head': 'hot'}, 'front')]
+
+@pytest.mark.anyio
+async def test_a_line_without_newline_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, 'BATCH_MAX_LINE_BYTES', 1000)
+    with pytest.raises(HTTPException) as raised:
+        await read_ndjson_items(ChunkedRequest([b"x" * 100] * 11))
+    assert raised.value.status_code == 413
+
+@pytest.mark.anyio
+async def test_item_limit_counts_the_last_line(monkeypatch):
+    monkeypatch.setattr(settings, 'BATCH_MAX_ITEMS', 2)
+    with pytest.raises(HTTPException) as raised:
+        await read_ndjson_items(ChunkedRequest([line() + b"\n" + line() + b"\n" + line()]))
+    assert raised.value.status_code == 413
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('content_type', ['application/x-ndjson', 'application/json'])
+async def test_oversized_bodies_are_413(content_type, monkeypatch):
+    monkeypatch.setattr(settings, 'BATCH_MAX_BYTES', 10_000)
+    items = [{'body_markings': {'head': 'hot'}, 'view': 'front'}] * 500
+    body = ("\n".join(json.dumps(item) for item in items) if 'ndjson' in content_type else json.dumps(items))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        response = await client.post('/api/v1/emotions/analyze/batch', content=body,
+                                     headers={'Content-Type': content_type})
+    assert response.status_code == 413
+    assert '10000 bytes' in response.json()['detail']
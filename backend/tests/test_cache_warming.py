@@ -0,0 +1,58 @@
+"""POST /emotions/cache/warm mines stored mappings page by page (user-017)"""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import main
+from app.routers import emotions
+from app.services.cache_warmer import mine_patterns
+from app.services.emotion_analysis import EmotionAnalysisService
+from app.services.memory_storage import MemoryStorage
+
+@pytest.fixture
+def stored():
+    storage = MemoryStorage(shards=4)
+    for index in range(2500):
+        storage.save_body_mapping(f'session-{index % 10}', {'head': ('hot', 'cold', 'numb')[index % 3]}, 'front')
+    yield storage
+    storage.close()
+
+def test_iter_body_mappings_pages_through_everything(stored):
+    assert list(stored.iter_body_mappings(page_size=7)) == stored.list_body_mappings()
+
+@pytest.mark.anyio
+async def test_warm_mines_in_a_worker_thread(stored, monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', 'fake-gemini-key')
+    service = EmotionAnalysisService()
+    warmed = []
+    mined_on = []
+
+    async def warm(patterns, total, top, source='storage'):
+        warmed.append((patterns, total, top))
+        return {}
+
+    def recording_mine_patterns(mappings):
+        mined_on.append(threading.current_thread())
+        return mine_patterns(mappings)
+
+    monkeypatch.setattr(service.cache_warmer, 'warm', warm)
+    monkeypatch.setattr(emotions, 'emotion_service', service)
+    monkeypatch.setattr(emotions, 'storage', stored)
+    monkeypatch.setattr(emotions, 'mine_patterns', recording_mine_patterns)
+    monkeypatch.setattr(stored, 'list_body_mappings', lambda: pytest.fail("loaded every mapping at once"))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        response = await client.post('/api/v1/emotions/cache/warm', params={'top': 2})
+        await asyncio.sleep(0)
+    await service.shutdown()
+
+    assert response.status_code == 200
+    assert response.json()['data'] == {'mappings': 2500, 'patterns': 3}
+    assert mined_on and mined_on[0] is not threading.main_thread()
+    patterns, total, top = warmed[0]
+    assert (total, top) == (2500, 2)
+    assert [count for _, _, count in patterns] == [834, 833, 833]
@@ -0,0 +1,77 @@
+"""Circuit breaker state transitions"""
+
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable monotonic clock for the breaker module"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_opens_on_error_rate_only_after_min_calls():
+    breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5)
+    for _ in range(3):
+        breaker.record_failure(500)
+    assert breaker.allow_request()
+    breaker.record_failure(500)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.last_reason == 'error rate'
+
+def test_stays_closed_below_error_rate():
+    breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5)
+    for _ in range(10):
+        breaker.record_success(0.1)
+        breaker.record_success(0.1)
+        breaker.record_failure(500)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.to_dict()['error_rate'] < 0.5
+
+def test_trip_status_opens_immediately():
+    breaker = CircuitBreaker(min_calls=5, trip_statuses=[429])
+    breaker.record_failure(429)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.last_reason == 'HTTP 429'
+    assert breaker.trips == 1
+
+def test_slow_successes_count_against_error_rate():
+    breaker = CircuitBreaker(window=4, min_calls=4, error_rate=0.5, slow_call_seconds=1.0)
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_success(2.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success(2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.last_reason == 'slow calls'
+
+def test_half_open_after_cool_down_then_probe_closes(clock):
+    breaker = CircuitBreaker(open_seconds=30.0, trip_statuses=[403])
+    breaker.record_failure(403)
+    clock[0] += 29.0
+    assert not breaker.ready_for_probe()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 1.0
+    assert breaker.ready_for_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Live traffic waits for the probe
+    assert not breaker.allow_request()
+    breaker.record_success(0.2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(open_seconds=30.0, trip_statuses=[403])
+    breaker.record_failure(403)
+    clock[0] += 30.0
+    assert breaker.ready_for_probe()
+    breaker.record_failure(500)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.last_reason == 'probe failed'
+    assert breaker.trips == 2
+    # The cool-down starts again from the failed probe
+    clock[0] += 10.0
+    assert not breaker.ready_for_probe()
@@ -0,0 +1,62 @@
+"""Request coalescing in EmotionAnalysisService (user-007)"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.emotion_analysis import EmotionAnalysisService
+from app.services.quota_scheduler import BATCH, INTERACTIVE
+
+MARKINGS = {'head': 'hot', 'chest': 'cold'}
+
+@pytest.fixture
+def service(monkeypatch):
+    """A service whose provider chain takes half a second and counts its calls"""
+    monkeypatch.setattr(settings, 'REQUEST_COALESCING_ENABLED', True)
+    monkeypatch.setattr(settings, 'NEIGHBOR_INDEX_ENABLED', False)
+    service = EmotionAnalysisService()
+    calls = []
+
+    async def analyze_emotions(body_markings, view, deadline, remote_only, priority, local_checked):
+        calls.append(priority)
+        await asyncio.sleep(0.5)
+        return {'emotion': 'Calm', 'confidence': 0.9, 'source': 'gemini_api'}
+
+    monkeypatch.setattr(service.llm_service, 'analyze_emotions', analyze_emotions)
+    service.calls = calls
+    return service
+
+@pytest.mark.anyio
+async def test_identical_requests_share_one_call(service):
+    deadline = time.monotonic() + 5.0
+    results = await asyncio.gather(*(service._coalesced_analysis(MARKINGS, 'front', deadline) for _ in range(5)))
+    assert len(service.calls) == 1
+    assert all(result['source'] == 'gemini_api' for result in results)
+    assert service.coalescing_stats['followers'] == 4
+
+@pytest.mark.anyio
+async def test_follower_gives_up_at_its_own_deadline(service):
+    leader = asyncio.create_task(service._coalesced_analysis(MARKINGS, 'front', time.monotonic() + 5.0))
+    await asyncio.sleep(0)
+    started = time.monotonic()
+    result = await service.analyze_emotions(MARKINGS, 'front', time.monotonic() + 0.1)
+    waited = time.monotonic() - started
+    assert waited < 0.3
+    # The follower fell back to local patterns...
+    assert result['source'] != 'gemini_api'
+    assert service.coalescing_stats['follower_timeouts'] == 1
+    # ...without cancelling the shared call
+    assert (await leader)['source'] == 'gemini_api'
+    assert len(service.calls) == 1
+
+@pytest.mark.anyio
+async def test_interactive_request_never_follows_a_batch_call(service):
+    deadline = time.monotonic() + 5.0
+    await asyncio.gather(
+        service._coalesced_analysis(MARKINGS, 'front', deadline, priority=BATCH),
+        service._coalesced_analysis(MARKINGS, 'front', deadline, priority=INTERACTIVE)
+    )
+    assert sorted(service.calls) == [INTERACTIVE, BATCH]
+    assert service.coalescing_stats['followers'] == 0
@@ -0,0 +1,83 @@
+"""Bit-packed body mapping records"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from app.services.compact_mapping import (
+    VIEW_SHIFT, CompactMapping, epoch_us, has_sensation, isoformat, pack, sensation_code,
+    sensation_codes, unpack_markings, unpack_view
+)
+from app.services.local_classifier import REGIONS, SENSATIONS, VIEWS
+
+def random_markings(rng: random.Random):
+    return {region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(0, len(REGIONS)))}
+
+def test_known_markings_pack_without_extra():
+    rng = random.Random(1)
+    for _ in range(1000):
+        markings = random_markings(rng)
+        view = rng.choice(VIEWS)
+        packed, extra = pack(markings, view)
+        assert extra is None
+        assert unpack_markings(packed) == markings
+        assert unpack_view(packed) == view
+
+def test_unpacked_markings_follow_region_order():
+    markings = {REGIONS[-1]: SENSATIONS[0], REGIONS[0]: SENSATIONS[-1]}
+    packed, _ = pack(markings, 'front')
+    assert list(unpack_markings(packed)) == [REGIONS[0], REGIONS[-1]]
+
+def test_every_region_and_sensation_round_trips():
+    for region in REGIONS:
+        for sensation in SENSATIONS:
+            packed, extra = pack({region: sensation}, 'back')
+            assert extra is None
+            assert unpack_markings(packed) == {region: sensation}
+
+def test_out_of_vocabulary_values_go_to_extra():
+    markings = {'head': 'hot', 'tail': 'hot', 'chest': 'sparkly'}
+    packed, extra = pack(markings, 'side')
+    assert extra == {'markings': {'tail': 'hot', 'chest': 'sparkly'}, 'view': 'side'}
+    assert packed >> VIEW_SHIFT == 3
+    assert unpack_markings(packed, extra) == markings
+    assert unpack_view(packed, extra) == 'side'
+
+def test_markings_do_not_spill_into_view_bits():
+    markings = {region: SENSATIONS[-1] for region in REGIONS}
+    packed, _ = pack(markings, 'front')
+    assert packed >> VIEW_SHIFT == 0
+    assert unpack_markings(packed) == markings
+
+def test_has_sensation_matches_a_plain_scan():
+    rng = random.Random(2)
+    for _ in range(2000):
+        markings = random_markings(rng)
+        if rng.random() < 0.2:
+            markings['elsewhere'] = rng.choice(SENSATIONS)
+        packed, extra = pack(markings, rng.choice(VIEWS))
+        for sensation in SENSATIONS:
+            assert has_sensation(packed, extra, sensation) == (sensation in markings.values())
+        assert sensation_codes(packed, extra) == {sensation_code(s) for s in markings.values()}
+
+def test_has_sensation_for_unknown_sensation_checks_extra():
+    packed, extra = pack({'head': 'hot', 'chest': 'sparkly'}, 'front')
+    assert has_sensation(packed, extra, 'sparkly')
+    assert not has_sensation(packed, extra, 'fizzy')
+    assert sensation_code('sparkly') is None
+
+@pytest.mark.parametrize('moment', [datetime(1970, 1, 1), datetime(2024, 2, 29, 23, 59, 59, 999999)])
+def test_timestamps_round_trip(moment):
+    assert isoformat(epoch_us(moment)) == moment.isoformat()
+
+def test_record_to_dict():
+    record = CompactMapping(7, 'session-1', {'head': 'hot'}, 'back', created=epoch_us(datetime(2024, 1, 2, 3, 4, 5)))
+    assert record.body_markings == {'head': 'hot'}
+    assert record.view == 'back'
+    data = record.to_dict()
+    assert data['id'] == '7'
+    assert data['session_id'] == 'session-1'
+    assert data['created_at'] == '2024-01-02T03:04:05'
+    copy = CompactMapping.from_packed(7, 'session-1', record.packed, record.extra, record.created)
+    assert copy.to_dict() == data
@@ -0,0 +1,94 @@
+"""
+The event loop stays responsive while remote providers are slow (user-001): the
+app runs against benchmarks/fake_llm_server.py answering every call after a fixed
+delay, and a /health probe is timed while analyses are in flight.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+import main
+from app.core.config import settings
+from app.routers import emotions
+from app.services.emotion_analysis import EmotionAnalysisService
+from benchmarks.provider_load_benchmark import free_port, wait_until_up
+
+PROVIDER_LATENCY = 1.0
+CONCURRENT_ANALYSES = 8
+
+@pytest.fixture(scope='module')
+def fake_llm_url():
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'benchmarks.fake_llm_server:app',
+         '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(f'{url}/__stats')
+        httpx.post(f'{url}/__config', json={
+            'gemini': {'latency': {'distribution': 'fixed', 'value_ms': PROVIDER_LATENCY * 1000}}
+        })
+        yield url
+    finally:
+        server.terminate()
+        server.wait()
+
+@pytest.fixture
+def slow_gemini_service(fake_llm_url, monkeypatch):
+    """A service whose only remote provider is the fake Gemini, with every shortcut off"""
+    monkeypatch.setenv('GEMINI_API_KEY', 'fake-gemini-key')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    for name, value in {
+        'GEMINI_BASE_URL': f'{fake_llm_url}/v1beta/models',
+        'RESULT_CACHE_ENABLED': False,
+        'RESULT_CACHE_L2_ENABLED': False,
+        'NEIGHBOR_INDEX_ENABLED': False,
+        'LOCAL_CLASSIFIER_BYPASS_ENABLED': False,
+        'REQUEST_COALESCING_ENABLED': False
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    service = EmotionAnalysisService()
+    monkeypatch.setattr(emotions, 'emotion_service', service)
+    return service
+
+@pytest.mark.anyio
+async def test_health_answers_while_provider_calls_are_slow(slow_gemini_service, fake_llm_url):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=30.0) as client:
+        started = time.perf_counter()
+        analyses = [
+            asyncio.create_task(client.post('/api/v1/emotions/analyze', json={
+                'body_markings': {'head': 'hot', 'chest': 'tight', 'stomach': f'probe-{index}'},
+                'view': 'front'
+            }))
+            for index in range(CONCURRENT_ANALYSES)
+        ]
+        await asyncio.sleep(0.2)
+        probes = []
+        while not all(task.done() for task in analyses):
+            probe_started = time.perf_counter()
+            response = await client.get('/health')
+            probes.append(time.perf_counter() - probe_started)
+            assert response.status_code == 200
+            await asyncio.sleep(0.05)
+        responses = await asyncio.gather(*analyses)
+        elapsed = time.perf_counter() - started
+    await slow_gemini_service.shutdown()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert {response.json()['data']['source'] for response in responses} == {'gemini_api'}
+    counts = httpx.get(f'{fake_llm_url}/__stats').json()['counts']
+    assert counts['gemini_requests'] >= CONCURRENT_ANALYSES
+    # The analyses overlapped instead of running one after another...
+    assert elapsed < CONCURRENT_ANALYSES * PROVIDER_LATENCY / 2
+    # ...and the loop kept serving other requests meanwhile
+    assert len(probes) >= 5
+    assert max(probes) < 0.25
@@ -0,0 +1,58 @@
+"""Budget timeouts of a hedged provider pair are charged to every leg still running (user-003)"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMService
+
+@pytest.fixture
+def service(monkeypatch):
+    """Gemini hedged with OpenAI; each provider's behaviour is set per test"""
+    monkeypatch.setenv('GEMINI_API_KEY', 'fake-gemini-key')
+    monkeypatch.setenv('OPENAI_API_KEY', 'fake-openai-key')
+    monkeypatch.setattr(settings, 'LLM_HEDGE_ENABLED', True)
+    monkeypatch.setattr(settings, 'LLM_HEDGE_DEFAULT_DELAY', 0.05)
+    monkeypatch.setattr(settings, 'LLM_DYNAMIC_ORDERING', False)
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+    monkeypatch.setattr(settings, 'LOCAL_FALLBACK_RESERVE', 0.05)
+    monkeypatch.setattr(settings, 'LLM_MIN_PROVIDER_BUDGET', 0.1)
+    service = LLMService()
+    assert list(service.breakers) == ['GeminiProvider', 'OpenAIProvider']
+    return service
+
+def behave(service, monkeypatch, **delays):
+    """Make each named provider answer nothing after the given delay"""
+    for provider in service.providers:
+        delay = delays.get(provider.__class__.__name__)
+        if delay is None:
+            continue
+
+        async def analyze_emotions(body_markings, view, delay=delay):
+            await asyncio.sleep(delay)
+            return None
+
+        monkeypatch.setattr(provider, 'analyze_emotions', analyze_emotions)
+
+async def analyze(service):
+    deadline = time.monotonic() + 0.05 + 0.4
+    return await service.analyze_emotions({'head': 'hot'}, 'front', deadline, remote_only=True, local_checked=True)
+
+def timeouts(service):
+    return {name: service.stats[name].counters['timeouts'] for name in service.breakers}
+
+@pytest.mark.anyio
+async def test_both_hedged_legs_are_charged(service, monkeypatch):
+    behave(service, monkeypatch, GeminiProvider=5.0, OpenAIProvider=5.0)
+    assert await analyze(service) is None
+    assert timeouts(service) == {'GeminiProvider': 1, 'OpenAIProvider': 1}
+    assert all(list(breaker.window) == [1] for breaker in service.breakers.values())
+
+@pytest.mark.anyio
+async def test_only_the_fallback_leg_is_charged_after_a_fast_failure(service, monkeypatch):
+    behave(service, monkeypatch, GeminiProvider=0.0, OpenAIProvider=5.0)
+    assert await analyze(service) is None
+    assert timeouts(service) == {'GeminiProvider': 0, 'OpenAIProvider': 1}
+    assert service.stats['GeminiProvider'].counters['failures'] == 1
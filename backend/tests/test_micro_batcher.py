@@ -0,0 +1,41 @@
+"""A failed micro-batch counts as one breaker failure, not one per caller (user-008)"""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMService, ProviderHTTPError
+
+@pytest.fixture
+def service(monkeypatch):
+    """Gemini behind a micro-batcher whose batched prompt always gets an HTTP 500"""
+    monkeypatch.setenv('GEMINI_API_KEY', 'fake-gemini-key')
+    monkeypatch.setenv('OPENAI_API_KEY', '')
+    monkeypatch.setattr(settings, 'LLM_BATCH_ENABLED', True)
+    monkeypatch.setattr(settings, 'LLM_BATCH_MAX_SIZE', 8)
+    service = LLMService()
+    provider = service.batchers['GeminiProvider'].provider
+    batches = []
+
+    async def analyze_batch(items):
+        batches.append(len(items))
+        raise ProviderHTTPError(500)
+
+    monkeypatch.setattr(provider, 'analyze_batch', analyze_batch)
+    service.provider = provider
+    service.batches = batches
+    return service
+
+@pytest.mark.anyio
+async def test_failed_batch_is_one_breaker_failure(service):
+    markings = [{'head': sensation} for sensation in ('hot', 'cold', 'tight', 'numb', 'warm', 'tingly', 'heavy', 'light')]
+    results = await asyncio.gather(*(service._call_provider(service.provider, body_markings, 'front')
+                                     for body_markings in markings))
+    assert results == [None] * 8
+    assert service.batches == [8]
+    breaker = service.breakers['GeminiProvider']
+    assert list(breaker.window) == [True]
+    assert breaker.state == breaker.CLOSED
+    # Every caller still sees its own failed call in the provider stats
+    assert service.stats['GeminiProvider'].counters['failures'] == 8
@@ -0,0 +1,57 @@
+"""Hamming neighbour index over analyzed body maps (user-014)"""
+
+import pytest
+
+from app.core.config import Settings, settings
+from app.services.emotion_analysis import EmotionAnalysisService
+from app.services.neighbor_index import NeighborIndex, encode
+
+RESULT = {'emotion': 'Calm', 'confidence': 0.9, 'source': 'gemini_api'}
+
+def test_exact_and_near_matches():
+    index = NeighborIndex()
+    index.add({'head': 'hot', 'chest': 'cold'}, 'front', RESULT)
+    assert index.nearest({'head': 'hot', 'chest': 'cold'}, 'front', 1) == (0, RESULT)
+    assert index.nearest({'head': 'hot', 'chest': 'cold', 'neck': 'warm'}, 'front', 1) == (1, RESULT)
+    # A flipped sensation is two bits away
+    assert index.nearest({'head': 'hot', 'chest': 'warm'}, 'front', 1) is None
+    assert index.nearest({'head': 'hot', 'chest': 'cold'}, 'back', 1) is None
+
+def test_unknown_pairs_are_never_matched():
+    index = NeighborIndex()
+    index.add({'head': 'hot', 'chest': 'cold'}, 'front', RESULT)
+    # Differs only in an out-of-vocabulary pair: must not be an exact (or any) match
+    assert index.nearest({'head': 'hot', 'chest': 'cold', 'stomach': 'numb'}, 'front', 2) is None
+    assert index.nearest({'head': 'hot', 'chest': 'tingly'}, 'front', 2) is None
+    assert index.get_stats()['unindexable'] == 2
+
+def test_maps_without_a_vector_are_not_indexed():
+    index = NeighborIndex()
+    index.add({'stomach': 'numb'}, 'front', RESULT)
+    index.add({'head': 'hot', 'tail': 'wagging'}, 'front', RESULT)
+    index.add({}, 'front', RESULT)
+    assert len(index) == 0
+    # Two maps made only of unknown regions used to share the empty vector
+    assert index.nearest({'stomach': 'numb'}, 'front', 0) is None
+    assert index.nearest({'elbow': 'itchy'}, 'front', 2) is None
+    assert index.nearest({'head': 'hot'}, 'front', 2) is None
+
+def test_encode():
+    assert encode({'head': 'hot'}) != encode({'head': 'cold'})
+    assert encode({'head': 'hot', 'stomach': 'numb'}) is None
+    assert encode({}) is None
+
+def test_neighbour_reuse_is_opt_in():
+    assert Settings.model_fields['NEIGHBOR_INDEX_ENABLED'].default is False
+    assert Settings.model_fields['NEIGHBOR_MAX_DISTANCE'].default <= 1
+
+@pytest.mark.parametrize('markings', [
+    {'head': 'hot', 'chest': 'cold', 'stomach': 'numb'},
+    {'stomach': 'numb'}
+])
+def test_service_does_not_serve_unknown_pairs(monkeypatch, markings):
+    monkeypatch.setattr(settings, 'NEIGHBOR_INDEX_ENABLED', True)
+    service = EmotionAnalysisService()
+    service.llm_service.neighbors.add({'head': 'hot', 'chest': 'cold'}, 'front', RESULT)
+    service.llm_service.neighbors.add({'stomach': 'numb', 'knee': 'sore'}, 'front', RESULT)
+    assert service._neighbor_result(markings, 'front') is None
@@ -0,0 +1,163 @@
+"""Cursor codec, ordered indexes and paging through both storage backends"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from app.services.compact_mapping import epoch_us
+from app.services.local_classifier import REGIONS, SENSATIONS
+from app.services.memory_storage import MemoryStorage
+from app.services.pagination import (
+    MAPPINGS, SESSIONS, OrderedIndex, PageBound, decode_cursor, encode_cursor, first_page
+)
+from app.services.sqlite_storage import SQLiteStorage
+
+# Cursor codec
+
+@pytest.mark.parametrize('kind, position', [
+    (MAPPINGS, (1_700_000_000_000_000, 42)),
+    (MAPPINGS, (0, 0)),
+    (SESSIONS, (1_700_000_000_000_000, 'session-é/?+=')),
+])
+def test_cursor_round_trip(kind, position):
+    cursor = encode_cursor(kind, position)
+    assert '=' not in cursor
+    assert decode_cursor(kind, cursor) == position
+
+def test_cursor_of_another_list_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(SESSIONS, encode_cursor(MAPPINGS, (1, 2)))
+    with pytest.raises(ValueError):
+        decode_cursor(MAPPINGS, encode_cursor(SESSIONS, (1, 'two')))
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', '!!!!', encode_cursor(MAPPINGS, (1, 2))[:-3], 'WzEsMl0'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(MAPPINGS, cursor)
+
+# OrderedIndex
+
+def test_ordered_index_keeps_order_for_any_insert_order():
+    rng = random.Random(1)
+    entries = [(rng.randrange(50), key) for key in range(500)]
+    index = OrderedIndex()
+    for created, key in rng.sample(entries, len(entries)):
+        index.add(created, key)
+    assert list(index.scan(0)) == sorted(entries)
+
+def test_ordered_index_after_and_start():
+    index = OrderedIndex()
+    for created, key in [(10, 1), (10, 3), (20, 2), (20, 5), (30, 4)]:
+        index.add(created, key)
+    assert index.after((10, 1)) == 1
+    assert index.after((10, 2)) == 1
+    assert index.after((20, 5)) == 4
+    assert index.after((5, 99)) == 0
+    assert index.after((99, 0)) == 5
+    assert index.start(20, None) == 2
+    assert index.start(20, (10, 1)) == 2
+    assert index.start(10, (20, 2)) == 3
+    assert list(index.scan(1, created_to=30)) == [(10, 3), (20, 2), (20, 5)]
+
+def test_ordered_index_remove_and_compact():
+    index = OrderedIndex(int_keys=False)
+    for created, key in [(1, 'a'), (1, 'b'), (2, 'c'), (3, 'd')]:
+        index.add(created, key)
+    index.remove(1, 'b')
+    index.remove(1, 'missing')
+    assert list(index.scan(0)) == [(1, 'a'), (2, 'c'), (3, 'd')]
+    index.stale = 1
+    index.compact(lambda created, key: key != 'c')
+    assert list(index.scan(0)) == [(1, 'a'), (3, 'd')]
+    assert index.stale == 0
+
+def test_first_page_and_bound():
+    runs = [[(1, 1), (4, 4), (7, 7)], [(2, 2), (5, 5)], [(3, 3), (6, 6)]]
+    page, position = first_page(runs, 4, lambda item: item)
+    assert page == [(1, 1), (2, 2), (3, 3), (4, 4)]
+    assert position == (4, 4)
+    assert first_page(runs, 7, lambda item: item)[1] is None
+    bound = PageBound(2)
+    bound.add([(5, 5), (1, 1)])
+    assert bound.position is None
+    bound.add([(3, 3), (9, 9)])
+    assert bound.position == (5, 5)
+
+# Paging through the storage backends
+
+def brute_force(storage, view=None, session_id=None, sensation=None, created_from=None, created_to=None):
+    matches = []
+    for mapping in storage.list_body_mappings():
+        created = epoch_us(datetime.fromisoformat(mapping['created_at']))
+        if ((view is None or mapping['view'] == view)
+                and (session_id is None or mapping['session_id'] == session_id)
+                and (sensation is None or sensation in mapping['body_markings'].values())
+                and (created_from is None or created >= created_from)
+                and (created_to is None or created < created_to)):
+            matches.append(mapping)
+    return sorted(matches, key=lambda mapping: (mapping['created_at'], int(mapping['id'])))
+
+def walk(storage, limit, **filters):
+    mappings, after = [], None
+    while True:
+        page, after = storage.page_body_mappings(limit, after, **filters)
+        assert len(page) <= limit
+        mappings += page
+        if after is None:
+            return mappings
+        assert len(page) == limit
+
+def walk_from(storage, limit, after):
+    mappings = []
+    while after is not None:
+        page, after = storage.page_body_mappings(limit, after)
+        mappings += page
+    return mappings
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        storage = MemoryStorage(shards=4)
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'storage.sqlite3'), batch_size=16)
+    rng = random.Random(3)
+    ids = []
+    for step in range(600):
+        markings = {region: rng.choice(SENSATIONS) for region in rng.sample(REGIONS, rng.randint(0, 4))}
+        ids.append(storage.save_body_mapping(f'session-{rng.randrange(6)}', markings, rng.choice(('front', 'back'))))
+        if step % 10 == 0:
+            storage.delete_body_mapping(rng.choice(ids))
+    yield storage
+    storage.close()
+
+def test_pages_cover_every_mapping_once(storage):
+    expected = brute_force(storage)
+    for limit in (1, 7, 100, 1000):
+        assert walk(storage, limit) == expected
+
+def test_filtered_pages_match_a_full_scan(storage):
+    everything = brute_force(storage)
+    middle = epoch_us(datetime.fromisoformat(everything[len(everything) // 2]['created_at']))
+    for filters in ({'view': 'back'}, {'sensation': 'numb'}, {'session_id': 'session-2'},
+                    {'view': 'front', 'sensation': 'hot'}, {'created_from': middle},
+                    {'created_to': middle}, {'session_id': 'session-1', 'created_from': middle}):
+        assert walk(storage, 13, **filters) == brute_force(storage, **filters)
+
+def test_pages_stay_consistent_under_writes(storage):
+    first, after = storage.page_body_mappings(50)
+    storage.save_body_mapping('session-late', {'head': 'hot'}, 'front')
+    rest = walk_from(storage, 50, after)
+    ids = [mapping['id'] for mapping in first + rest]
+    assert len(ids) == len(set(ids))
+    assert ids[-1] == brute_force(storage)[-1]['id']
+
+def test_sessions_page(storage):
+    sessions, after = [], None
+    while True:
+        page, after = storage.page_sessions(2, after)
+        sessions += page
+        if after is None:
+            break
+    assert sorted(session['id'] for session in sessions) == sorted(session['id'] for session in storage.list_sessions())
+    assert len({session['id'] for session in sessions}) == len(sessions)
@@ -0,0 +1,64 @@
+"""Persistent L2 result cache stays off the event loop (user-016)"""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMService
+from app.services.persistent_cache import PersistentResultCache
+
+RESULT = {'emotion': 'Calm', 'confidence': 0.8}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PersistentResultCache(str(tmp_path / 'l2.sqlite3'), busy_timeout=0.5)
+    yield cache
+    cache.close()
+
+def test_writes_go_through_the_writer_thread(cache):
+    cache.set('ns|front|a', RESULT)
+    cache.flush()
+    assert cache.get('ns|front|a') == RESULT
+    assert cache.invalidate('ns') == 1
+    assert cache.get('ns|front|a') is None
+
+def test_set_does_not_wait_for_a_locked_database(cache):
+    other = sqlite3.connect(cache.path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    cache.set('ns|front|a', RESULT)
+    assert time.perf_counter() - started < 0.05
+    cache.flush()
+    other.execute("ROLLBACK")
+    other.close()
+    assert cache.metrics['write_errors'] == 1
+
+def test_full_queue_drops_writes(tmp_path):
+    cache = PersistentResultCache(str(tmp_path / 'l2.sqlite3'), max_pending=1)
+    other = sqlite3.connect(cache.path, isolation_level=None, timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    for index in range(20):
+        cache.set(f'ns|front|{index}', RESULT)
+    other.execute("ROLLBACK")
+    other.close()
+    cache.close()
+    assert cache.metrics['dropped_writes'] > 0
+
+@pytest.mark.anyio
+async def test_service_opens_the_cache_on_startup_only(l2_cache_path, monkeypatch):
+    monkeypatch.setattr(settings, 'RESULT_CACHE_L2_ENABLED', True)
+    service = LLMService()
+    assert service.l2_cache is None and not os.path.exists(l2_cache_path)
+    await service.startup()
+    try:
+        assert service.l2_cache is not None and os.path.exists(l2_cache_path)
+        service._cache_set('key', RESULT)
+        service.cache.invalidate()
+        service.l2_cache.flush()
+        assert await service._cache_get('key') == RESULT
+    finally:
+        await service.shutdown()
+    assert service.l2_cache is None
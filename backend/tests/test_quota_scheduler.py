@@ -0,0 +1,47 @@
+"""Outbound quota scheduler queue bound and grant refunds (user-011)"""
+
+import asyncio
+
+import pytest
+
+from app.services.quota_scheduler import BACKGROUND, OutboundScheduler, ProviderQuota
+
+def exhausted_scheduler(max_queue: int = 2) -> OutboundScheduler:
+    """One provider with 60 requests a minute (one a second) and its burst used up"""
+    quota = ProviderQuota(rpm=60, tpm=0, burst_seconds=1.0)
+    quota.try_acquire(1)
+    return OutboundScheduler({'gemini': quota}, max_queue=max_queue)
+
+@pytest.mark.anyio
+async def test_expired_waits_do_not_fill_the_queue():
+    scheduler = exhausted_scheduler()
+    for _ in range(3):
+        results = await asyncio.gather(*(scheduler.acquire('gemini', 1, BACKGROUND, max_wait=0.01) for _ in range(2)))
+        assert results == [False, False]
+    # Nothing is waiting any more, so a new call may queue (and is admitted once the bucket refills)
+    assert scheduler.get_stats()['gemini']['queue_depth'] == 0
+    assert await scheduler.acquire('gemini', 1, BACKGROUND, max_wait=2.0)
+    assert scheduler.metrics['gemini']['rejected'] == 6
+
+@pytest.mark.anyio
+async def test_full_queue_counts_live_waiters():
+    scheduler = exhausted_scheduler(max_queue=1)
+    waiter = asyncio.create_task(scheduler.acquire('gemini', 1, BACKGROUND, max_wait=2.0))
+    await asyncio.sleep(0)
+    assert not await scheduler.acquire('gemini', 1, BACKGROUND, max_wait=2.0)
+    assert await waiter
+
+@pytest.mark.anyio
+async def test_grant_to_a_cancelled_caller_is_refunded():
+    scheduler = exhausted_scheduler()
+    quota = scheduler.quotas['gemini']
+    waiter = asyncio.create_task(scheduler.acquire('gemini', 1, BACKGROUND, max_wait=2.0))
+    await asyncio.sleep(0)
+    # Admit the waiter, then cancel it before it resumes
+    quota.requests.tokens = 1.0
+    scheduler._drain('gemini')
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.metrics['gemini']['refunded'] == 1
+    assert quota.try_acquire(1)
@@ -0,0 +1,19 @@
+"""Result cache keys (user-006)"""
+
+from app.services.result_cache import canonical_key, canonical_markings
+
+def test_key_ignores_order_and_unmarked_regions():
+    assert canonical_markings({'head': 'hot', 'chest': 'cold', 'belly': ''}) == canonical_markings(
+        {'chest': 'cold', 'head': 'hot'}
+    )
+
+def test_separators_in_client_strings_do_not_collide():
+    crafted = [
+        {'chest': 'cold,head=hot'},
+        {'chest=cold,head': 'hot'},
+        {'chest': 'cold', 'head': 'hot'},
+        {'chest': 'cold|front'},
+        {'chest': '["cold"]'}
+    ]
+    keys = {canonical_key(markings, 'front', 'gemini') for markings in crafted}
+    assert len(keys) == len(crafted)
@@ -0,0 +1,173 @@
+"""SQLite storage under commit failures, a full write queue (user-022) and a locked shared
+database (user-024)"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+from app.routers import body_mapping
+from app.services.sqlite_storage import SQLiteStorage
+from app.services.storage_backend import StorageBusy
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'storage.sqlite3')
+
+def failing_writes(storage, monkeypatch, failures):
+    """Make the writer thread's next ``failures`` commits raise"""
+    write = storage._write
+    left = [failures]
+
+    def flaky_write(writes, db=None):
+        if db is storage._writer and left[0] > 0:
+            left[0] -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return write(writes, db)
+
+    monkeypatch.setattr(storage, '_write', flaky_write)
+    return left
+
+def blocked_writer(storage, monkeypatch):
+    """Hold the writer thread in its next commit until ``release`` is set; ``entered``
+    is set once it is holding a batch"""
+    write = storage._write
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_write(writes, db=None):
+        entered.set()
+        release.wait()
+        return write(writes, db)
+
+    monkeypatch.setattr(storage, '_write', slow_write)
+    return entered, release
+
+def test_failed_commit_keeps_writes_and_retries(path, monkeypatch):
+    storage = SQLiteStorage(path, flush_interval=0.0, max_retry_delay=0.05)
+    left = failing_writes(storage, monkeypatch, 5)
+    mapping_id = storage.save_body_mapping('session-1', {'head': 'hot'}, 'front')
+    storage.flush()
+    assert left[0] == 0
+    stats = storage.get_stats()
+    assert stats['write_retries'] == 5
+    assert stats['write_errors'] == 0
+    assert stats['failing_write_error'] is None
+    assert storage.health() is None
+    storage.close()
+
+    reopened = SQLiteStorage(path)
+    assert reopened.get_body_mapping(mapping_id)['body_markings'] == {'head': 'hot'}
+    assert reopened.has_session('session-1')
+    reopened.close()
+
+def test_failing_writes_stay_readable_and_are_reported(path, monkeypatch):
+    storage = SQLiteStorage(path, flush_interval=0.0, max_retry_delay=0.05)
+    left = failing_writes(storage, monkeypatch, 10 ** 9)
+    mapping_id = storage.save_body_mapping('session-1', {'head': 'hot'}, 'front')
+    while storage.get_stats()['write_retries'] < 3:
+        threading.Event().wait(0.01)
+    # Acknowledged but uncommitted: still served from the overlay
+    assert storage.get_body_mapping(mapping_id) is not None
+    assert 'disk I/O error' in storage.health()
+    assert storage.get_stats()['failing_write_error'] == 'disk I/O error'
+    left[0] = 0
+    storage.flush()
+    assert storage.health() is None
+    storage.close()
+    reopened = SQLiteStorage(path)
+    assert reopened.get_body_mapping(mapping_id) is not None
+    reopened.close()
+
+def test_full_queue_rejects_without_blocking(path, monkeypatch):
+    storage = SQLiteStorage(path, batch_size=1, flush_interval=0.0, max_pending=2)
+    entered, release = blocked_writer(storage, monkeypatch)
+    saved = [storage.save_body_mapping('session-0', {'head': 'hot'}, 'front')]
+    entered.wait()
+    with pytest.raises(StorageBusy):
+        for index in range(1, 10):
+            saved.append(storage.save_body_mapping(f'session-{index}', {'head': 'hot'}, 'front'))
+    # One batch held by the writer, two queued
+    assert len(saved) == 3
+    # The rejected write left nothing behind
+    assert not storage.has_session(f'session-{len(saved)}')
+    assert storage.get_stats()['rejected_writes'] == 1
+    release.set()
+    storage.flush()
+    assert [mapping['id'] for mapping in storage.list_body_mappings()] == saved
+    storage.close()
+
+@pytest.mark.parametrize('write_through', [False, True])
+def test_metrics_count_every_write_from_many_threads(path, write_through):
+    storage = SQLiteStorage(path, write_through=write_through, busy_timeout=5.0, flush_interval=0.0)
+    threads, writes = 8, 200
+
+    def save(thread: int) -> None:
+        for index in range(writes):
+            mapping_id = storage.save_body_mapping(f'session-{thread}', {'head': 'hot'}, 'front')
+            storage.save_emotion_result(mapping_id, {'emotion': 'Calm'})
+
+    workers = [threading.Thread(target=save, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    storage.flush()
+    stats = storage.get_stats()
+    storage.close()
+    assert storage.metrics['mappings_saved'] == storage.metrics['emotion_results_saved'] == threads * writes
+    assert stats['total_mappings'] == threads * writes
+    assert stats['committed_writes'] == 2 * threads * writes
+    if not write_through:
+        assert stats['queued_writes'] == 2 * threads * writes
+
+@pytest.mark.anyio
+async def test_full_queue_is_a_503(path, monkeypatch):
+    storage = SQLiteStorage(path, batch_size=1, flush_interval=0.0, max_pending=1)
+    entered, release = blocked_writer(storage, monkeypatch)
+    storage.save_body_mapping('session-1', {'head': 'hot'}, 'front')
+    entered.wait()
+    storage.save_body_mapping('session-1', {'head': 'cold'}, 'front')
+    monkeypatch.setattr(body_mapping, 'storage', storage)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        request = {'session_id': 'session-1', 'body_markings': {'head': 'numb'}, 'view': 'front'}
+        busy = await client.post('/api/v1/body-mappings/', json=request)
+        release.set()
+        storage.flush()
+        accepted = await client.post('/api/v1/body-mappings/', json=request)
+    storage.close()
+    assert busy.status_code == 503
+    assert busy.headers['retry-after'] == '1'
+    assert accepted.status_code == 200
+
+@pytest.mark.anyio
+async def test_locked_shared_database_is_a_503_without_blocking_the_loop(path, monkeypatch):
+    storage = SQLiteStorage(path, write_through=True, busy_timeout=0.5)
+    storage.save_body_mapping('session-1', {'head': 'hot'}, 'front')
+    monkeypatch.setattr(body_mapping, 'storage', storage)
+    # Another worker process holding the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        write = asyncio.create_task(client.post('/api/v1/body-mappings/', json={
+            'session_id': 'session-1', 'body_markings': {'head': 'cold'}, 'view': 'front'
+        }))
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        health = await client.get('/health')
+        read = await client.get('/api/v1/body-mappings/1')
+        assert time.perf_counter() - started < 0.25
+        assert not write.done()
+        response = await write
+    other.execute("ROLLBACK")
+    other.close()
+    storage.close()
+    assert health.status_code == 200
+    assert read.status_code == 200
+    assert response.status_code == 503
+    assert 'database is locked' in response.json()['detail']
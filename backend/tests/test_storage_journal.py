@@ -0,0 +1,152 @@
+"""Journal encoding, replay into MemoryStorage and torn-tail handling"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import storage_journal
+from app.services.memory_storage import MemoryStorage
+from app.services.storage_journal import (
+    OP_CREATE_SESSION, OP_DELETE_MAPPING, OP_SAVE_MAPPING, OP_SAVE_RESULT, Journal, read_records
+)
+
+def state(storage):
+    mappings = storage.list_body_mappings()
+    return (
+        sorted(session['id'] for session in storage.list_sessions()),
+        mappings,
+        {mapping['id']: storage.get_emotion_result(mapping['id']) for mapping in mappings}
+    )
+
+def fill(storage):
+    ids = []
+    for index in range(200):
+        ids.append(storage.save_body_mapping(f'session-{index % 7}', {'head': 'hot', 'chest': 'cold'}, 'front'))
+    storage.save_body_mapping('session-odd', {'tail': 'wagging'}, 'side')
+    storage.save_emotion_result(ids[0], {'emotion': 'Calm', 'confidence': 0.8})
+    storage.update_body_mapping(ids[1], {'abdomen': 'numb'}, 'back')
+    storage.delete_body_mapping(ids[2])
+    storage.delete_session('session-3')
+    return ids
+
+def test_records_round_trip(tmp_path):
+    journal = Journal(str(tmp_path), fsync='never')
+    journal.open()
+    records = [
+        (OP_CREATE_SESSION, ('session-1', 123)),
+        (OP_SAVE_MAPPING, (5, 'session-1', 0b1001, {'markings': {'tail': 'x'}, 'view': None}, 456)),
+        (OP_SAVE_RESULT, (5, {'emotion': 'Calm'})),
+        (OP_DELETE_MAPPING, (5,))
+    ]
+    for op, fields in records:
+        journal.append(op, fields)
+    journal.close()
+    assert list(Journal(str(tmp_path)).replay()) == records
+
+def test_replay_restores_storage(tmp_path):
+    storage = MemoryStorage(shards=4, journal=Journal(str(tmp_path), fsync='never'))
+    ids = fill(storage)
+    before = state(storage)
+    storage.close()
+
+    recovered = MemoryStorage(shards=4, journal=Journal(str(tmp_path)))
+    assert state(recovered) == before
+    # New ids continue after the recovered ones
+    assert int(recovered.save_body_mapping('session-new', {'head': 'warm'}, 'front')) > max(map(int, ids))
+    recovered.close()
+
+def test_replay_after_snapshot(tmp_path):
+    storage = MemoryStorage(shards=4, journal=Journal(str(tmp_path), fsync='never'))
+    fill(storage)
+    storage.compact()
+    storage.save_body_mapping('session-after', {'neck': 'cool'}, 'back')
+    before = state(storage)
+    storage.close()
+
+    recovered = MemoryStorage(shards=4, journal=Journal(str(tmp_path)))
+    assert state(recovered) == before
+    recovered.close()
+
+@pytest.mark.parametrize('tail', [
+    b'\x03\xff\x00\x00\x00garbage',   # header promising more bytes than exist
+    b'\x03\x04\x00\x00\x00\x00\x00\x00\x00abcd',  # complete record with a bad checksum
+    b'\x03\x01'                        # half a header
+])
+def test_torn_tail_is_ignored(tmp_path, tail):
+    storage = MemoryStorage(shards=4, journal=Journal(str(tmp_path), fsync='never'))
+    fill(storage)
+    before = state(storage)
+    storage.close()
+    segment = os.path.join(str(tmp_path), sorted(n for n in os.listdir(str(tmp_path)) if n.startswith('journal-'))[-1])
+    intact = list(read_records(segment, 4))
+    with open(segment, 'ab') as f:
+        f.write(tail)
+    assert list(read_records(segment, 4)) == intact
+
+    recovered = MemoryStorage(shards=4, journal=Journal(str(tmp_path)))
+    assert state(recovered) == before
+    recovered.close()
+
+def test_directory_is_claimed_by_one_journal(tmp_path):
+    journal = Journal(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        Journal(str(tmp_path))
+    journal.close()
+    Journal(str(tmp_path)).close()
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        Journal('unused', fsync='sometimes')
+
+def test_always_fsyncs_outside_the_journal_lock(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path), fsync='always')
+    journal.open()
+    syncing, release = threading.Event(), threading.Event()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        syncing.set()
+        release.wait()
+        fsync(fd)
+
+    monkeypatch.setattr(storage_journal.os, 'fsync', slow_fsync)
+    seq = journal.append(OP_DELETE_MAPPING, (1,))
+    waiter = threading.Thread(target=journal.wait_durable, args=(seq,))
+    waiter.start()
+    assert syncing.wait(5.0)
+    # While the disk is busy, other appends still go through at once...
+    started = time.perf_counter()
+    later = journal.append(OP_DELETE_MAPPING, (2,))
+    assert time.perf_counter() - started < 0.1
+    # ...and the first writer is still waiting for its record to be durable
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    release.set()
+    waiter.join(5.0)
+    assert not waiter.is_alive()
+    journal.wait_durable(later)
+    journal.close()
+
+def test_always_groups_concurrent_writes_into_shared_fsyncs(tmp_path):
+    storage = MemoryStorage(shards=4, journal=Journal(str(tmp_path), fsync='always'))
+
+    def write(thread):
+        for index in range(50):
+            storage.save_body_mapping(f'session-{thread}', {'head': 'hot'}, 'front')
+
+    threads = [threading.Thread(target=write, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = storage.get_stats()['journal']
+    before = state(storage)
+    storage.close()
+    assert stats['appended'] == 8 * 51
+    assert stats['durable_waits'] == 8 * 50
+    assert stats['fsyncs'] < stats['appended']
+    recovered = MemoryStorage(shards=4, journal=Journal(str(tmp_path)))
+    assert state(recovered) == before
+    recovered.close()
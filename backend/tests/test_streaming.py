@@ -0,0 +1,48 @@
+"""Streamed analysis refines the local result with a remote one only (user-009)"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.emotion_analysis import EmotionAnalysisService
+from app.services.llm_service import HTTPProvider
+
+MARKINGS = {'head': 'hot', 'chest': 'tight', 'stomach': 'cold'}
+CONFIDENT = {'emotion': 'Anxiety', 'confidence': 0.99, 'marked_regions': 3, 'source': 'local_classifier'}
+
+@pytest.fixture
+def service(monkeypatch):
+    """A service whose local classifier is always confident and whose remote providers answer nothing"""
+    monkeypatch.setenv('GEMINI_API_KEY', 'fake-gemini-key')
+    monkeypatch.setattr(settings, 'LOCAL_CLASSIFIER_BYPASS_ENABLED', True)
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+    service = EmotionAnalysisService()
+    monkeypatch.setattr(service.llm_service, '_confident_local_result', lambda body_markings, view: dict(CONFIDENT))
+
+    async def no_answer(body_markings, view):
+        return None
+
+    for provider in service.llm_service.providers:
+        if isinstance(provider, HTTPProvider):
+            monkeypatch.setattr(provider, 'analyze_emotions', no_answer)
+    return service
+
+async def collect(service):
+    return [event async for event in service.stream_analysis(MARKINGS, 'front')]
+
+@pytest.mark.anyio
+async def test_local_classifier_is_not_sent_as_the_refinement(service):
+    first, final = await collect(service)
+    assert first['source'] == 'local_pattern_analysis' and not first['final']
+    assert final['final'] and final['result'] is None
+    assert final['message'] == 'No remote refinement available; the local result stands'
+
+@pytest.mark.anyio
+async def test_remote_answer_is_the_refinement(service, monkeypatch):
+    async def answer(body_markings, view):
+        return {'emotion': 'Fear', 'confidence': 0.8, 'source': 'gemini_api'}
+
+    for provider in service.llm_service.providers:
+        if isinstance(provider, HTTPProvider):
+            monkeypatch.setattr(provider, 'analyze_emotions', answer)
+    _, final = await collect(service)
+    assert final['source'] == 'gemini_api' and final['result']['emotion'] == 'Fear'
@@ -79,21 +79,13 @@ export const BodyFeelMapApp = () => {
   const handleAnalyze = async () => {
     setIsAnalyzing(true);
     try {
-      // Analyze both front and back views if they have markings
-      const frontMarkings = Object.values(markings.front).some(v => v !== null);
-      const backMarkings = Object.values(markings.back).some(v => v !== null);
+      // Analyze front and back views together in a single request
+      const hasMarkings = Object.values(markings.front).some(v => v !== null)
+        || Object.values(markings.back).some(v => v !== null);
       
-      let allEmotions: EmotionResult[] = [];
-      
-      if (frontMarkings) {
-        const frontEmotions = await apiService.analyzeEmotions(markings, 'front');
-        allEmotions.push(...frontEmotions);
-      }
-      
-      if (backMarkings) {
-        const backEmotions = await apiService.analyzeEmotions(markings, 'back');
-        allEmotions.push(...backEmotions);
-      }
+      const allEmotions: EmotionResult[] = hasMarkings
+        ? await apiService.analyzeEmotionsCombined(markings)
+        : [];
       
       setEmotions(allEmotions);
       setCurrentStep('results');
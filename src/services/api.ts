@@ -109,6 +109,84 @@ class ApiService {
     return [];
   }
 
+  // Analyzes front and back together in one request (one LLM round trip)
+  async analyzeEmotionsCombined(markings: BodyMarkings): Promise<EmotionResult[]> {
+    const filterMarked = (view: 'front' | 'back') => Object.fromEntries(
+      Object.entries(markings[view]).filter(([_, sensation]) => sensation !== null)
+    );
+
+    const response = await this.request<any>('/emotions/analyze/full', {
+      method: 'POST',
+      body: JSON.stringify({
+        front: filterMarked('front'),
+        back: filterMarked('back')
+      }),
+    });
+
+    if (!response.success || !response.data) {
+      return [];
+    }
+
+    // Each view holds either one LLM result or a list of local pattern results
+    const views = response.data.views || {};
+    return (['front', 'back'] as const)
+      .filter(view => views[view])
+      .flatMap(view => (Array.isArray(views[view]) ? views[view] : [views[view]]))
+      .map((result: any) => ({
+        emotion: result.emotion,
+        confidence: result.confidence,
+        description: result.description,
+        patterns: result.patterns || []
+      }));
+  }
+
+  // Streams the instant local result first, then the LLM refinement (NDJSON)
+  async analyzeEmotionsStream(
+    markings: BodyMarkings,
+    view: 'front' | 'back',
+    onEvent: (event: { source: string; final: boolean; result: any; message?: string }) => void
+  ): Promise<void> {
+    const filteredMarkings = Object.fromEntries(
+      Object.entries(markings[view]).filter(([_, sensation]) => sensation !== null)
+    );
+
+    const response = await fetch(`${this.baseUrl}/emotions/analyze/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/x-ndjson',
+      },
+      body: JSON.stringify({
+        body_markings: filteredMarkings,
+        view: view
+      }),
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let newline = buffer.indexOf('\n');
+      while (newline !== -1) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (line) {
+          onEvent(JSON.parse(line));
+        }
+        newline = buffer.indexOf('\n');
+      }
+    }
+  }
+
   async analyzeEmotionsFromMapping(mappingId: number): Promise<EmotionResult[]> {
     return this.request(`/emotions/body-mapping/${mappingId}`);
   }